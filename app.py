@@ -1,21 +1,22 @@
 from flask import Flask, request, jsonify
-from openai import OpenAI
 from dotenv import load_dotenv
 import os
 import uuid
+from backend.llm_client import make_llm_client
+from backend.shared_state import SharedCounters, SharedDict
 
-# 1) Load env + OpenAI client
+# 1) Load env + model client (LLM_BACKEND=stub for offline load tests)
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+llm = make_llm_client()
+MODEL = os.getenv("MODEL_WRITER", "gpt-5.1")
 
 app = Flask(__name__)
 
-# In-memory store for hackathon demo
-profiles = {}  # {profile_id: profile_json}
-stats = {
-    "profiles_created": 0,
-    "cvs_generated": 0,
-}
+# Profiles and counters live in one SQLite file, so every worker process
+# (backend/serve.py --app app:app) sees the same ones
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "data/shared_state.db")
+profiles = SharedDict(SHARED_STATE_PATH, "profiles")  # {profile_id: profile_json}
+stats = SharedCounters(SHARED_STATE_PATH, ["profiles_created", "cvs_generated"])
 
 
 # ---------------------------------------------------
@@ -26,16 +27,16 @@ def test_api():
     """
     Simple check that:
     - Flask is running
-    - OpenAI key works
+    - the model backend works
     """
 
     try:
-        response = client.responses.create(
-            model="gpt-5.1",
-            input="Say hello to the Kion Consulting Hackathon in one friendly sentence.",
+        completion = llm.complete(
+            MODEL,
+            prompt="Say hello to the Kion Consulting Hackathon in one friendly sentence.",
         )
 
-        return jsonify({"message": response.output_text})
+        return jsonify({"message": completion.text})
     except Exception as e:
         return jsonify({"error": "OpenAI test failed", "details": str(e)}), 500
 
@@ -53,7 +54,7 @@ def build_profile():
     }
 
     Backend:
-    - Calls OpenAI
+    - Calls the model
     - Returns structured profile + profile_id
     """
 
@@ -100,19 +101,14 @@ Respond in {preferred_language}.
 """
 
     try:
-        response = client.responses.create(
-            model="gpt-5.1",
-            input=prompt,
-        )
-
         # The model will output JSON text. We just return it as-is.
         # If you want, you could json.loads() it and validate.
-        profile_json_text = response.output_text
+        profile_json_text = llm.complete(MODEL, prompt=prompt).text
 
         # For hackathon simplicity, store as raw text and also return it
         profile_id = str(uuid.uuid4())
         profiles[profile_id] = profile_json_text
-        stats["profiles_created"] += 1
+        stats.inc("profiles_created")
 
         return jsonify({
             "profile_id": profile_id,
@@ -177,13 +173,8 @@ No JSON, just the CV text.
 """
 
     try:
-        response = client.responses.create(
-            model="gpt-5.1",
-            input=prompt,
-        )
-
-        cv_text = response.output_text
-        stats["cvs_generated"] += 1
+        cv_text = llm.complete(MODEL, prompt=prompt).text
+        stats.inc("cvs_generated")
 
         return jsonify({"cv": cv_text})
 
@@ -200,9 +191,10 @@ def get_stats():
     Small endpoint to show judges:
     how many profiles / CVs we generated.
     """
+    counts = stats.values(["profiles_created", "cvs_generated"])
     return jsonify({
-        "profiles_created": stats["profiles_created"],
-        "cvs_generated": stats["cvs_generated"],
+        "profiles_created": counts["profiles_created"],
+        "cvs_generated": counts["cvs_generated"],
         "profiles_in_memory": len(profiles)
     })
 
@@ -1,42 +1,380 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from openai import OpenAI
 from dotenv import load_dotenv
 import os
+import atexit
 import uuid
 import json
+import math
 from datetime import datetime, timezone
-from twilio.rest import Client
 import random
+import time
+import functools
+import hashlib
+import threading
+from response_cache import ResponseCache, make_key
+from session_store import make_session_store
+from context_window import ContextWindow, count_message_tokens
+from prompt_registry import PromptRegistry
+from question_bank import make_question_banks
+from batch_jobs import BatchJobStore, parse_rows, run_batch
+from profile_schema import PROFILE_JSON_SCHEMA, ProfileParseError, parse_profile
+from cv_render import CvRenderer, TEMPLATES as CV_TEMPLATES
+from job_index import JobIndex
+import metrics
+from llm_client import make_llm_client
+from model_router import ModelRouter, load_routing
+from coalescing import (
+    IdempotencyBusy, IdempotencyConflict, IdempotencyStore, SingleFlight, StoredResponse,
+)
+from sms_queue import SmsQueue, make_sms_sender
+from shared_state import SharedCounters
+from geo_index import Gazetteer, GeoIndex, parse_tile_id, tile_id
+from speech import (
+    AudioCache, SpeechError, TranscriptionUploads, UploadError as AudioUploadError, make_synthesizer,
+    make_transcriber, normalise_text,
+)
 # database helpers
-from database.database import db  # we only need db for login codes now
+from database.database import db, upload_fileobj, media_record, warm as warm_database
+from database.media_storage import UploadError
+from database.profile_store import ProfileStore, valid_profile_id
+from database.phone_logins import InvalidCode, PhoneLogins
 
 # ---------------------------------------------------
-# LOAD ENV + OPENAI CLIENT
+# LOAD ENV + MODEL CLIENT
 # ---------------------------------------------------
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-# Twilio setup for SMS codes
+# LLM_BACKEND=stub swaps OpenAI for a local stub (no network, configurable
+# latency and failures) for load tests and benchmarks
+llm = make_llm_client()
+# Routes name a tier list, not a model: timeouts fall back to a faster tier
+# and slow calls are hedged (see model_router.py, MODEL_ROUTING_PATH)
+router = ModelRouter(llm, load_routing(), max_workers=int(os.getenv("MODEL_ROUTER_THREADS", "256")))
+# Twilio credentials for SMS codes (the client is built on the first send)
 TWILIO_SID = os.getenv("TWILIO_SID")
 TWILIO_TOKEN = os.getenv("TWILIO_TOKEN")
 TWILIO_FROM = os.getenv("TWILIO_FROM")
 
-twilio_client = None
-if TWILIO_SID and TWILIO_TOKEN and TWILIO_FROM:
-    twilio_client = Client(TWILIO_SID, TWILIO_TOKEN)
+# Prompt templates are read once here, not rebuilt per request
+prompts = PromptRegistry(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompt_templates"),
+    pinned_versions=os.getenv("PROMPT_VERSIONS", ""),
+)
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+# Per-route latency split into model / db / twilio time, in-flight gauges,
+# token counts; Prometheus text at /metrics
+metrics.init_app(app)
+# Under serve.py each worker publishes its totals here and scrapes add them up
+if os.getenv("METRICS_DIR"):
+    metrics.registry.share(os.getenv("METRICS_DIR"))
+
+# Profiles live in the database behind a read-through cache; writes are
+# batched into one multi-path update per flush
+profile_store = ProfileStore(
+    db,
+    cache_size=int(os.getenv("PROFILE_CACHE_SIZE", "5000")),
+    flush_interval=float(os.getenv("PROFILE_FLUSH_INTERVAL", "0.5")),
+    # Multi-worker consistency (serve.py sets both): re-read cached records
+    # after PROFILE_CACHE_TTL seconds, write new profiles before answering
+    cache_ttl=float(os.getenv("PROFILE_CACHE_TTL")) if os.getenv("PROFILE_CACHE_TTL") else None,
+    sync_new=os.getenv("PROFILE_SYNC_NEW", "0") == "1",
+)
+
+# Login codes and phone -> profile_id records; each login is one
+# compare-and-set on phone_numbers/<phone>
+phone_logins = PhoneLogins(
+    db,
+    cache_ttl=float(os.getenv("PHONE_CACHE_TTL", "600")),
+    cache_size=int(os.getenv("PHONE_CACHE_SIZE", "10000")),
+)
+
+# Login SMS go out from background workers (SMS_BACKEND=twilio|fake|none);
+# /request_code returns once the code is saved. Delivery status is stored on
+# the phone record.
+sms_sender = make_sms_sender(TWILIO_SID, TWILIO_TOKEN, TWILIO_FROM)
+sms_queue = None
+if sms_sender is not None:
+    sms_queue = SmsQueue(
+        sms_sender,
+        on_status=phone_logins.record_delivery,
+        workers=int(os.getenv("SMS_WORKERS", "4")),
+        min_interval=float(os.getenv("SMS_MIN_INTERVAL", "15")),
+        max_attempts=int(os.getenv("SMS_MAX_ATTEMPTS", "5")),
+    )
+
+# On shutdown let model calls still in flight finish (then the SMS queue
+# drains and queued profile writes are flushed; atexit runs in reverse order)
+atexit.register(router.close, float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30")))
+
+STATS_COUNTERS = ["profiles_created", "cvs_generated"]
+# /stats totals: one atomic UPSERT per increment in a SQLite file, so every
+# worker process counts into (and reports) the same numbers
+stats_counters = SharedCounters(os.getenv("STATS_DB_PATH", "data/stats.db"), STATS_COUNTERS)
+
+
+def stats_metric_lines():
+    lines = []
+    for name, value in stats_counters.values(STATS_COUNTERS).items():
+        lines += [
+            f"# HELP spanisami_{name}_total {name.replace('_', ' ').capitalize()} (all workers).",
+            f"# TYPE spanisami_{name}_total counter",
+            f"spanisami_{name}_total {value}",
+        ]
+    return lines
+
+
+metrics.registry.add_collector(stats_metric_lines)
+
+# Cache of model answers keyed on normalised prompt inputs + model name.
+# Set CACHE_DB_PATH to add a shared on-disk tier (SQLite).
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "512")),
+    db_path=os.getenv("CACHE_DB_PATH") or None,
+    ttl_seconds=int(os.getenv("CACHE_TTL_SECONDS", str(24 * 3600))),
+    max_disk_entries=int(os.getenv("CACHE_MAX_DISK_ENTRIES", "10000")),
+)
+
+# Identical model calls already in flight are joined, not repeated; requests
+# with an Idempotency-Key header are answered once across all workers
+single_flight = SingleFlight()
+idempotency_store = IdempotencyStore(
+    os.getenv("IDEMPOTENCY_DB_PATH", "data/idempotency.db"),
+    ttl_seconds=int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600))),
+)
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))
+
+# Resume state for /build_profiles_batch jobs
+batch_store = BatchJobStore(os.getenv("BATCH_DB_PATH", "data/batch_jobs.db"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+
+# Conversation history for voice/chat mode, bounded by idle TTL, session count
+# and turns per session. SESSION_BACKEND=sqlite shares it across processes.
+session_store = make_session_store()
+
+# CV PDFs are rendered here instead of in the browser; rendered bytes are
+# memoised by content hash. Fonts are loaded by warm_up(), below.
+cv_renderer = CvRenderer(max_cache_bytes=int(os.getenv("CV_PDF_CACHE_BYTES", str(64 * 1024 * 1024))))
+
+# Job postings for /match_jobs, indexed in memory and re-synced when the file changes
+job_index = JobIndex(os.getenv(
+    "JOBS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed_data", "jobs.jsonl"),
+))
+MATCH_JOBS_MAX_K = 50
+
+# Nearby jobs for the Job Scanner map: the same postings on a lat/lng grid,
+# with towns geocoded from a local gazetteer instead of a geocoding API
+geo_index = GeoIndex(job_index.path)
+gazetteer = Gazetteer(os.getenv(
+    "GAZETTEER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed_data", "za_places.csv"),
+))
+JOBS_NEAR_DEFAULT_KM = 10
+JOBS_NEAR_MAX_KM = 200
+JOBS_NEAR_MAX_RESULTS = 500
+
+# Only the last few turns go to the model verbatim; older ones are folded
+# into a running summary once the window overflows.
+context_window = ContextWindow(
+    keep_turns=int(os.getenv("CONTEXT_KEEP_TURNS", "12")),
+    token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500")),
+)
+
+# Interview mode asks pre-written questions per language (question_banks/):
+# the opening turn needs no model call and later turns only need the model
+# for feedback. QUESTION_BANK=0 leaves every turn to the model.
+question_banks = make_question_banks()
+
+# Voice mode on the server: /transcribe and /speak (STT_BACKEND and
+# TTS_BACKEND = openai | local). Synthesised audio is cached by (engine,
+# voice, language, text) in memory and, with AUDIO_CACHE_DIR, in a folder
+# every worker shares.
+transcriber = make_transcriber()
+synthesizer = make_synthesizer()
+audio_cache = AudioCache(
+    max_bytes=int(os.getenv("AUDIO_CACHE_BYTES", str(32 * 1024 * 1024))),
+    directory=os.getenv("AUDIO_CACHE_DIR") or None,
+    max_disk_bytes=int(os.getenv("AUDIO_CACHE_DISK_BYTES", str(512 * 1024 * 1024))),
+)
+transcription_uploads = TranscriptionUploads(
+    os.getenv("TRANSCRIBE_UPLOAD_DIR", "data/transcribe_uploads"),
+    max_bytes=int(os.getenv("TRANSCRIBE_MAX_BYTES", str(25 * 1024 * 1024))),
+)
+SPEAK_MAX_CHARS = int(os.getenv("SPEAK_MAX_CHARS", "2000"))
+AUDIO_CHUNK_SIZE = 32 * 1024
 
-# In-memory store for demo
-profiles = {}  # {profile_id: profile_json_text}
-stats = {
-    "profiles_created": 0,
-    "cvs_generated": 0,
-}
 
-# Conversation history for voice/chat mode
-conversations = {}  # {session_id: [ {"role": "user"/"assistant", "content": "..."}, ... ]}
+# ---------------------------------------------------
+# WARM-UP
+# ---------------------------------------------------
+# Importing this module opens no connections and loads no fonts, so a new
+# worker starts accepting quickly. The rest is loaded by warm_up() in a
+# background thread once the server is up: serve.py starts it when uvicorn
+# is listening, and under any other server the first request does.
+# WARM_UP=0 leaves everything to the first request that needs it.
+WARM_UP = os.getenv("WARM_UP", "1") == "1"
+warm_up_status = {}  # {step: seconds taken, or the error}; shown in /stats
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+def warm_up():
+    steps = [
+        ("cv_fonts", cv_renderer.warm),
+        ("geo_tiles", geo_index.warm_tiles),
+        ("database", warm_database),
+        ("llm", llm.warm),
+        ("stt", transcriber.warm),
+        ("tts", synthesizer.warm),
+    ]
+    if hasattr(sms_sender, "warm"):
+        steps.append(("sms", sms_sender.warm))
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+            warm_up_status[name] = round(time.perf_counter() - started, 3)
+        except Exception as e:
+            # Not fatal: the first request that needs it retries (and reports) the error
+            warm_up_status[name] = f"error: {e}"
+
+
+def start_warm_up():
+    """Run warm_up() in a background thread, once per process."""
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    if not WARM_UP:
+        return
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+@app.before_request
+def _warm_up_on_first_request():
+    if not _warm_up_started:
+        start_warm_up()
+
+
+# ---------------------------------------------------
+# STREAMING HELPERS (NDJSON)
+# ---------------------------------------------------
+def wants_stream(data):
+    """Client asks for streaming with {"stream": true} or an NDJSON Accept header."""
+    if data.get("stream"):
+        return True
+    return "application/x-ndjson" in (request.headers.get("Accept") or "")
+
+
+def cache_bypassed(data):
+    """Per-request opt-out: {"no_cache": true} or a Cache-Control: no-cache header."""
+    if data.get("no_cache"):
+        return True
+    return "no-cache" in (request.headers.get("Cache-Control") or "")
+
+
+def bad_profile_id(profile_id):
+    """A 400 response for a profile_id that could not have come from us, else None."""
+    if not profile_id or valid_profile_id(profile_id):
+        return None
+    return jsonify({"error": "Invalid profile_id"}), 400
+
+
+def known_profile(profile_id):
+    """A client-sent profile_id is only written to if it has a record or a login issued it."""
+    return profile_store.get(profile_id) is not None or phone_logins.issued(profile_id)
+
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header: the first request runs, repeats with
+    the same key (on any worker) get its stored response, and a repeat that
+    arrives while the first is running waits for it. Streamed responses are
+    stored as they are sent. 5xx answers are not stored, so a retry runs again.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        header = (request.headers.get("Idempotency-Key") or "").strip()
+        if not header:
+            return view(*args, **kwargs)
+
+        key = f"{request.path}:{header}"
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        try:
+            stored = idempotency_store.acquire(key, fingerprint, wait_timeout=IDEMPOTENCY_WAIT_SECONDS)
+        except IdempotencyConflict:
+            return jsonify({"error": "Idempotency-Key was already used with a different request body"}), 422
+        except IdempotencyBusy:
+            return jsonify({"error": "A request with this Idempotency-Key is still running"}), 409
+        if stored is not None:
+            return Response(stored.body, status=stored.status, mimetype=stored.mimetype,
+                            headers={"Idempotent-Replayed": "true"})
+
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            idempotency_store.release(key)
+            raise
+        if response.status_code >= 500:
+            idempotency_store.release(key)
+            return response
+        if not response.is_streamed:
+            idempotency_store.finish(key, StoredResponse(response.status_code, response.mimetype, response.get_data()))
+            return response
+
+        status, mimetype, body = response.status_code, response.mimetype, response.response
+
+        def tee():
+            sent, finished = [], False
+            try:
+                for chunk in body:
+                    sent.append(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8"))
+                    yield chunk
+                finished = True
+            finally:
+                if finished and not _ends_with_error_event(mimetype, sent):
+                    idempotency_store.finish(key, StoredResponse(status, mimetype, b"".join(sent)))
+                else:
+                    idempotency_store.release(key)
+
+        response.response = tee()
+        return response
+
+    return wrapper
+
+
+def _ends_with_error_event(mimetype, chunks):
+    """An NDJSON stream that ended in {"type": "error"} failed, whatever its status code."""
+    if mimetype != "application/x-ndjson" or not chunks:
+        return False
+    try:
+        return json.loads(chunks[-1]).get("type") == "error"
+    except ValueError:
+        return False
+
+
+def ndjson_line(obj):
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+
+def ndjson_response(events):
+    """
+    Wrap a generator of dict events into a chunked NDJSON response.
+    Each event is flushed as soon as it is yielded, so the phone can render
+    model deltas while the rest of the answer is still being generated.
+    """
+    return Response(
+        stream_with_context(ndjson_line(e) for e in events),
+        mimetype="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # stop nginx-style proxies from buffering
+        },
+    )
 
 
 # ---------------------------------------------------
@@ -44,95 +382,173 @@ conversations = {}  # {session_id: [ {"role": "user"/"assistant", "content": "..
 # ---------------------------------------------------
 @app.route("/test", methods=["GET"])
 def test_api():
-    """Check Flask + OpenAI are working."""
+    """Check Flask + the model backend are working."""
     try:
-        response = client.responses.create(
-            model="gpt-5.1",
-            input="Say hello to the Kion Consulting Hackathon in one friendly sentence.",
+        completion = router.complete(
+            "test",
+            prompt="Say hello to the Kion Consulting Hackathon in one friendly sentence.",
         )
-        return jsonify({"message": response.output_text})
+        return jsonify({"message": completion.text, "llm_backend": llm.name, "model": completion.model})
     except Exception as e:
-        return jsonify({"error": "OpenAI test failed", "details": str(e)}), 500
+        return jsonify({"error": f"{llm.name} test failed", "details": str(e)}), 500
 
 
 # ---------------------------------------------------
 # 1) BUILD PROFILE – FROM RAW TEXT TO STRUCTURED PROFILE
 # ---------------------------------------------------
 @app.route("/build_profile", methods=["POST"])
+@idempotent
 def build_profile():
     data = request.get_json(force=True) or {}
     raw_text = (data.get("raw_text") or "").strip()
     preferred_language = data.get("preferred_language", "en")
+    profile_id = data.get("profile_id")
 
     if not raw_text:
         return jsonify({"error": "raw_text is required"}), 400
-
-    prompt = f"""
-You are helping a South African youth write a job-ready profile.
-
-The youth wrote the following about themselves (informal, mixed language):
-
-\"\"\"{raw_text}\"\"\"
-
-1. Read what they wrote.
-2. Extract:
-   - name (if mentioned, else null)
-   - location (if mentioned, else null)
-   - education (best guess or 'Unknown')
-   - key skills (list)
-   - informal experience (list, convert to professional wording)
-   - languages (list, if mentioned or easily inferred)
-3. Return ONLY valid JSON in this format:
-
-{{
-  "name": "...",
-  "location": "...",
-  "education": "...",
-  "skills": ["..."],
-  "experience": [
-    {{
-      "role": "...",
-      "description": "..."
-    }}
-  ],
-  "languages": ["English"],
-  "summary": "Short friendly summary for a CV, suitable for South African employers."
-}}
-
-Respond in {preferred_language}.
-"""
+    rejected = bad_profile_id(profile_id)
+    if rejected:
+        return rejected
+    # Logged-in users keep the profile_id issued by /verify_code; any other id is refused
+    if profile_id and not known_profile(profile_id):
+        return jsonify({"error": "profile_id not found"}), 404
 
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4.1-mini",
+        profile, cached = run_build_profile(
+            raw_text, preferred_language, use_cache=not cache_bypassed(data)
+        )
+
+        profile_id = profile_id or str(uuid.uuid4())
+        profile_store.save_profile(profile_id, profile.to_dict(), preferred_language=preferred_language)
+        stats_counters.inc("profiles_created")
+
+        return jsonify({
+            "profile_id": profile_id,
+            "profile": profile.to_dict(),
+            "cached": cached,
+            "prompt_version": prompts.version("build_profile"),
+        })
+
+    except Exception as e:
+        return jsonify({"error": "Failed to build profile", "details": str(e)}), 500
+
+
+def run_build_profile(raw_text, preferred_language, use_cache=True):
+    """Model call behind /build_profile and batches. Returns (Profile, cached)."""
+    model = router.primary_model("build_profile")
+    cache_key = make_key(
+        "build_profile", model,
+        prompt_version=prompts.version("build_profile"),
+        raw_text=raw_text,
+        preferred_language=preferred_language,
+    )
+
+    if use_cache:
+        cached_text = response_cache.get(cache_key)
+        if cached_text is not None:
+            return parse_profile(cached_text), True
+
+    # A double tap or retry while this exact call is running waits for it
+    profile, shared = single_flight.do(
+        cache_key, lambda: _call_build_profile(raw_text, preferred_language, cache_key),
+    )
+    return profile, shared
+
+
+def _call_build_profile(raw_text, preferred_language, cache_key):
+    prompt = prompts.render("build_profile", raw_text=raw_text, preferred_language=preferred_language)
+
+    # Structured output, then a local repair pass (code fences, truncation).
+    # Only if that fails too do we pay for one more model call.
+    for attempt in range(2):
+        completion = router.complete(
+            "build_profile",
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that outputs strict JSON."},
                 {"role": "user", "content": prompt},
             ],
+            json_schema=PROFILE_JSON_SCHEMA,
         )
-        profile_json_text = completion.choices[0].message.content.strip()
+        try:
+            profile = parse_profile(completion.text)
+            break
+        except ProfileParseError:
+            if attempt == 1:
+                raise
 
-        profile_id = str(uuid.uuid4())
-        profiles[profile_id] = profile_json_text
-        stats["profiles_created"] += 1
+    response_cache.set(cache_key, profile.to_json())
+    return profile
 
-        return jsonify({"profile_id": profile_id, "profile": profile_json_text})
 
-    except Exception as e:
-        return jsonify({"error": "Failed to build profile", "details": str(e)}), 500
+# ---------------------------------------------------
+# 1b) BATCH PROFILES – BULK ONBOARDING FROM NGO SPREADSHEETS
+# ---------------------------------------------------
+@app.route("/build_profiles_batch", methods=["POST"])
+def build_profiles_batch():
+    """
+    Upload a CSV (raw_text[,preferred_language] header) or JSONL file as
+    multipart field "file", or as the raw request body.
+    Query/form params:
+      job_id       – resume an earlier job; rows that already succeeded are skipped
+      concurrency  – parallel model calls (capped by BATCH_MAX_CONCURRENCY)
+    Streams one JSON line per row as it finishes.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        payload, filename = upload.read(), upload.filename or ""
+    else:
+        payload = request.get_data()
+        filename = "upload.csv" if "csv" in (request.content_type or "") else "upload.jsonl"
+
+    params = request.values
+    try:
+        rows = parse_rows(payload, filename)
+        concurrency = int(params.get("concurrency", BATCH_CONCURRENCY))
+    except ValueError as e:
+        return jsonify({"error": "Could not read batch file", "details": str(e)}), 400
+
+    if not rows:
+        return jsonify({"error": "Batch file has no rows"}), 400
+
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    events = run_batch(
+        rows,
+        build_fn=_build_profile_for_batch,
+        save_fn=_save_batch_profile,
+        store=batch_store,
+        job_id=params.get("job_id") or None,
+        concurrency=concurrency,
+    )
+    return ndjson_response(events)
+
+
+def _build_profile_for_batch(raw_text, preferred_language):
+    profile, _ = run_build_profile(raw_text, preferred_language)
+    stats_counters.inc("profiles_created")
+    return profile.to_dict()
+
+
+def _save_batch_profile(profile_dict, preferred_language):
+    # Same store and record shape as /build_profile
+    profile_id = str(uuid.uuid4())
+    profile_store.save_profile(profile_id, profile_dict, preferred_language=preferred_language)
+    return profile_id
 
 
 # ---------------------------------------------------
 # 2) GENERATE CV – FROM PROFILE TO CV TEXT
 # ---------------------------------------------------
 @app.route("/generate_cv", methods=["POST"])
+@idempotent
 def generate_cv():
     """
     Frontend sends:
     {
       "profile_id": "...",          # preferred
       "profile": { ... } or "...",  # optional
-      "target_role": "cashier"      # optional
+      "target_role": "cashier",     # optional
+      "stream": true,               # optional – NDJSON deltas instead of one JSON blob
+      "no_cache": true              # optional – skip the response cache
     }
     """
     data = request.get_json(force=True) or {}
@@ -143,56 +559,376 @@ def generate_cv():
 
     if profile is None and profile_id is None:
         return jsonify({"error": "Send either 'profile' or 'profile_id'"}), 400
-
-    # If only profile_id is given, load stored profile text
+    rejected = bad_profile_id(profile_id)
+    if rejected:
+        return rejected
+    # The CV is stored under profile_id, so it has to be a real one
+    if profile is not None and profile_id and not known_profile(profile_id):
+        return jsonify({"error": "profile_id not found"}), 404
+
+    # If only profile_id is given, load the stored profile (cached after first read)
     if profile is None and profile_id:
-        stored = profiles.get(profile_id)
-        if not stored:
+        record = profile_store.get(profile_id)
+        if not record or not record.get("profile"):
             return jsonify({"error": "profile_id not found"}), 404
-        profile_text = stored
+        try:
+            parsed = parse_profile(record["profile"])
+        except ProfileParseError as e:
+            return jsonify({"error": "Stored profile is unreadable", "details": str(e)}), 500
     else:
-        # profile may be dict or already a JSON string
-        if isinstance(profile, str):
-            profile_text = profile
+        # profile may be dict or a JSON string (possibly fenced/truncated)
+        try:
+            parsed = parse_profile(profile)
+        except ProfileParseError as e:
+            return jsonify({"error": "profile is not valid profile JSON", "details": str(e)}), 400
+
+    profile_dict = parsed.to_dict()
+    prompt = prompts.render(
+        "generate_cv",
+        profile=json.dumps(profile_dict, ensure_ascii=False, indent=2),
+        target_role=target_role or "(none)",
+    )
+
+    model = router.primary_model("generate_cv")
+    cache_key = make_key(
+        "generate_cv", model,
+        prompt_version=prompts.version("generate_cv"),
+        profile=profile_dict,
+        target_role=target_role,
+    )
+    cached_cv = None if cache_bypassed(data) else response_cache.get(cache_key)
+
+    if wants_stream(data):
+        return ndjson_response(_stream_cv(prompt, model, cache_key, profile_id, cached_cv))
+
+    try:
+        shared = False
+        if cached_cv is not None:
+            cv_text = cached_cv
         else:
-            profile_text = json.dumps(profile, indent=2)
+            cv_text, shared = single_flight.do(cache_key, lambda: _call_generate_cv(prompt, model, cache_key))
 
-    role_line = f"This CV should be tailored towards a job as '{target_role}'.\n" if target_role else ""
+        if profile_id:
+            profile_store.update_cv(profile_id, cv_text)
+        stats_counters.inc("cvs_generated")
 
-    prompt = f"""
-You are a helpful assistant generating a clean, simple CV for a South African youth.
+        return jsonify({
+            "cv": cv_text,
+            "cached": cached_cv is not None or shared,
+            "prompt_version": prompts.version("generate_cv"),
+        })
 
-Use the following profile data:
+    except Exception as e:
+        return jsonify({"error": "Failed to generate CV", "details": str(e)}), 500
 
-PROFILE:
-{profile_text}
 
-{role_line}
-Create a CV with clearly separated sections:
-- Personal Details (name, location – keep it simple, no ID numbers)
-- Summary (2–3 lines, friendly and positive)
-- Education
-- Work Experience OR Informal Experience (use professional wording)
-- Skills (bullet list)
-- Languages
+def _call_generate_cv(prompt, model, cache_key):
+    completion = router.complete("generate_cv", prompt=prompt)
+    # A fallback tier's CV is served but not cached under the primary model's key
+    if completion.model == model:
+        response_cache.set(cache_key, completion.text)
+    return completion.text
 
-Write it in clear, simple English, suitable for South African entry-level jobs.
-No JSON, just the CV text.
-"""
 
+def _stream_cv(prompt, model, cache_key, profile_id=None, cached_cv=None):
+    """Yield {"type": "delta"} events as the model writes, then a final "done"."""
+    if cached_cv is not None:
+        if profile_id:
+            profile_store.update_cv(profile_id, cached_cv)
+        stats_counters.inc("cvs_generated")
+        yield {"type": "delta", "text": cached_cv}
+        yield {"type": "done", "cv": cached_cv, "cached": True, "prompt_version": prompts.version("generate_cv")}
+        return
+
+    # The same CV already being written for another request: wait and send it whole
+    flight, leader = single_flight.join(cache_key)
+    if not leader:
+        try:
+            cv_text = single_flight.wait(flight)
+        except Exception as e:
+            yield {"type": "error", "error": "Failed to generate CV", "details": str(e)}
+            return
+        if profile_id:
+            profile_store.update_cv(profile_id, cv_text)
+        stats_counters.inc("cvs_generated")
+        yield {"type": "delta", "text": cv_text}
+        yield {"type": "done", "cv": cv_text, "cached": True, "prompt_version": prompts.version("generate_cv")}
+        return
+
+    parts = []
+    cv_text, error = None, None
     try:
-        response = client.responses.create(
-            model="gpt-5.1",
-            input=prompt,
-        )
+        stream = router.stream("generate_cv", prompt=prompt)
+        for delta in stream:
+            parts.append(delta)
+            yield {"type": "delta", "text": delta}
+
+        cv_text = "".join(parts)
+        if stream.model == model:
+            response_cache.set(cache_key, cv_text)
+        if profile_id:
+            profile_store.update_cv(profile_id, cv_text)
+        stats_counters.inc("cvs_generated")
+        yield {"type": "done", "cv": cv_text, "cached": False, "prompt_version": prompts.version("generate_cv")}
+
+    except Exception as e:
+        error = e
+        yield {"type": "error", "error": "Failed to generate CV", "details": str(e)}
+    finally:
+        # Also on client disconnect (GeneratorExit), so waiters never hang
+        if cv_text is None and error is None:
+            error = RuntimeError("the identical request streaming this CV was cancelled")
+        single_flight.resolve(cache_key, flight, result=cv_text, error=error)
+
+
+# ---------------------------------------------------
+# 2b) CV AS PDF – RENDERED ON THE SERVER
+# ---------------------------------------------------
+PDF_CHUNK_SIZE = 64 * 1024
 
-        cv_text = response.output_text
-        stats["cvs_generated"] += 1
 
-        return jsonify({"cv": cv_text})
+@app.route("/cv_pdf", methods=["GET", "POST"])
+def cv_pdf():
+    """
+    GET  /cv_pdf?profile_id=...               – the stored CV
+    POST {"cv": "...", "profile_id": "..."}   – cv text wins over profile_id
+    Optional: template ("classic" | "compact").
+    Streams application/pdf; identical CVs are served from the render cache,
+    and If-None-Match with the returned ETag gets a 304.
+    """
+    data = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+    cv_text = data.get("cv")
+    profile_id = data.get("profile_id")
+    template = data.get("template") or "classic"
+    rejected = bad_profile_id(profile_id)
+    if rejected:
+        return rejected
+
+    if not isinstance(template, str) or template not in CV_TEMPLATES:
+        return jsonify({"error": f"Unknown template: {template}"}), 400
+
+    if not cv_text and profile_id:
+        record = profile_store.get(profile_id)
+        cv_text = (record or {}).get("cv")
+        if not cv_text:
+            return jsonify({"error": "No CV stored for this profile_id"}), 404
+    if not cv_text:
+        return jsonify({"error": "Send either 'cv' or 'profile_id'"}), 400
+
+    etag = cv_renderer.content_hash(cv_text, template)
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
 
+    try:
+        pdf_bytes, etag = cv_renderer.render(cv_text, template)
     except Exception as e:
-        return jsonify({"error": "Failed to generate CV", "details": str(e)}), 500
+        return jsonify({"error": "Failed to render CV PDF", "details": str(e)}), 500
+
+    def chunks():
+        view = memoryview(pdf_bytes)
+        for start in range(0, len(view), PDF_CHUNK_SIZE):
+            yield bytes(view[start:start + PDF_CHUNK_SIZE])
+
+    return Response(
+        chunks(),
+        mimetype="application/pdf",
+        headers={
+            "Content-Length": str(len(pdf_bytes)),
+            "Content-Disposition": 'attachment; filename="SpaniSami_CV.pdf"',
+            "ETag": f'"{etag}"',
+            "Cache-Control": "private, max-age=86400",
+        },
+    )
+
+
+# ---------------------------------------------------
+# 2c) MEDIA UPLOAD – VOICE NOTES, VIDEO CVS, DOCUMENTS
+# ---------------------------------------------------
+@app.route("/upload_media", methods=["POST", "PUT"])
+def upload_media():
+    """
+    Multipart field "file", or the raw request body with ?filename=...
+    Params: profile_id (optional) – attach the upload to this profile.
+    The file is streamed to storage in parts, never held whole in memory.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        source, filename = upload.stream, upload.filename or ""
+        content_type = upload.mimetype if upload.mimetype not in ("", "application/octet-stream") else None
+        size = _stream_size(source)
+    else:
+        source, filename = request.stream, request.args.get("filename", "")
+        content_type = None
+        size = request.content_length
+
+    if not filename:
+        return jsonify({"error": "filename is required"}), 400
+    profile_id = request.values.get("profile_id")
+    rejected = bad_profile_id(profile_id)
+    if rejected:
+        return rejected
+    if profile_id and not known_profile(profile_id):
+        return jsonify({"error": "profile_id not found"}), 404
+
+    try:
+        result = upload_fileobj(source, filename, content_type=content_type, size=size)
+    except UploadError as e:
+        return jsonify({"error": "Upload failed", "details": str(e)}), 502
+
+    if profile_id:
+        # Queued with any other pending writes for this profile, not a separate call
+        profile_store.update_fields(profile_id, **media_record(result))
+
+    return jsonify({**result, "profile_id": profile_id})
+
+
+def _stream_size(stream):
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END) - position
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+# ---------------------------------------------------
+# 2d) MATCH JOBS – RANK POSTINGS AGAINST A PROFILE
+# ---------------------------------------------------
+@app.route("/match_jobs", methods=["GET", "POST"])
+def match_jobs():
+    """
+    GET  /match_jobs?profile_id=...&k=10&city=Durban
+    POST {"profile_id": "..."} or {"profile": {...}}, plus optional k and city.
+    city defaults to the town named in the profile's location.
+    No model call: jobs are ranked from the local index.
+    """
+    data = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+    profile = data.get("profile")
+    profile_id = data.get("profile_id")
+    rejected = bad_profile_id(profile_id)
+    if rejected:
+        return rejected
+
+    try:
+        k = max(1, min(int(data.get("k", 10)), MATCH_JOBS_MAX_K))
+    except (TypeError, ValueError):
+        return jsonify({"error": "k must be a number"}), 400
+
+    if profile is None and profile_id:
+        record = profile_store.get(profile_id)
+        if not record or not record.get("profile"):
+            return jsonify({"error": "profile_id not found"}), 404
+        profile = record["profile"]
+    if profile is None:
+        return jsonify({"error": "Send either 'profile' or 'profile_id'"}), 400
+
+    try:
+        parsed = parse_profile(profile)
+    except ProfileParseError as e:
+        return jsonify({"error": "profile is not valid profile JSON", "details": str(e)}), 400
+
+    started = time.perf_counter()
+    job_index.refresh_if_changed()
+    city = data.get("city") or job_index.city_for(parsed.location)
+    matches = job_index.match_profile(parsed, k=k, city=city)
+
+    return jsonify({
+        "jobs": [{**job, "score": round(score, 4)} for job, score in matches],
+        "city": city,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
+
+
+# ---------------------------------------------------
+# 2e) JOBS NEAR – RADIUS / NEAREST LOOKUPS FOR THE MAP
+# ---------------------------------------------------
+@app.route("/jobs_near", methods=["GET"])
+def jobs_near():
+    """
+    GET /jobs_near?lat=-29.86&lng=31.02&radius_km=10
+    GET /jobs_near?profile_id=...&k=5        – k nearest instead of a radius
+    GET /jobs_near?town=Umlazi
+    The centre is lat/lng if given, else the town, else the profile's location.
+    At most JOBS_NEAR_MAX_RESULTS jobs, nearest first. Also returns the ids of
+    the tiles covering the radius, for /job_tiles.
+    """
+    args = request.args
+    try:
+        k = int(args["k"]) if args.get("k") else None
+        default_km = JOBS_NEAR_DEFAULT_KM if k is None else JOBS_NEAR_MAX_KM
+        radius_km = float(args.get("radius_km", default_km))
+    except ValueError:
+        return jsonify({"error": "radius_km and k must be numbers"}), 400
+    # float() also accepts "nan" and "inf", which would break the tile maths
+    if not math.isfinite(radius_km) or radius_km <= 0 or (k is not None and k <= 0):
+        return jsonify({"error": "radius_km and k must be positive, finite numbers"}), 400
+    radius_km = min(radius_km, JOBS_NEAR_MAX_KM)
+
+    center = None
+    if args.get("lat") and args.get("lng"):
+        try:
+            lat, lng = float(args["lat"]), float(args["lng"])
+        except ValueError:
+            return jsonify({"error": "lat and lng must be numbers"}), 400
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({"error": "lat must be within [-90, 90] and lng within [-180, 180]"}), 400
+        center = {"name": None, "province": None, "lat": lat, "lng": lng}
+    else:
+        town = args.get("town")
+        if not town and args.get("profile_id"):
+            rejected = bad_profile_id(args["profile_id"])
+            if rejected:
+                return rejected
+            record = profile_store.get(args["profile_id"])
+            if not record:
+                return jsonify({"error": "profile_id not found"}), 404
+            # Older and batch-built records hold the profile as a JSON string
+            try:
+                town = parse_profile(record.get("profile")).location
+            except ProfileParseError as e:
+                return jsonify({"error": "Stored profile is unreadable", "details": str(e)}), 422
+        if not town:
+            return jsonify({"error": "Send lat and lng, town, or profile_id"}), 400
+        place = gazetteer.lookup(town)
+        if place is None:
+            return jsonify({"error": f"Unknown town: {town}"}), 404
+        center = place.to_dict()
+
+    started = time.perf_counter()
+    if geo_index.refresh_if_changed():
+        geo_index.warm_tiles()
+    if k is not None:
+        found = geo_index.nearest(center["lat"], center["lng"], min(k, MATCH_JOBS_MAX_K), max_km=radius_km)
+        # Tiles out to the furthest of the k, not the whole search limit
+        radius_km = found[-1][1] if found else 0.0
+    else:
+        found = geo_index.within(center["lat"], center["lng"], radius_km, limit=JOBS_NEAR_MAX_RESULTS)
+
+    return jsonify({
+        "center": center,
+        "radius_km": round(radius_km, 2),
+        "jobs": [{**job, "distance_km": round(distance, 2)} for job, distance in found],
+        "tiles": [tile_id(t) for t in geo_index.tiles_covering(center["lat"], center["lng"], radius_km)],
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
+
+
+@app.route("/job_tiles/<tile>", methods=["GET"])
+def job_tiles(tile):
+    """
+    All jobs in one grid tile, precomputed; the phone caches tiles by ETag.
+    """
+    try:
+        key = parse_tile_id(tile)
+    except ValueError:
+        return jsonify({"error": f"Bad tile id: {tile}"}), 400
+
+    etag, body = geo_index.tile(key)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "public, max-age=300"}
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype="application/json", headers=headers)
 
 
 # ---------------------------------------------------
@@ -201,17 +937,41 @@ No JSON, just the CV text.
 @app.route("/stats", methods=["GET"])
 def get_stats():
     return jsonify({
-        "profiles_created": stats["profiles_created"],
-        "cvs_generated": stats["cvs_generated"],
-        "profiles_in_memory": len(profiles),
+        **stats_counters.values(STATS_COUNTERS),
+        "profiles_in_memory": profile_store.stats()["cached_profiles"],
+        "profile_store": profile_store.stats(),
+        "response_cache": response_cache.stats(),
+        "sessions": session_store.stats(),
+        "cv_pdf": cv_renderer.stats(),
+        "job_index": job_index.stats(),
+        "geo": geo_index.stats(),
+        "models": router.stats(),
+        "coalescing": {**single_flight.stats(), "idempotency": idempotency_store.stats()},
+        "phone_logins": phone_logins.stats(),
+        "sms": sms_queue.stats() if sms_queue else None,
+        "audio_cache": audio_cache.stats(),
+        "question_bank": question_bank_stats(),
+        "warm_up": warm_up_status,
     })
 
 
+def question_bank_stats():
+    """Loaded banks, plus how many interview turns were answered without the model."""
+    turns = {source: metrics.CHAT_TURNS.value(mode="interview", source=source) for source in CHAT_TURN_SOURCES}
+    total = sum(turns.values())
+    return {
+        **(question_banks.stats() if question_banks else {"banks": {}}),
+        "interview_turns": turns,
+        "served_without_model": round(turns["bank"] / total, 3) if total else None,
+    }
+
+
 # ---------------------------------------------------
 # 3) CHAT – TALK TO SPANISAMI (CV builder or interview mode)
 # ---------------------------------------------------
 @app.route("/chat", methods=["POST"])
 def chat():
+    started = time.perf_counter()
     data = request.get_json(force=True) or {}
     user_message = (data.get("message") or "").strip()
     language = data.get("language", "en")
@@ -220,65 +980,271 @@ def chat():
 
     if not user_message:
         return jsonify({"error": "message is required"}), 400
+    if not isinstance(language, str):
+        return jsonify({"error": "language must be a string, e.g. \"zu\""}), 400
+
+    user_turn = {"role": "user", "content": user_message}
+    history = session_store.get(session_id) + [user_turn]
+    summary = session_store.get_summary(session_id)
+
+    scripted = question_banks.plan(language, history) if mode == "interview" and question_banks else None
+    if scripted is not None and scripted.reply:
+        # The opening question comes straight from the bank
+        session_store.append(session_id, user_turn, {"role": "assistant", "content": scripted.reply})
+        record_chat_turn(mode, "bank", started)
+        context_info = {"prompt_tokens_estimate": 0, "question_bank": scripted.bank}
+        if wants_stream(data):
+            return ndjson_response(iter([
+                {"type": "start", "session_id": session_id},
+                {"type": "delta", "text": scripted.reply},
+                {"type": "done", "session_id": session_id, "reply": scripted.reply, "context": context_info},
+            ]))
+        return jsonify({"session_id": session_id, "reply": scripted.reply, "context": context_info})
+
+    to_fold, recent = context_window.split(history)
+    if to_fold:
+        try:
+            summary = summarise_turns(summary, to_fold)
+            session_store.fold(session_id, summary, len(to_fold))
+        except Exception as e:
+            # Still send the trimmed window; folding is retried next turn
+            app.logger.warning(f"Summarising session {session_id} failed: {e}")
+
+    # Language and mode sit at the end of the template, so the long
+    # instruction prefix is identical for every request
+    if scripted is not None:
+        # The model only writes feedback on the bank question just answered;
+        # the next question is added from the bank after it
+        prompt_name, source, follow_up = "interview_feedback", "feedback", scripted.follow_up
+        system_prompt = prompts.render_cached(
+            prompt_name, language=language, question=scripted.answered.text, rubric=scripted.answered.rubric_text,
+        )
+    else:
+        prompt_name, source, follow_up = "chat_system", "model", ""
+        system_prompt = prompts.render_cached(prompt_name, language=language, mode=mode)
+
+    messages = context_window.build(system_prompt, summary, recent)
+    context_info = {
+        "prompt_tokens_estimate": count_message_tokens(messages),
+        "recent_turns": len(recent),
+        "summarised": bool(summary),
+        "prompt_version": prompts.version(prompt_name),
+    }
+    if scripted is not None:
+        context_info["question_bank"] = scripted.bank
+    first_text = functools.partial(record_chat_turn, mode, source, started)
 
-    history = conversations.setdefault(session_id, [])
-    history.append({"role": "user", "content": user_message})
-
-    system_prompt = f"""
-You are SpaniSami, a friendly South African AI assistant.
-
-Language code: {language}.
-- Always reply mainly in this South African language.
-- It is OK to mix simple English with that language if it makes things clearer.
-- Keep sentences short and youth-friendly.
-
-Mode: {mode}
-
-If mode is "cv":
-  - Your job is to ask the user questions so that you can build a strong CV.
-  - Ask ONE clear question at a time.
-  - Ask about:
-      * full name
-      * where they live (town / area)
-      * education (highest grade, school/college, any courses)
-      * side hustles, informal jobs, spaza/church/community work
-      * responsibilities at home (looking after siblings, cooking, etc.)
-      * computer or phone skills
-      * languages they can speak
-  - When the user answers, briefly acknowledge (1 short sentence), then ask the next question.
-  - When you have enough information, say something like:
-      "I think I have enough information to build your CV. If you say 'Create my CV',
-       I will send all your answers to the CV builder."
-
-If mode is "interview":
-  - Act like a realistic interviewer for entry-level jobs in South Africa.
-  - Ask one interview question at a time.
-  - After the user answers, give short, kind feedback and one suggestion to improve,
-    then ask the next question.
-  - Examples of topics: "Tell me about yourself", strengths and weaknesses,
-    dealing with difficult customers, working in a team, etc.
-
-Do NOT print any JSON. Only normal chat replies.
-""".strip()
-
-    messages = [{"role": "system", "content": system_prompt}] + history
+    if wants_stream(data):
+        return ndjson_response(_stream_chat(session_id, messages, user_turn, context_info, follow_up, first_text))
 
     try:
-        completion = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=messages,
-        )
-        assistant_text = completion.choices[0].message.content.strip()
-        history.append({"role": "assistant", "content": assistant_text})
+        completion = router.complete("chat", messages=messages)
+        assistant_text = completion.text.strip()
+        if follow_up:
+            assistant_text = f"{assistant_text}\n\n{follow_up}"
+        session_store.append(session_id, user_turn, {"role": "assistant", "content": assistant_text})
+        first_text()
 
-        return jsonify({"session_id": session_id, "reply": assistant_text})
+        context_info["prompt_tokens"] = completion.prompt_tokens
+
+        return jsonify({"session_id": session_id, "reply": assistant_text, "context": context_info})
 
     except Exception as e:
         return jsonify({"error": "Failed to chat", "details": str(e)}), 500
 
+
+def _stream_chat(session_id, messages, user_turn, context_info, follow_up="", first_text=None):
+    """
+    Yield chat deltas as they arrive. The turn is only saved to the session
+    store once the full reply is in, so a dropped connection never leaves
+    half an answer in the conversation. `follow_up` (the next bank question)
+    is sent after the model's reply; `first_text()` is called on the first delta.
+    """
+    yield {"type": "start", "session_id": session_id}
+
+    parts = []
+    try:
+        stream = router.stream("chat", messages=messages)
+        for delta in stream:
+            if not parts and first_text is not None:
+                first_text()
+            parts.append(delta)
+            yield {"type": "delta", "text": delta}
+        context_info["prompt_tokens"] = stream.prompt_tokens
+        if follow_up:
+            parts = ["".join(parts).strip(), f"\n\n{follow_up}"]
+            yield {"type": "delta", "text": parts[-1]}
+
+        assistant_text = "".join(parts).strip()
+        session_store.append(session_id, user_turn, {"role": "assistant", "content": assistant_text})
+        yield {"type": "done", "session_id": session_id, "reply": assistant_text, "context": context_info}
+
+    except Exception as e:
+        yield {"type": "error", "error": "Failed to chat", "details": str(e)}
+
+
+CHAT_TURN_SOURCES = ("bank", "feedback", "model")
+
+
+def record_chat_turn(mode, source, started):
+    """Count the turn by where its reply came from, and time its first text."""
+    metrics.CHAT_TURNS.inc(mode=mode, source=source)
+    metrics.CHAT_FIRST_TEXT_SECONDS.observe(time.perf_counter() - started, mode=mode, source=source)
+
+
+def summarise_turns(previous_summary, turns):
+    """Fold older chat turns into the running summary (one small model call)."""
+    transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    prompt = prompts.render(
+        "chat_summary",
+        previous_summary=previous_summary or "(none yet)",
+        transcript=transcript,
+    )
+    completion = router.complete(
+        "chat_summary",
+        messages=[
+            {"role": "system", "content": "You write compact, factual conversation summaries."},
+            {"role": "user", "content": prompt},
+        ],
+    )
+    return completion.text.strip()
+
+
+# ---------------------------------------------------
+# 3b) VOICE – SPEECH TO TEXT AND TEXT TO SPEECH
+# ---------------------------------------------------
+@app.route("/transcribe", methods=["POST", "PUT"])
+def transcribe():
+    """
+    Speech to text for voice mode.
+    Whole recording: the raw request body, or multipart field "file".
+    In chunks while recording: ?upload_id=...&seq=0, 1, 2, ... and final=1
+    on the last chunk (which may be empty). Only the final one transcribes.
+    Params: language (default "en").
+    Returns {"text", "language", "engine"}; other chunks get {"upload_id", "seq", "bytes"}.
+    """
+    language = request.args.get("language", "en")
+    upload = request.files.get("file")
+    source = upload.stream if upload is not None else request.stream
+    content_type = (upload.mimetype if upload is not None else request.mimetype) or "application/octet-stream"
+
+    chunked = bool(request.args.get("upload_id"))
+    upload_id = request.args.get("upload_id") or uuid.uuid4().hex
+    final = request.args.get("final", "0" if chunked else "1") == "1"
+    try:
+        seq = int(request.args.get("seq", "0"))
+    except ValueError:
+        return jsonify({"error": "seq must be an integer"}), 400
+
+    try:
+        state = transcription_uploads.append(upload_id, seq, source, content_type)
+    except AudioUploadError as e:
+        body = {"error": str(e)}
+        if e.expected_seq is not None:
+            body["expected_seq"] = e.expected_seq
+        return jsonify(body), e.status_code
+    if not final:
+        return jsonify({"upload_id": upload_id, "seq": state["seq"], "bytes": state["bytes"]})
+    if not state["bytes"]:
+        transcription_uploads.discard(upload_id)
+        return jsonify({"error": "No audio received"}), 400
+
+    audio, state = transcription_uploads.open(upload_id)
+    try:
+        with audio, metrics.track("speech", "transcribe"):
+            transcript = transcriber.transcribe(audio, language, state["content_type"] or content_type)
+    except SpeechError as e:
+        # The recording is kept, so the client can retry the final chunk
+        return jsonify({"error": "Transcription failed", "details": str(e)}), 502
+    transcription_uploads.discard(upload_id)
+    return jsonify({"text": transcript.text, "language": transcript.language, "engine": transcript.engine})
+
+
+@app.route("/speak", methods=["GET", "POST"])
+def speak():
+    """
+    Text to speech, e.g. for /chat replies.
+    GET  /speak?text=...&language=zu&voice=...   – works as an <audio> src
+    POST {"text": "...", "language": "zu", "voice": "..."}
+    Streams the audio while it is synthesised (audio/mpeg, or audio/wav from
+    the local engine). Text spoken before comes from the audio cache
+    (X-Audio-Cache: hit), and If-None-Match with the ETag gets a 304.
+    """
+    data = (request.get_json(silent=True) or {}) if request.method == "POST" else request.args
+    text = data.get("text") or ""
+    language = data.get("language") or "en"
+    voice = data.get("voice") or synthesizer.default_voice
+    if not all(isinstance(value, str) for value in (text, language, voice)):
+        return jsonify({"error": "text, language and voice must be strings"}), 400
+    text = normalise_text(text)
+
+    if not text:
+        return jsonify({"error": "text is required"}), 400
+    if len(text) > SPEAK_MAX_CHARS:
+        return jsonify({"error": f"text is longer than {SPEAK_MAX_CHARS} characters"}), 400
+
+    key = audio_cache.key(synthesizer.engine_id, voice, language, text)
+    headers = {"ETag": f'"{key}"', "Cache-Control": "private, max-age=86400"}
+    if request.if_none_match.contains(key):
+        return Response(status=304, headers=headers)
+
+    audio = audio_cache.get(key)
+    if audio is not None:
+        def cached_chunks():
+            view = memoryview(audio)
+            for start in range(0, len(view), AUDIO_CHUNK_SIZE):
+                yield bytes(view[start:start + AUDIO_CHUNK_SIZE])
+
+        return Response(
+            cached_chunks(),
+            mimetype=synthesizer.content_type,
+            headers={**headers, "Content-Length": str(len(audio)), "X-Audio-Cache": "hit"},
+        )
+
+    # Wait for the first audio here, so an engine error is still a JSON reply
+    chunks = synthesizer.stream(text, language, voice)
+    try:
+        with metrics.track("speech", "speak"):
+            first = next(chunks, b"")
+    except SpeechError as e:
+        status = 400 if e.status_code == 400 else 502
+        return jsonify({"error": "Speech synthesis failed", "details": str(e)}), status
+
+    return Response(
+        stream_with_context(_stream_speech(key, first, chunks)),
+        mimetype=synthesizer.content_type,
+        headers={**headers, "X-Audio-Cache": "miss", "X-Accel-Buffering": "no"},
+    )
+
+
+def _stream_speech(key, first, chunks):
+    """Send audio as the engine produces it; cache it once it is complete."""
+    parts = [first]
+    yield first
+    while True:
+        with metrics.track("speech", "speak", observe=False):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        parts.append(chunk)
+        yield chunk
+    audio_cache.set(key, synthesizer.finalise(b"".join(parts)))
+
+
 # =======================
 # PHONE LOGIN: REQUEST CODE
 # =======================
+def normalise_phone(phone):
+    """SA numbers to +27 form: 0821234567, 27821234567 and 821234567 alike."""
+    if phone.startswith("0"):
+        return "+27" + phone[1:]
+    if phone.startswith("27"):
+        return "+" + phone
+    if not phone.startswith("+"):
+        return "+27" + phone.lstrip("0")
+    return phone
+
+
 @app.route("/request_code", methods=["POST"])
 def request_code():
     data = request.get_json(force=True) or {}
@@ -287,37 +1253,24 @@ def request_code():
     if not phone:
         return jsonify({"error": "Phone number required"}), 400
 
-    # Normalise SA numbers
-    if phone.startswith("0"):
-        phone = "+27" + phone[1:]
-    elif phone.startswith("27"):
-        phone = "+" + phone
-    elif not phone.startswith("+"):
-        phone = "+27" + phone.lstrip("0")
-
+    phone = normalise_phone(phone)
     code = "".join(str(random.randint(0, 9)) for _ in range(6))
     expiry = datetime.now(timezone.utc).timestamp() + 300  # 5 minutes
 
-    db.reference(f"login_codes/{phone}").set({
-        "code": code,
-        "expires_at": expiry,
-    })
+    # Also caches the phone record's ETag, so /verify_code is one round-trip
+    phone_logins.store_code(phone, code, expiry, delivery={"status": "queued"} if sms_queue else None)
 
-    # Try real SMS if Twilio configured, else always fall back with code in JSON
-    if twilio_client:
-        try:
-            message = twilio_client.messages.create(
-                body=f"Your SpaniSami verification code: {code}\nValid for 5 minutes only 🇿🇦",
-                from_=TWILIO_FROM,
-                to=phone,
-            )
-            app.logger.info(f"Twilio SMS sent → SID: {message.sid}")
-            # For dev/demo we ALSO return the code so you can show it in the UI
-            return jsonify({"message": "Code sent to your phone!", "code": code})
-        except Exception as e:
-            app.logger.warning(f"Twilio failed: {e}")
+    # Queue the SMS if configured; delivery happens in the background
+    if sms_queue:
+        sms_queue.send(
+            phone,
+            f"Your SpaniSami verification code: {code}\nValid for 5 minutes only 🇿🇦",
+            expires_at=expiry,
+        )
+        # For dev/demo we ALSO return the code so you can show it in the UI
+        return jsonify({"message": "Code sent to your phone!", "code": code, "sms_status": "queued"})
 
-    # Fallback: just return the code in JSON (works with no Twilio config)
+    # Fallback: just return the code in JSON (works with no SMS config)
     return jsonify({"message": "Code ready!", "code": code})
 
 
@@ -333,55 +1286,25 @@ def verify_code():
     if not phone or not code:
         return jsonify({"error": "phone and code are required"}), 400
 
-    # Normalise again
-    if phone.startswith("0"):
-        phone = "+27" + phone[1:]
-    elif phone.startswith("27"):
-        phone = "+" + phone
-    elif not phone.startswith("+"):
-        phone = "+27" + phone.lstrip("0")
-
-    entry = db.reference(f"login_codes/{phone}").get()
-    now_ts = datetime.now(timezone.utc).timestamp()
-
-    if not entry or entry.get("code") != code or now_ts > float(entry.get("expires_at", 0)):
+    # Checks the code, consumes it and creates/updates the phone record in one
+    # conditional write, so a code can't be used twice even by racing requests
+    try:
+        record, new_user = phone_logins.verify(normalise_phone(phone), code)
+    except InvalidCode:
         return jsonify({"error": "Invalid or expired code"}), 400
 
-    # Delete code immediately so it can't be reused
-    db.reference(f"login_codes/{phone}").delete()
-
-    # Look up existing phone record
-    phone_doc = db.reference(f"phone_numbers/{phone}").get()
-
-    if phone_doc:
-        profile_id = phone_doc.get("profile_id")
-        # Update last_login
-        db.reference(f"phone_numbers/{phone}").update({
-            "last_login": datetime.now(timezone.utc).isoformat()
-        })
-        return jsonify({
-            "new_user": False,
-            "profile_id": profile_id,
-            "message": f"Welcome back {phone_doc.get('name', 'Champion')}!"
-        })
-
-    else:
-        # New user: create empty record (we'll fill in profile later)
-        # Use phone itself as profile_id for now, or you can create a uuid here
-        profile_id = str(uuid.uuid4())
-        db.reference(f"phone_numbers/{phone}").set({
-            "profile_id": profile_id,
-            "name": None,
-            "email": None,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "last_login": datetime.now(timezone.utc).isoformat(),
-        })
-
+    if new_user:
         return jsonify({
             "new_user": True,
-            "profile_id": profile_id,
+            "profile_id": record["profile_id"],
             "message": "Welcome! Let's build your CV step by step 🇿🇦"
         })
 
+    return jsonify({
+        "new_user": False,
+        "profile_id": record.get("profile_id"),
+        "message": f"Welcome back {record.get('name') or 'Champion'}!"
+    })
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+ASGI entry point for SpaniSami.
+
+Run with:
+    uvicorn asgi:asgi_app --host 0.0.0.0 --port 5000
+
+Every route in app.py spends most of its time waiting on OpenAI, Firebase or
+Twilio. Under a sync WSGI server each of those waits pins a whole worker, so a
+few slow /chat calls starve /stats and /verify_code. Here the event loop owns
+the sockets and the Flask views run on a bounded pool of threads that only
+block on network I/O, so one process can hold hundreds of in-flight LLM calls
+while cheap routes keep answering.
+"""
+import os
+
+from a2wsgi import WSGIMiddleware
+
+from app import app, start_warm_up  # noqa: F401 (serve.py calls it once listening)
+
+# How many Flask views may be running (i.e. waiting on upstream APIs) at once.
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", "256"))
+
+# How many response chunks may be queued per request before the view blocks.
+# Keeps NDJSON streaming from buffering a whole CV in memory for slow phones.
+ASGI_SEND_QUEUE = int(os.getenv("ASGI_SEND_QUEUE", "32"))
+
+asgi_app = WSGIMiddleware(app, workers=ASGI_THREADS, send_queue_size=ASGI_SEND_QUEUE)
@@ -0,0 +1,50 @@
+"""
+Command-line entry point for bulk profile building.
+
+Runs the same pipeline as POST /build_profiles_batch without going through
+HTTP, and writes one JSON line per row to stdout (or --out).
+
+    python batch_cli.py partners/ngo_march.csv --concurrency 8 --out results.jsonl
+    python batch_cli.py partners/ngo_march.csv --job-id <id from the first run>   # resume
+"""
+import argparse
+import json
+import os
+import sys
+
+from app import _build_profile_for_batch, _save_batch_profile, batch_store, BATCH_CONCURRENCY
+from batch_jobs import parse_rows, run_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build SpaniSami profiles in bulk from a CSV or JSONL file.")
+    parser.add_argument("path", help="CSV (raw_text[,preferred_language]) or JSONL file")
+    parser.add_argument("--job-id", help="resume an earlier job")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    parser.add_argument("--out", help="write results here instead of stdout")
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as f:
+        rows = parse_rows(f.read(), os.path.basename(args.path))
+
+    out = open(args.out, "a", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for event in run_batch(
+            rows,
+            build_fn=_build_profile_for_batch,
+            save_fn=_save_batch_profile,
+            store=batch_store,
+            job_id=args.job_id,
+            concurrency=args.concurrency,
+        ):
+            out.write(json.dumps(event, ensure_ascii=False) + "\n")
+            out.flush()
+            if event["type"] == "job":
+                print(f"job_id: {event['job_id']} (re-run with --job-id to resume)", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Bulk profile building for NGO partner spreadsheets.
+
+A batch is a JSONL or CSV file of youth self-descriptions (`raw_text`,
+optional `preferred_language`). Rows are sent to the model with bounded
+concurrency, results are yielded as each one finishes, and every finished
+row is recorded in a small SQLite job table. Re-running with the same job id
+skips rows that already succeeded, so a crash at row 700 does not redo rows
+1–699.
+
+When the upstream API answers 429 (or 5xx), the whole batch pauses for the
+Retry-After time (or an exponential backoff with jitter), not just the
+worker that saw it, so we stop hammering a rate-limited account.
+"""
+import csv
+import io
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Optional
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+# ---------------------------------------------------
+# INPUT PARSING
+# ---------------------------------------------------
+def parse_rows(data: bytes, filename: str = "") -> List[dict]:
+    """
+    Parse an upload into [{"row": n, "raw_text": ..., "preferred_language": ...}].
+    CSV needs a header with a raw_text column; anything else is read as JSONL.
+    """
+    text = data.decode("utf-8-sig")
+    rows = []
+
+    if filename.lower().endswith(".csv"):
+        records = csv.DictReader(io.StringIO(text))
+        if "raw_text" not in (records.fieldnames or []):
+            raise ValueError("CSV needs a 'raw_text' column")
+    else:
+        records = (json.loads(line) for line in text.splitlines() if line.strip())
+
+    for number, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise ValueError(f"line {number}: expected a JSON object")
+        for field in ("raw_text", "preferred_language"):
+            if not isinstance(record.get(field) or "", str):
+                raise ValueError(f"line {number}: {field} must be a string")
+        rows.append({
+            "row": number,
+            "raw_text": (record.get("raw_text") or "").strip(),
+            "preferred_language": (record.get("preferred_language") or "en").strip() or "en",
+        })
+    return rows
+
+
+# ---------------------------------------------------
+# JOB STORE (resume state)
+# ---------------------------------------------------
+class BatchJobStore:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " created_at TEXT NOT NULL,"
+            " total INTEGER NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " job_id TEXT NOT NULL,"
+            " row INTEGER NOT NULL,"
+            " status TEXT NOT NULL,"
+            " profile_id TEXT,"
+            " error TEXT,"
+            " finished_at TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, row))"
+        )
+        self._lock = threading.Lock()
+
+    def start(self, job_id: str, total: int) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, created_at, total) VALUES (?, ?, ?)"
+                " ON CONFLICT(id) DO UPDATE SET total = MAX(total, excluded.total)",
+                (job_id, datetime.now(timezone.utc).isoformat(), total),
+            )
+
+    def finished_rows(self, job_id: str) -> dict:
+        """{row: profile_id} for rows that already succeeded."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT row, profile_id FROM results WHERE job_id = ? AND status = 'ok'",
+                (job_id,),
+            ).fetchall()
+        return dict(rows)
+
+    def record(self, job_id: str, row: int, status: str, profile_id=None, error=None) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (job_id, row, status, profile_id, error, finished_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, row, status, profile_id, error, datetime.now(timezone.utc).isoformat()),
+            )
+
+    def summary(self, job_id: str) -> dict:
+        with self._lock:
+            total = self._db.execute("SELECT total FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM results WHERE job_id = ? GROUP BY status",
+                (job_id,),
+            ).fetchall())
+        return {
+            "job_id": job_id,
+            "total": total[0] if total else 0,
+            "ok": counts.get("ok", 0),
+            "failed": counts.get("failed", 0),
+        }
+
+
+# ---------------------------------------------------
+# RATE-LIMIT AWARE RETRIES
+# ---------------------------------------------------
+class SharedBackoff:
+    """One pause shared by every worker in a batch."""
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._pause_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        delay = self._pause_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, attempt: int, retry_after: Optional[float] = None) -> None:
+        if retry_after is None:
+            retry_after = min(self.max_delay, self.base_delay * 2 ** attempt)
+            retry_after *= random.uniform(0.5, 1.5)
+        with self._lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + retry_after)
+
+
+def _retry_info(exc):
+    """(retryable, retry_after_seconds) for an upstream exception."""
+    status = getattr(exc, "status_code", None)
+    if status not in RETRYABLE_STATUS:
+        return False, None
+    response = getattr(exc, "response", None)
+    header = response.headers.get("retry-after") if response is not None else None
+    try:
+        return True, float(header) if header else None
+    except ValueError:
+        return True, None
+
+
+def _build_with_retries(row, build_fn, backoff, max_retries):
+    attempt = 0
+    while True:
+        backoff.wait()
+        try:
+            return build_fn(row["raw_text"], row["preferred_language"])
+        except Exception as e:
+            retryable, retry_after = _retry_info(e)
+            if not retryable or attempt >= max_retries:
+                raise
+            backoff.pause(attempt, retry_after)
+            attempt += 1
+
+
+# ---------------------------------------------------
+# RUNNER
+# ---------------------------------------------------
+def run_batch(
+    rows: List[dict],
+    build_fn: Callable[[str, str], dict],
+    save_fn: Callable[[dict, str], str],
+    store: BatchJobStore,
+    job_id: Optional[str] = None,
+    concurrency: int = 8,
+    max_retries: int = 5,
+) -> Iterator[dict]:
+    """
+    Yield NDJSON-ready events: one "job" header, one "row" event per row as it
+    finishes (previously finished rows first, marked "resumed"), then "done".
+
+    build_fn(raw_text, preferred_language) -> profile dict
+    save_fn(profile dict, preferred_language) -> profile_id
+    """
+    job_id = job_id or str(uuid.uuid4())
+    store.start(job_id, len(rows))
+    already_done = store.finished_rows(job_id)
+
+    yield {"type": "job", "job_id": job_id, "total": len(rows), "resumed_rows": len(already_done)}
+
+    for row_number, profile_id in sorted(already_done.items()):
+        yield {"type": "row", "row": row_number, "status": "ok", "profile_id": profile_id, "resumed": True}
+
+    pending = [r for r in rows if r["row"] not in already_done]
+    backoff = SharedBackoff()
+
+    def work(row):
+        # Record from the worker thread so a finished row counts as done even
+        # if the client streaming the results has already gone away.
+        try:
+            if not row["raw_text"]:
+                raise ValueError("raw_text is empty")
+            profile = _build_with_retries(row, build_fn, backoff, max_retries)
+            profile_id = save_fn(profile, row["preferred_language"])
+        except Exception as e:
+            store.record(job_id, row["row"], "failed", error=str(e))
+            return {"type": "row", "row": row["row"], "status": "failed", "error": str(e)}
+
+        store.record(job_id, row["row"], "ok", profile_id=profile_id)
+        return {
+            "type": "row",
+            "row": row["row"],
+            "status": "ok",
+            "profile_id": profile_id,
+            "profile": profile,
+        }
+
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        futures = [pool.submit(work, row) for row in pending]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # On disconnect, drop rows not yet started; a re-run picks them up
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    yield {"type": "done", **store.summary(job_id)}
@@ -0,0 +1,156 @@
+"""
+Load benchmark for the ASGI serving mode with a stubbed model.
+
+Starts asgi.py under uvicorn in a child process on a free local port, with
+LLM_BACKEND=stub so each model call sleeps like a real one, then
+fires POST /chat from 1, 50 and 500 concurrent clients and prints
+requests/sec for each level.
+
+Run from the backend folder:
+    python benchmarks/bench_concurrency.py
+    python benchmarks/bench_concurrency.py --latency 0.5 --levels 1 50 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import uvicorn
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# No Firebase or OpenAI account needed: local database stand-in, stubbed model
+os.environ.setdefault("DATABASE_BACKEND", "local")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+
+# ---------------------------------------------------
+# SERVER + LOAD GENERATOR
+# ---------------------------------------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(port, latency):
+    """Child process: the app under test, with the model stubbed out."""
+    os.environ.update({"LLM_BACKEND": "stub", "LLM_STUB_LATENCY": str(latency)})
+    sys.path.insert(0, BACKEND_DIR)
+    from asgi import asgi_app
+
+    uvicorn.run(
+        asgi_app,
+        host="127.0.0.1",
+        port=port,
+        log_level="warning",
+        backlog=4096,
+        timeout_keep_alive=60,
+    )
+
+
+def start_server(port, latency):
+    proc = subprocess.Popen([
+        sys.executable, os.path.abspath(__file__),
+        "--serve", str(port), "--latency", str(latency),
+    ])
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("benchmark server did not start")
+
+
+async def run_level(port, concurrency, total):
+    """
+    Drive POST /chat over keep-alive connections, one per simulated client.
+    Uses raw asyncio streams rather than an HTTP client library so that the
+    load generator itself stays cheap at 500 connections.
+    """
+    body = json.dumps({"message": "Hi", "language": "en"}).encode()
+    raw_request = (
+        "POST /chat HTTP/1.1\r\n"
+        "Host: 127.0.0.1\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode() + body
+
+    remaining = [total]
+    errors = [0]
+
+    async def worker():
+        reader = writer = None
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(raw_request)
+                await writer.drain()
+
+                status_line = await reader.readline()
+                length, close = 0, False
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    name, _, value = line.decode("latin1").partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                    elif name.lower() == "connection" and "close" in value.lower():
+                        close = True
+                await reader.readexactly(length)
+
+                if b" 200 " not in status_line:
+                    errors[0] += 1
+                if close:
+                    writer.close()
+                    writer = None
+            except (OSError, asyncio.IncompleteReadError):
+                errors[0] += 1
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return total / elapsed, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.2, help="stub model latency in seconds")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.latency)
+        return
+
+    port = free_port()
+    server = start_server(port, args.latency)
+
+    print(f"stub latency {args.latency * 1000:.0f} ms, {os.getenv('ASGI_THREADS', '256')} view threads")
+    print(f"{'clients':>8} {'requests':>9} {'req/s':>9} {'errors':>7}")
+    for concurrency in args.levels:
+        total = max(concurrency * args.requests_per_client, 20)
+        rps, errors = asyncio.run(run_level(port, concurrency, total))
+        print(f"{concurrency:>8} {total:>9} {rps:>9.1f} {errors:>7}")
+
+    server.terminate()
+    server.wait()
+
+
+if __name__ == "__main__":
+    main()
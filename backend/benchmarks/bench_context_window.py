@@ -0,0 +1,132 @@
+"""
+Prompt-size benchmark for /chat context windowing.
+
+Plays 50-turn interview sessions through the Flask test client with a stub
+model and prints, per turn, the prompt tokens actually sent versus what the
+old "system prompt + entire history" approach would have sent.
+
+Run from the backend folder:
+    python benchmarks/bench_context_window.py
+    python benchmarks/bench_context_window.py --turns 50 --sessions 5
+"""
+import argparse
+import os
+import random
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# No Firebase or OpenAI account needed: local database stand-in, stubbed model
+os.environ.setdefault("DATABASE_BACKEND", "local")
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+# Every turn from the model, so the prompt sizes compare like for like
+os.environ.setdefault("QUESTION_BANK", "0")
+
+import app as spani_app  # noqa: E402
+from context_window import count_message_tokens  # noqa: E402
+
+ANSWERS = [
+    "I helped at my uncle's spaza shop every weekend, counting stock and serving customers.",
+    "My strength is that I stay calm when it is busy. My weakness is that I talk too fast.",
+    "Once a customer shouted about the price of bread, so I listened and called my uncle to help.",
+    "At church I organise the youth choir and make sure everyone knows the practice times.",
+    "I finished matric in 2023 at Soweto High and did a short computer course at the library.",
+    "I can speak isiZulu, English and a bit of Sesotho, and I use WhatsApp and Excel on my phone.",
+]
+
+REPLY = (
+    "Thank you, that is a good answer. You showed responsibility and patience. "
+    "Next time, add one result, like how many customers you helped. "
+    "Next question: tell me about a time you worked in a team."
+)
+
+SUMMARY = (
+    "- Helped at uncle's spaza shop on weekends (stock, customers)\n"
+    "- Calm under pressure; talks too fast\n"
+    "- Handled an angry customer by listening and escalating\n"
+    "- Organises church youth choir\n"
+    "- Matric 2023, computer course; isiZulu, English, Sesotho"
+)
+
+
+# ---------------------------------------------------
+# STUB MODEL
+# ---------------------------------------------------
+class StubCompletions:
+    def __init__(self):
+        self.summary_calls = 0
+
+    def create(self, model, messages, **kwargs):
+        if messages[0]["content"].startswith("You write compact"):
+            self.summary_calls += 1
+            content = SUMMARY
+        else:
+            content = REPLY
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+
+def run_session(http, turns, rng):
+    session_id = None
+    full_history = []
+    rows = []
+
+    for turn in range(1, turns + 1):
+        answer = rng.choice(ANSWERS)
+        res = http.post("/chat", json={
+            "session_id": session_id,
+            "message": answer,
+            "language": "en",
+            "mode": "interview",
+        }).get_json()
+        session_id = res["session_id"]
+
+        windowed_tokens = res["context"]["prompt_tokens_estimate"]
+
+        # What the old implementation would have sent: system prompt + everything
+        full_history.append({"role": "user", "content": answer})
+        if turn == 1:
+            system_tokens = windowed_tokens - count_message_tokens(full_history)
+        naive_tokens = system_tokens + count_message_tokens(full_history)
+        full_history.append({"role": "assistant", "content": res["reply"]})
+
+        rows.append((turn, windowed_tokens, naive_tokens))
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=3)
+    args = parser.parse_args()
+
+    stub = StubCompletions()
+    spani_app.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=stub))
+    http = spani_app.app.test_client()
+    rng = random.Random(42)
+
+    sessions = [run_session(http, args.turns, rng) for _ in range(args.sessions)]
+
+    print(f"{args.sessions} sessions x {args.turns} turns "
+          f"(keep_turns={spani_app.context_window.keep_turns}, "
+          f"budget={spani_app.context_window.token_budget})")
+    print(f"{'turn':>5} {'windowed':>9} {'full history':>13}")
+    for i in range(args.turns):
+        turn = i + 1
+        if turn in (1, 2, 5) or turn % 10 == 0 or turn == args.turns:
+            windowed = sum(s[i][1] for s in sessions) / len(sessions)
+            naive = sum(s[i][2] for s in sessions) / len(sessions)
+            print(f"{turn:>5} {windowed:>9.0f} {naive:>13.0f}")
+
+    total_windowed = sum(row[1] for s in sessions for row in s)
+    total_naive = sum(row[2] for s in sessions for row in s)
+    print(f"\ntotal prompt tokens: windowed {total_windowed}, full history {total_naive} "
+          f"({100 * (1 - total_windowed / total_naive):.0f}% fewer)")
+    print(f"summary calls: {stub.summary_calls} "
+          f"({stub.summary_calls / (args.sessions * args.turns):.2f} per turn)")
+
+
+if __name__ == "__main__":
+    main()
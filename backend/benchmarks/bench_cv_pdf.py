@@ -0,0 +1,120 @@
+"""
+CV PDF rendering: time and memory per document.
+
+Renders N distinct CVs (and then the same N again) and prints mean/p95 render
+time, peak Python allocation per document (tracemalloc, sampled) and peak
+process RSS for:
+
+  fresh     – new FPDF + add_font per document, no memo (what a naive
+              endpoint would do)
+  template  – CvRenderer: fonts loaded once into a template document that
+              each render copies
+  memoised  – CvRenderer again on the same CVs: served from the byte cache
+
+Run from the backend folder:
+    python benchmarks/bench_cv_pdf.py
+    python benchmarks/bench_cv_pdf.py --counts 1,1000 --skip-fresh
+"""
+import argparse
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cv_render import CvRenderer  # noqa: E402
+
+CV_TEMPLATE = """Ayanda Zulu {i}
+Durban, KwaZulu-Natal
+
+SUMMARY
+Friendly and reliable – two years of side‑hustle experience braiding hair and
+running a small spaza counter. Keen to grow in retail and customer service.
+
+EDUCATION
+Matric, Umlazi Comprehensive High School (2021)
+
+INFORMAL EXPERIENCE
+Hairstylist, self-employed – Umlazi, 2022–2024
+- Braided hair for 10+ clients a week, booked by WhatsApp
+- Kept a cash book and bought stock on a budget
+Spaza shop assistant – Umlazi, 2021–2022
+- Served customers, handled cash and airtime sales
+
+SKILLS
+- Customer service
+- Cash handling
+- Time management
+
+LANGUAGES
+isiZulu (home language), English (fluent), isiXhosa (conversational)
+"""
+
+
+class FreshRenderer(CvRenderer):
+    """No template copy, no memo: every render parses the fonts again."""
+
+    def render(self, cv_text, template="classic"):
+        self._bases.clear()
+        return self._render(cv_text, self._layout(template)), None
+
+    @staticmethod
+    def _layout(template):
+        from cv_render import TEMPLATES
+        return TEMPLATES[template]
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(label, renderer, cvs, memory_sample):
+    times = []
+    for cv in cvs:
+        started = time.perf_counter()
+        renderer.render(cv)
+        times.append(time.perf_counter() - started)
+
+    # tracemalloc slows rendering several-fold, so memory is sampled in a
+    # separate pass over the first few CVs (fresh copies bypass the memo)
+    peaks = []
+    for cv in cvs[:memory_sample]:
+        if label != "memoised":
+            cv += " "
+        tracemalloc.start()
+        renderer.render(cv)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    p95 = sorted(times)[max(0, int(len(times) * 0.95) - 1)]
+    print(
+        f"{len(cvs):>6} {label:>9} {statistics.mean(times) * 1000:>9.1f} {p95 * 1000:>9.1f} "
+        f"{statistics.mean(peaks) / 1e6:>11.2f} {rss_mb():>9.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--counts", default="1,1000")
+    parser.add_argument("--skip-fresh", action="store_true")
+    parser.add_argument("--memory-sample", type=int, default=20, help="CVs to trace for peak memory")
+    args = parser.parse_args()
+
+    print(f"{'CVs':>6} {'mode':>9} {'mean ms':>9} {'p95 ms':>9} {'peak MB/doc':>11} {'RSS MB':>9}")
+    for count in (int(c) for c in args.counts.split(",")):
+        cvs = [CV_TEMPLATE.format(i=i) for i in range(count)]
+        if not args.skip_fresh:
+            run("fresh", FreshRenderer(), cvs, args.memory_sample)
+        renderer = CvRenderer()
+        renderer.warm()  # the app does this at import
+        run("template", renderer, cvs, args.memory_sample)
+        run("memoised", renderer, cvs, args.memory_sample)
+        print(f"{'':>6} cache: {renderer.stats()['cached_documents']} docs, "
+              f"{renderer.stats()['cached_bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
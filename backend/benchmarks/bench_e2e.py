@@ -0,0 +1,462 @@
+"""
+End-to-end: the main user journeys over HTTP, per route latency, throughput and memory.
+
+Replaces test_calls.py, which sent two requests to a live server. This
+starts serve.py on a free port with the stub model (seeded) and the local
+database and storage in a fresh temp folder, so a run needs no keys and
+every run on a commit sends the same requests. Payloads come from
+benchmarks/corpus/e2e.json (--corpus): profile texts as they arrive (short,
+rambling, mixed language, several of the app's languages), target roles and
+scripted multi-turn chat sessions in CV and interview mode.
+
+Phases run one after the other, each with --concurrency users at a time:
+
+  login          per user: /request_code, then /verify_code with the code
+                 it returned (SMS_BACKEND=none hands the code back in JSON)
+  build_profile  one per user, with the profile_id from /verify_code
+  generate_cv    one per user, for a target role from the corpus
+  chat           one session per user: every turn of a corpus session, in
+                 order, on one session_id, so long sessions get folded into
+                 a summary as in production
+
+Per route: requests, errors, p50/p95/p99 latency, throughput over its phase
+and the server's peak RSS during the phase (serve.py and its workers,
+sampled from /proc every 20 ms, so Linux only).
+
+Each run is saved as JSON (--out, default
+data/benchmarks/e2e-<commit>-<time>.json) with the commit, settings, corpus
+hash and machine. --compare takes an earlier result, or "last" for the
+newest run saved from another commit, and prints the change per route.
+With --max-regression PCT the script exits non-zero when a route's p95
+got more than PCT percent slower.
+
+Run from the backend folder:
+    python benchmarks/bench_e2e.py
+    python benchmarks/bench_e2e.py --users 200 --concurrency 32 --latency lognormal:0.8,0.4 --workers 2
+    python benchmarks/bench_e2e.py --compare last --max-regression 15
+"""
+import argparse
+import glob
+import hashlib
+import http.client
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CORPUS = os.path.join(BACKEND_DIR, "benchmarks", "corpus", "e2e.json")
+RESULTS_DIR = os.path.join(BACKEND_DIR, "data", "benchmarks")
+
+PHASES = {
+    "login": ["request_code", "verify_code"],
+    "build_profile": ["build_profile"],
+    "generate_cv": ["generate_cv"],
+    "chat": ["chat"],
+}
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# ---------------------------------------------------
+# SERVER
+# ---------------------------------------------------
+def start_server(args, port, data_dir):
+    env = {name: value for name, value in os.environ.items() if not name.startswith(("TWILIO_", "SUPABASE_"))}
+    env.update({
+        "OPENAI_API_KEY": "stub",
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_LATENCY": args.latency,
+        "LLM_STUB_SEED": str(args.seed),
+        "DATABASE_BACKEND": "local",
+        "SMS_BACKEND": "none",
+        "LOCAL_DB_PATH": os.path.join(data_dir, "rtdb.json"),
+        "LOCAL_STORAGE_DIR": os.path.join(data_dir, "storage"),
+        "SESSION_DB_PATH": os.path.join(data_dir, "sessions.db"),
+        "IDEMPOTENCY_DB_PATH": os.path.join(data_dir, "idempotency.db"),
+        "BATCH_DB_PATH": os.path.join(data_dir, "batch_jobs.db"),
+        "STATS_DB_PATH": os.path.join(data_dir, "stats.db"),
+    })
+    if args.workers > 1:
+        env.update({
+            "SESSION_BACKEND": "sqlite",
+            "CACHE_DB_PATH": os.path.join(data_dir, "response_cache.db"),
+            "METRICS_DIR": os.path.join(data_dir, "metrics"),
+        })
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(args.workers), "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/stats")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f"serve.py did not start: {process.stderr.read().decode()[-2000:]}")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=120)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+class RssSampler:
+    """Peak resident memory of a process and its children, sampled in the background."""
+
+    def __init__(self, pid, interval=0.02):
+        self.pid = pid
+        self.interval = interval
+        self.available = os.path.exists(f"/proc/{pid}/status")
+        self._peak = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        if self.available:
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def current(self):
+        """Bytes, summed over the process tree."""
+        total = 0
+        for pid in [self.pid, *self._children()]:
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except OSError:
+                pass  # exited between listing and reading
+        return total
+
+    def reset(self):
+        """Start a new peak from the current value; returns that value."""
+        value = self.current()
+        with self._lock:
+            self._peak = value
+        return value
+
+    def peak(self):
+        with self._lock:
+            return self._peak
+
+    def stop(self):
+        self._stopped.set()
+
+    def _children(self):
+        try:
+            with open(f"/proc/{self.pid}/task/{self.pid}/children") as f:
+                return [int(pid) for pid in f.read().split()]
+        except OSError:
+            return []
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            value = self.current()
+            with self._lock:
+                self._peak = max(self._peak, value)
+
+
+# ---------------------------------------------------
+# CLIENT + JOURNEYS
+# ---------------------------------------------------
+class Client:
+    def __init__(self, port):
+        self.port = port
+        self.connection = None
+
+    def call(self, method, path, body=None):
+        """(status, parsed JSON or raw bytes). Reconnects once if the keep-alive connection went away."""
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+            try:
+                payload = json.dumps(body) if body is not None else None
+                headers = {"Content-Type": "application/json"} if body is not None else {}
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+                continue
+            is_json = response.getheader("Content-Type", "").startswith("application/json")
+            return response.status, json.loads(data) if is_json else data
+
+
+class Recorder:
+    def __init__(self):
+        self.times = {route: [] for routes in PHASES.values() for route in routes}
+        self.errors = dict.fromkeys(self.times, 0)
+        self._lock = threading.Lock()
+
+    def call(self, client, route, method, path, body=None):
+        """The JSON reply, or None (counted as an error) on a failure or a 4xx/5xx."""
+        started = time.perf_counter()
+        try:
+            status, result = client.call(method, path, body)
+        except Exception:
+            status, result = None, None
+        elapsed = time.perf_counter() - started
+        ok = status is not None and status < 400
+        with self._lock:
+            self.times[route].append(elapsed)
+            if not ok:
+                self.errors[route] += 1
+        return result if ok else None
+
+
+class User:
+    """One simulated person; every choice is seeded from (seed, index), so runs repeat."""
+
+    def __init__(self, index, corpus, seed):
+        rng = random.Random(f"{seed}-{index}")
+        profile = rng.choice(corpus["profiles"])
+        self.index = index
+        self.phone = f"083{seed % 100:02d}{index:05d}"
+        self.language = profile["language"]
+        self.raw_text = (f"{profile['raw_text']} My name is {rng.choice(corpus['names'])} "
+                         f"and I stay in {rng.choice(corpus['towns'])}.")
+        self.target_role = rng.choice(corpus["target_roles"])
+        self.session = corpus["chat_sessions"][index % len(corpus["chat_sessions"])]
+        self.profile_id = None
+
+
+def login(client, user, recorder):
+    sent = recorder.call(client, "request_code", "POST", "/request_code", {"phone": user.phone})
+    if not sent:
+        return
+    verified = recorder.call(client, "verify_code", "POST", "/verify_code", {"phone": user.phone, "code": sent["code"]})
+    if verified:
+        user.profile_id = verified.get("profile_id")
+
+
+def build_profile(client, user, recorder):
+    body = {"raw_text": user.raw_text, "preferred_language": user.language}
+    if user.profile_id:
+        body["profile_id"] = user.profile_id
+    built = recorder.call(client, "build_profile", "POST", "/build_profile", body)
+    if built:
+        user.profile_id = built["profile_id"]
+
+
+def generate_cv(client, user, recorder):
+    if user.profile_id:
+        recorder.call(client, "generate_cv", "POST", "/generate_cv",
+                      {"profile_id": user.profile_id, "target_role": user.target_role})
+
+
+def chat(client, user, recorder):
+    session_id = f"e2e-{user.index}"
+    for turn in user.session["turns"]:
+        recorder.call(client, "chat", "POST", "/chat", {
+            "message": turn, "session_id": session_id,
+            "language": user.session["language"], "mode": user.session["mode"],
+        })
+
+
+JOURNEY = {"login": login, "build_profile": build_profile, "generate_cv": generate_cv, "chat": chat}
+
+
+def run_phase(port, users, step, recorder, concurrency):
+    local = threading.local()
+
+    def one(user):
+        if not hasattr(local, "client"):
+            local.client = Client(port)
+        step(local.client, user, recorder)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, users))
+
+
+# ---------------------------------------------------
+# RESULTS
+# ---------------------------------------------------
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, bool(dirty)
+
+
+def route_results(recorder, phase_info):
+    routes = {}
+    for phase, names in PHASES.items():
+        info = phase_info[phase]
+        for route in names:
+            ordered = sorted(recorder.times[route])
+            routes[route] = {
+                "requests": len(ordered),
+                "errors": recorder.errors[route],
+                "p50_ms": round(percentile(ordered, 0.5) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+                "throughput_rps": round(len(ordered) / info["seconds"], 2) if info["seconds"] else 0.0,
+                "peak_rss_mb": info["peak_rss_mb"],
+            }
+    return routes
+
+
+def find_last(commit):
+    """The newest saved result from a different commit, or None."""
+    candidates = []
+    for path in glob.glob(os.path.join(RESULTS_DIR, "e2e-*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if result.get("commit") != commit:
+            candidates.append((result.get("created_at", ""), path))
+    return max(candidates)[1] if candidates else None
+
+
+def compare(previous, current, max_regression):
+    """Print the change per route; returns the routes whose p95 regressed past max_regression (percent)."""
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+    print(f"\nvs {previous['commit']}{' (dirty)' if previous.get('dirty') else ''} from {previous['created_at']}")
+    if previous.get("settings") != current["settings"] or previous.get("corpus") != current["corpus"]:
+        print("  note: settings or corpus differ, so the numbers are not directly comparable")
+    print(f"{'route':<14} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'peak RSS':>9}")
+    regressed = []
+    for route, new in current["routes"].items():
+        old = previous["routes"].get(route)
+        if not old:
+            continue
+        print(f"{route:<14} {change(old['p50_ms'], new['p50_ms']):>8} {change(old['p95_ms'], new['p95_ms']):>8} "
+              f"{change(old['p99_ms'], new['p99_ms']):>8} {change(old['throughput_rps'], new['throughput_rps']):>8} "
+              f"{change(old['peak_rss_mb'] or 0, new['peak_rss_mb'] or 0):>9}")
+        if max_regression is not None and old["p95_ms"] and \
+                (new["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 > max_regression:
+            regressed.append(route)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100, help="simulated users (each runs every phase)")
+    parser.add_argument("--concurrency", type=int, default=16, help="users in flight at once")
+    parser.add_argument("--latency", default="lognormal:0.3,0.5", help="stub model latency (llm_client.py syntax)")
+    parser.add_argument("--workers", type=int, default=1, help="serve.py worker processes")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--warmup", type=int, default=2, help="unrecorded users run first")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--out", help="result file (default: data/benchmarks/e2e-<commit>-<time>.json)")
+    parser.add_argument("--compare", help='earlier result file, or "last"')
+    parser.add_argument("--max-regression", type=float, help="exit 1 if a route's p95 is this many percent worse")
+    args = parser.parse_args()
+
+    with open(args.corpus, "rb") as f:
+        corpus_bytes = f.read()
+    corpus = json.loads(corpus_bytes)
+    commit, dirty = git_commit()
+
+    data_dir = tempfile.mkdtemp(prefix="spanisami-e2e-")
+    port = free_port()
+    process = start_server(args, port, data_dir)
+    sampler = RssSampler(process.pid)
+    try:
+        warm = [User(-1 - i, corpus, args.seed) for i in range(args.warmup)]
+        warm_recorder = Recorder()
+        for phase, step in JOURNEY.items():
+            run_phase(port, warm, step, warm_recorder, args.concurrency)
+
+        users = [User(i, corpus, args.seed) for i in range(args.users)]
+        recorder = Recorder()
+        phase_info = {}
+        for phase, step in JOURNEY.items():
+            start_rss = sampler.reset()
+            started = time.perf_counter()
+            run_phase(port, users, step, recorder, args.concurrency)
+            phase_info[phase] = {
+                "seconds": round(time.perf_counter() - started, 3),
+                "start_rss_mb": round(start_rss / 2**20, 1) if sampler.available else None,
+                "peak_rss_mb": round(max(sampler.peak(), sampler.current()) / 2**20, 1) if sampler.available else None,
+            }
+    finally:
+        sampler.stop()
+        stop_server(process)
+
+    settings = {name: getattr(args, name) for name in ("users", "concurrency", "latency", "workers", "seed", "warmup")}
+    result = {
+        "benchmark": "e2e",
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": settings,
+        "corpus": {
+            "path": os.path.relpath(args.corpus, BACKEND_DIR),
+            "version": corpus.get("version"),
+            "sha256": hashlib.sha256(corpus_bytes).hexdigest()[:16],
+        },
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "phases": phase_info,
+        "routes": route_results(recorder, phase_info),
+    }
+
+    print(f"commit {commit}{' (dirty)' if dirty else ''}, {args.users} users x {args.concurrency} concurrent, "
+          f"{args.workers} worker(s), stub latency {args.latency}, {os.cpu_count()} cores")
+    print(f"{'route':<14} {'requests':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'req/s':>8} {'peak RSS MB':>12}")
+    for route, r in result["routes"].items():
+        rss = f"{r['peak_rss_mb']:.1f}" if r["peak_rss_mb"] is not None else "n/a"
+        print(f"{route:<14} {r['requests']:>8} {r['errors']:>7} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['throughput_rps']:>8.1f} {rss:>12}")
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"e2e-{commit}{'-dirty' if dirty else ''}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json",
+    )
+    previous_path = find_last(commit) if args.compare == "last" else args.compare
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved {os.path.relpath(out)}")
+
+    failed = any(r["errors"] for r in result["routes"].values())
+    if args.compare:
+        if previous_path is None:
+            print("\nno earlier result from another commit to compare with")
+        else:
+            with open(previous_path, encoding="utf-8") as f:
+                regressed = compare(json.load(f), result, args.max_regression)
+            for route in regressed:
+                print(f"FAIL: {route} p95 regressed more than {args.max_regression:.0f}%")
+            failed = failed or bool(regressed)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Nearby-job lookups: grid index vs scanning every job.
+
+Generates synthetic postings clustered around South African towns (from the
+gazetteer), builds a GeoIndex, then prints per size:
+
+  build     – bulk index time
+  radius    – /jobs_near-style radius queries (5–50 km, nearest 500) around
+              random towns
+  nearest   – k=10 nearest queries around random towns
+  scan      – the radius queries done by haversine over every job (what the
+              phone did with the full list, here vectorised in numpy)
+  tile      – /job_tiles payloads: cold serialise vs cached
+
+Run from the backend folder:
+    python benchmarks/bench_geo_index.py
+    python benchmarks/bench_geo_index.py --sizes 10000,1000000 --queries 500
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geo_index import GeoIndex, haversine_km, tile_for  # noqa: E402
+
+PLACES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "seed_data", "za_places.csv")
+
+
+def load_towns():
+    import csv
+    with open(PLACES, encoding="utf-8") as f:
+        return [(float(row["lat"]), float(row["lng"])) for row in csv.DictReader(f)]
+
+
+def make_job(rng, towns, i):
+    lat, lng = rng.choice(towns)
+    return {
+        "id": str(i),
+        "title": f"Job {i}",
+        "company": f"Company {i % 5000}",
+        "lat": lat + rng.gauss(0, 0.12),
+        "lng": lng + rng.gauss(0, 0.12),
+    }
+
+
+def timed(fn, args_list):
+    times = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        times.append((time.perf_counter() - started) * 1000)
+    ordered = sorted(times)
+    return statistics.mean(ordered), ordered[len(ordered) // 2], ordered[max(0, int(len(ordered) * 0.95) - 1)]
+
+
+def row(label, result):
+    mean, p50, p95 = result
+    print(f"  {label:<8} mean {mean:8.3f} ms   p50 {p50:8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def run(size, queries, rng, towns):
+    jobs = [make_job(rng, towns, i) for i in range(size)]
+    index = GeoIndex()
+    started = time.perf_counter()
+    index.build(jobs)
+    print(f"\n{size} jobs in {index.stats()['tiles']} tiles")
+    print(f"  build    {time.perf_counter() - started:8.2f} s")
+
+    centres = [rng.choice(towns) for _ in range(queries)]
+    radius_args = [(lat, lng, rng.choice([5, 10, 25, 50])) for lat, lng in centres]
+    row("radius", timed(lambda lat, lng, km: index.within(lat, lng, km, limit=500), radius_args))
+    row("nearest", timed(index.nearest, [(lat, lng, 10) for lat, lng in centres]))
+
+    lats = np.array([job["lat"] for job in jobs])
+    lngs = np.array([job["lng"] for job in jobs])
+
+    def scan(lat, lng, km):
+        distances = haversine_km(lat, lng, lats, lngs)
+        keep = np.nonzero(distances <= km)[0]
+        return keep[np.argsort(distances[keep])][:500]
+
+    row("scan", timed(scan, radius_args))
+
+    tiles = list({tile_for(lat, lng) for lat, lng in centres})
+    row("tile", timed(index.tile, [(t,) for t in tiles]))
+    row("cached", timed(index.tile, [(t,) for t in tiles]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,1000000")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    towns = load_towns()
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.queries, rng, towns)
+
+
+if __name__ == "__main__":
+    main()
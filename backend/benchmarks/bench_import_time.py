@@ -0,0 +1,108 @@
+"""
+Cold start: how long `import app` takes, checked against a budget.
+
+Runs `python -X importtime -c "import app"` --runs times in fresh processes
+and keeps the fastest run, which is the least disturbed by other load. The
+environment is production-like but has no credentials: the OpenAI and
+Firebase backends, Twilio settings with dummy values and no Supabase
+config. Importing must succeed like that, because the clients are only
+created on first use or by the background warm-up (app.py).
+
+Prints the total and the top-level imports that cost the most. Exits
+non-zero, so CI can run it, when:
+
+  - the total is over --budget-ms (IMPORT_BUDGET_MS, default 500), or
+  - a module that should load lazily was imported: openai, twilio,
+    firebase_admin, supabase, httpx, fpdf, fontTools.
+
+Run from the backend folder:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --runs 5 --budget-ms 300 --top 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = ["openai", "twilio", "firebase_admin", "supabase", "httpx", "fpdf", "fontTools"]
+
+
+def import_times(data_dir):
+    """{module: cumulative microseconds} for one `import app`, plus the modules it loaded."""
+    env = {
+        name: value for name, value in os.environ.items()
+        if not name.startswith(("TWILIO_", "SUPABASE_", "FIREBASE_", "LOCAL_", "LLM_STUB_"))
+    }
+    env.update({
+        "OPENAI_API_KEY": "stub",
+        "LLM_BACKEND": "openai",
+        "DATABASE_BACKEND": "firebase",
+        "FIREBASE_KEY_PATH": os.path.join(data_dir, "missing-firebase-key.json"),
+        "TWILIO_SID": "AC00000000000000000000000000000000",
+        "TWILIO_TOKEN": "stub",
+        "TWILIO_FROM": "+15005550006",
+        "SMS_BACKEND": "twilio",
+        "WARM_UP": "0",
+        "IDEMPOTENCY_DB_PATH": os.path.join(data_dir, "idempotency.db"),
+        "BATCH_DB_PATH": os.path.join(data_dir, "batch_jobs.db"),
+        "STATS_DB_PATH": os.path.join(data_dir, "stats.db"),
+        "SESSION_DB_PATH": os.path.join(data_dir, "sessions.db"),
+    })
+    # Print what was loaded on stdout; -X importtime reports on stderr
+    code = "import sys, app; print('\\n'.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import app failed:\n{result.stderr[-3000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header line
+        # Top-level entries are indented by one space only; nested ones by more
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times[name.strip()] = (int(cumulative), depth)
+    return times, set(result.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "500")))
+    parser.add_argument("--top", type=int, default=12, help="heaviest imports to list")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="spanisami-import-")
+    runs = [import_times(data_dir) for _ in range(args.runs)]
+    times, loaded = min(runs, key=lambda run: run[0]["app"][0])
+    total_ms = times["app"][0] / 1000
+
+    print(f"import app: {total_ms:.0f} ms (fastest of {args.runs}), budget {args.budget_ms:.0f} ms")
+    print(f"{'module':<32} {'ms':>8}")
+    direct = sorted(
+        ((us, name) for name, (us, depth) in times.items() if depth == 1), reverse=True,
+    )
+    for us, name in direct[: args.top]:
+        print(f"{name:<32} {us / 1000:>8.1f}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import took {total_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        failures.append(f"imported at startup, should load on first use: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
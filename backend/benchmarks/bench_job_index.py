@@ -0,0 +1,142 @@
+"""
+Job matching index: build time, memory, query latency and update rate.
+
+Generates synthetic South African entry-level postings, builds a JobIndex over
+them, then prints:
+
+  build     – bulk index time and RSS growth
+  match     – /match_jobs-style top-10 queries for random profiles (p50/p95)
+  scan      – the same queries scored by a pure-Python loop over every job
+              (only up to --scan-max postings; it is the thing being replaced)
+  upsert    – incremental single-job updates per second
+
+Run from the backend folder:
+    python benchmarks/bench_job_index.py
+    python benchmarks/bench_job_index.py --sizes 10000,1000000 --queries 200
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_index import JobIndex, job_terms, profile_terms  # noqa: E402
+from profile_schema import Experience, Profile  # noqa: E402
+
+CITIES = ["Johannesburg", "Pretoria", "Cape Town", "Durban", "Polokwane", "Bloemfontein", "Gqeberha",
+          "Rustenburg", "East London", "Mbombela", "Kimberley", "Soweto", "Pietermaritzburg", "George"]
+ROLES = ["cashier", "shop assistant", "waiter", "barista", "call centre agent", "admin assistant", "packer",
+         "warehouse picker", "security guard", "cleaner", "tutor", "promoter", "driver", "hairstylist",
+         "general worker", "receptionist", "kitchen assistant", "data capturer", "farm worker", "petrol attendant"]
+SKILLS = ["cash handling", "customer service", "stock taking", "basic computer skills", "email", "excel",
+          "forklift", "driving licence", "cooking", "cleaning", "hair braiding", "sales", "phone manner",
+          "teamwork", "time management", "first aid", "maths", "filing", "typing", "merchandising",
+          "cash up", "till operation", "security", "gardening", "childcare", "tutoring", "welding"]
+LANGUAGES = ["English", "isiZulu", "isiXhosa", "Afrikaans", "Sesotho", "Setswana", "Sepedi", "Xitsonga"]
+FILLER = ("help customers keep area tidy work shifts weekends full training provided learnership "
+          "reliable punctual friendly team store branch entry level matric").split()
+
+
+def make_job(rng, i):
+    role = rng.choice(ROLES)
+    return {
+        "id": str(i),
+        "title": f"{role.title()} – {rng.choice(['Retail', 'Hospitality', 'Logistics', 'Community', 'Office'])}",
+        "company": f"Company {i % 5000}",
+        "city": rng.choice(CITIES),
+        "description": " ".join(rng.sample(FILLER, 8)) + f" {role}",
+        "requirements": rng.sample(SKILLS, 3) + [rng.choice(["Matric", "Grade 10", "Any pass"])],
+        "languages": rng.sample(LANGUAGES, 2),
+    }
+
+
+def make_profile(rng):
+    return Profile(
+        name="Test",
+        location=rng.choice(CITIES),
+        education="Matric",
+        skills=rng.sample(SKILLS, 4),
+        experience=[Experience(role=rng.choice(ROLES), description=" ".join(rng.sample(FILLER, 6)))],
+        languages=rng.sample(LANGUAGES, 2),
+        summary="Friendly and reliable",
+    )
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def scan(jobs_terms, query, k=10):
+    """Baseline: score every job in Python (term overlap × weights)."""
+    scored = []
+    for job_id, terms in jobs_terms:
+        score = sum(weight * terms[t] for t, weight in query.items() if t in terms)
+        if score:
+            scored.append((score, job_id))
+    scored.sort(reverse=True)
+    return scored[:k]
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.mean(ordered), ordered[len(ordered) // 2], ordered[max(0, int(len(ordered) * 0.95) - 1)]
+
+
+def run(size, queries, scan_max, rng):
+    jobs = [make_job(rng, i) for i in range(size)]
+    index = JobIndex()
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    index.build(jobs)
+    build_s = time.perf_counter() - started
+    stats = index.stats()
+    print(f"\n{size} postings: {stats['terms']} terms, {stats['postings']} postings entries")
+    print(f"  build    {build_s:8.2f} s   RSS +{rss_mb() - rss_before:.0f} MB (peak {rss_mb():.0f} MB)")
+
+    profiles = [make_profile(rng) for _ in range(queries)]
+    times = []
+    for profile in profiles:
+        started = time.perf_counter()
+        index.match_profile(profile, k=10)
+        times.append((time.perf_counter() - started) * 1000)
+    mean, p50, p95 = percentiles(times)
+    print(f"  match    mean {mean:7.2f} ms   p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+
+    if size <= scan_max:
+        jobs_terms = [(job["id"], job_terms(job)) for job in jobs]
+        times = []
+        for profile in profiles[: max(1, queries // 10)]:
+            query = profile_terms(profile)
+            started = time.perf_counter()
+            scan(jobs_terms, query)
+            times.append((time.perf_counter() - started) * 1000)
+        mean, p50, p95 = percentiles(times)
+        print(f"  scan     mean {mean:7.2f} ms   p50 {p50:7.2f} ms   p95 {p95:7.2f} ms")
+
+    updates = 2000
+    started = time.perf_counter()
+    for i in range(updates):
+        index.upsert(make_job(rng, rng.randrange(size)))
+    elapsed = time.perf_counter() - started
+    print(f"  upsert   {updates / elapsed:8.0f} jobs/s  ({index.stats()['dead_rows']} tombstoned rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scan-max", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for size in (int(s) for s in args.sizes.split(",")):
+        run(size, args.queries, args.scan_max, rng)
+
+
+if __name__ == "__main__":
+    main()
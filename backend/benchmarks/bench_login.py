@@ -0,0 +1,150 @@
+"""
+Phone login: round-trips, latency and code reuse under concurrent verifies.
+
+Runs against the local database stand-in with a simulated network delay per
+call (--rtt), and compares two login paths:
+
+  legacy   – the old /verify_code: get code, delete code, get phone record,
+             then write the phone record (four sequential round-trips)
+  cas      – PhoneLogins.verify: one compare-and-set on phone_numbers/<phone>,
+             with the ETag cached by /request_code
+
+Two phases per path:
+
+  latency  – request a code, then verify it, one phone at a time. Prints the
+             round-trips and the p50/p95 of the verify step.
+  race     – --racers threads verify the same code at once, spread over
+             --workers PhoneLogins instances. Each instance has its own cache,
+             like separate worker processes. Prints how many codes were
+             accepted more than once and how many phones ended up with more
+             than one profile_id. The cas path must show 0 for both, and the
+             script exits non-zero if it does not.
+
+Run from the backend folder:
+    python benchmarks/bench_login.py
+    python benchmarks/bench_login.py --phones 200 --racers 16 --workers 4 --rtt 0.03
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.local_rtdb import LocalDatabase  # noqa: E402
+from database.phone_logins import InvalidCode, PhoneLogins  # noqa: E402
+
+CODE = "123456"
+
+
+class LegacyLogins:
+    """The pre-transaction flow, kept here as the baseline."""
+
+    def __init__(self, db):
+        self._db = db
+
+    def store_code(self, phone, code, expires_at):
+        self._db.reference(f"login_codes/{phone}").set({"code": code, "expires_at": expires_at})
+
+    def verify(self, phone, code):
+        entry = self._db.reference(f"login_codes/{phone}").get()
+        now_ts = datetime.now(timezone.utc).timestamp()
+        if not entry or entry.get("code") != code or now_ts > float(entry.get("expires_at", 0)):
+            raise InvalidCode(phone)
+        self._db.reference(f"login_codes/{phone}").delete()
+        phone_doc = self._db.reference(f"phone_numbers/{phone}").get()
+        stamp = datetime.now(timezone.utc).isoformat()
+        if phone_doc:
+            self._db.reference(f"phone_numbers/{phone}").update({"last_login": stamp})
+            return phone_doc, False
+        record = {"profile_id": str(uuid.uuid4()), "created_at": stamp, "last_login": stamp}
+        self._db.reference(f"phone_numbers/{phone}").set(record)
+        return record, True
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def expiry():
+    return datetime.now(timezone.utc).timestamp() + 300
+
+
+def latency_phase(label, logins, db, phones):
+    times, trips = [], []
+    for i in range(phones):
+        phone = f"+2782{i:07d}"
+        logins.store_code(phone, CODE, expiry())
+        calls_before = db.calls
+        started = time.perf_counter()
+        logins.verify(phone, CODE)
+        times.append((time.perf_counter() - started) * 1000)
+        trips.append(db.calls - calls_before)
+    ordered = sorted(times)
+    print(f"{label:<8} {'latency':<8} {sum(trips) / len(trips):>12.2f} "
+          f"{percentile(ordered, 0.5):>9.1f} {percentile(ordered, 0.95):>9.1f}")
+
+
+def race_phase(label, make_logins, db, phones, racers, workers):
+    instances = [make_logins(db) for _ in range(workers)]
+    double_used = split_profiles = 0
+    for i in range(phones):
+        phone = f"+2783{i:07d}"
+        # Half the phones are returning users, half log in for the first time
+        if i % 2:
+            instances[0].store_code(phone, CODE, expiry())
+            instances[0].verify(phone, CODE)
+        instances[i % workers].store_code(phone, CODE, expiry())
+
+        accepted, profile_ids = [], set()
+        barrier = threading.Barrier(racers)
+
+        def attempt(n):
+            barrier.wait()
+            try:
+                record, _ = instances[n % workers].verify(phone, CODE)
+            except InvalidCode:
+                return
+            accepted.append(n)
+            profile_ids.add(record["profile_id"])
+
+        threads = [threading.Thread(target=attempt, args=(n,)) for n in range(racers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        double_used += len(accepted) > 1
+        stored = db.reference(f"phone_numbers/{phone}").get() or {}
+        profile_ids.add(stored.get("profile_id"))
+        split_profiles += len(profile_ids) > 1
+    print(f"{label:<8} {'race':<8} {'':>12} {'':>9} {'':>9} {double_used:>12} {split_profiles:>15}")
+    return double_used + split_profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--phones", type=int, default=100)
+    parser.add_argument("--racers", type=int, default=8, help="concurrent verifies of the same code")
+    parser.add_argument("--workers", type=int, default=2, help="PhoneLogins instances (separate caches)")
+    parser.add_argument("--rtt", type=float, default=0.02, help="simulated seconds per database call")
+    args = parser.parse_args()
+
+    print(f"{args.phones} phones, rtt {args.rtt * 1000:.0f} ms, {args.racers} racers over {args.workers} workers")
+    print(f"{'path':<8} {'phase':<8} {'round-trips':>12} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'codes reused':>12} {'split profiles':>15}")
+    failures = 0
+    for label, make_logins in [("legacy", LegacyLogins), ("cas", PhoneLogins)]:
+        db = LocalDatabase(latency=args.rtt)
+        latency_phase(label, make_logins(db), db, args.phones)
+        broken = race_phase(label, make_logins, db, args.phones, args.racers, args.workers)
+        if label == "cas":
+            failures = broken
+    if failures:
+        raise SystemExit(f"cas path: {failures} phones with a reused code or split profile")
+
+
+if __name__ == "__main__":
+    main()
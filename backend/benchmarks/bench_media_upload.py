@@ -0,0 +1,96 @@
+"""
+Peak RSS of a media upload: streamed parts vs reading the whole file.
+
+Uploads files of 1 MB, 100 MB and 500 MB to the local storage stand-in, each
+in a fresh subprocess, and prints the process's peak resident memory (ru_maxrss)
+and throughput for:
+
+  buffered  – the old upload_file_supabase(): f.read() then one upload
+  path      – upload_stream() from a local path (memory-mapped windows)
+  fileobj   – upload_stream() from an open file object, as a request body is
+
+Streamed uploads hold at most (parallel + 1) parts of 6 MB, so their peak
+stops growing once a file is that large; buffered grows with the file.
+
+Run from the backend folder:
+    python benchmarks/bench_media_upload.py
+    python benchmarks/bench_media_upload.py --sizes 1,100,500 --parallel 8
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.local_storage import LocalStorage  # noqa: E402
+from database.media_storage import DEFAULT_PART_SIZE, upload_stream  # noqa: E402
+
+MODES = ("buffered", "path", "fileobj")
+
+
+def make_file(path, megabytes):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(megabytes):
+            f.write(block)
+
+
+def run_one(mode, source, workdir, parallel):
+    """Runs inside the child process; prints one JSON line."""
+    storage = LocalStorage(os.path.join(workdir, "storage"))
+    started = time.perf_counter()
+    if mode == "buffered":
+        with open(source, "rb") as f:
+            data = f.read()
+        upload = storage.begin("uploads", "buffered.bin", "application/octet-stream", len(data))
+        storage.put_part(upload, 0, data, True)
+        storage.finish(upload)
+    elif mode == "path":
+        upload_stream(storage, source, "uploads", "path.bin", parallel=parallel)
+    else:
+        with open(source, "rb") as f:
+            upload_stream(storage, f, "uploads", "fileobj.bin", parallel=parallel)
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"elapsed": elapsed, "peak_mb": peak_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1,100,500", help="comma-separated file sizes in MB")
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "SOURCE", "WORKDIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(*args.child, parallel=args.parallel)
+        return
+
+    print(f"streamed bound: {(args.parallel + 1) * DEFAULT_PART_SIZE / 2**20:.0f} MB of parts over the interpreter")
+    print(f"{'size':>8} {'mode':>9} {'peak RSS':>10} {'MB/s':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for megabytes in (int(s) for s in args.sizes.split(",")):
+            source = os.path.join(workdir, f"source-{megabytes}.bin")
+            make_file(source, megabytes)
+            for mode in MODES:
+                out = subprocess.run(
+                    [sys.executable, __file__, "--parallel", str(args.parallel), "--child", mode, source, workdir],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                result = json.loads(out)
+                print(
+                    f"{megabytes:>6}MB {mode:>9} {result['peak_mb']:>8.1f}MB "
+                    f"{megabytes / result['elapsed']:>8.0f}"
+                )
+            os.remove(source)
+            for name in os.listdir(os.path.join(workdir, "storage", "uploads")):
+                os.remove(os.path.join(workdir, "storage", "uploads", name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Model routing: tail latency of CV generation with hedging and tier fallback.
+
+Uses the stub model with a slow, heavy-tailed "writer" and a faster "fast"
+model (lognormal latencies, scaled down so a run takes seconds), sends the
+same /generate_cv-style calls through a ModelRouter under four policies and
+prints p50/p95/p99, the share answered by each model and the extra model
+calls spent:
+
+  direct     – writer only, no timeout (what hard-coding the model did)
+  hedged     – writer, duplicate request once a call outlives writer's p95
+  fallback   – writer, moving on to the fast tier after --timeout seconds
+  both       – hedged and fallback
+
+Run from the backend folder:
+    python benchmarks/bench_model_router.py
+    python benchmarks/bench_model_router.py --requests 2000 --writer lognormal:0.3,0.8
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+from llm_client import StubClient  # noqa: E402
+from model_router import ModelRouter  # noqa: E402
+
+
+def routing(hedge, timeout):
+    return {
+        "tiers": {
+            "writer": {"model": "writer", "timeout": timeout or 3600},
+            "fast": {"model": "fast", "timeout": 3600},
+        },
+        "routes": {"generate_cv": {"tiers": ["writer", "fast"] if timeout else ["writer"], "hedge": hedge}},
+    }
+
+
+def run(label, router, llm, requests, concurrency):
+    calls_before = llm.calls
+
+    def one(i):
+        started = time.perf_counter()
+        completion = router.complete("generate_cv", prompt=f"Write a CV for profile {i}")
+        return time.perf_counter() - started, completion.model
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+
+    times = sorted(t for t, _ in results)
+    models = Counter(model for _, model in results)
+
+    def pct(q):
+        return times[min(len(times) - 1, int(len(times) * q))] * 1000
+
+    extra = (llm.calls - calls_before - requests) / requests * 100
+    mix = ", ".join(f"{model} {count / requests:.0%}" for model, count in models.most_common())
+    print(f"{label:<9} {pct(0.5):>8.0f} {pct(0.95):>8.0f} {pct(0.99):>8.0f} {extra:>10.1f}%   {mix}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--writer", default="lognormal:0.2,0.7", help="writer model latency (stub syntax)")
+    parser.add_argument("--fast", default="lognormal:0.06,0.4", help="fast model latency (stub syntax)")
+    parser.add_argument("--timeout", type=float, default=0.6, help="writer timeout for the fallback policies")
+    args = parser.parse_args()
+
+    print(f"writer {args.writer}, fast {args.fast}, {args.requests} requests x {args.concurrency} concurrent")
+    print(f"{'policy':<9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'extra calls':>11}   answered by")
+    for label, hedge, timeout in [("direct", False, None), ("hedged", True, None),
+                                  ("fallback", False, args.timeout), ("both", True, args.timeout)]:
+        llm = StubClient(model_latency={"writer": args.writer, "fast": args.fast}, seed=7)
+        # A fresh histogram per policy, so one policy's p95 doesn't steer the next
+        latency = metrics.Registry().histogram(
+            "latency_seconds", "Model latency.", ("model", "kind"), buckets=metrics.MODEL_LATENCY_SECONDS.buckets,
+        )
+        router = ModelRouter(llm, routing(hedge, timeout), latency=latency)
+        # Seed the latency histograms the hedge delay is taken from
+        for i in range(40):
+            router.complete("generate_cv", prompt=f"warm-up {i}")
+        run(label, router, llm, args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
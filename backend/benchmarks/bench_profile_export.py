@@ -0,0 +1,78 @@
+"""
+Peak memory: one full "profiles" download vs the paginated export.
+
+Seeds the local Realtime Database stand-in with profiles carrying full CV
+text, then measures (tracemalloc) the peak Python allocation and round-trips
+for:
+
+  full-tree  – db.reference("profiles").get(), the old get_all_profiles()
+  paginated  – export_profiles(), one page in memory at a time
+
+Run from the backend folder:
+    python benchmarks/bench_profile_export.py
+    python benchmarks/bench_profile_export.py --profiles 50000 --page-size 500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ["DATABASE_BACKEND"] = "local"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.database import db, export_profiles  # noqa: E402
+
+CV_TEXT = "AYANDA ZULU\nDurban\n\nSUMMARY\nFriendly and reliable...\n" * 40
+
+
+class NullWriter:
+    def write(self, text):
+        pass
+
+
+def seed(count):
+    profiles = {}
+    for i in range(count):
+        profiles[f"profile-{i:07d}"] = {
+            "profile": {"name": f"User {i}", "skills": ["cash handling", "customer service"]},
+            "created_at": f"2025-11-01T00:00:{i / 1000:012.3f}",
+            "cv": CV_TEXT,
+            "cv_generated_at": f"2025-11-02T00:00:{i / 1000:012.3f}",
+        }
+    db.reference("profiles").set(profiles)
+
+
+def measure(label, fn):
+    calls = db.calls
+    tracemalloc.start()
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>10} {peak / 1e6:>10.1f} MB {db.calls - calls:>12} {elapsed:>9.2f}s")
+
+
+def full_tree():
+    out = NullWriter()
+    for profile_id, record in (db.reference("profiles").get() or {}).items():
+        out.write(json.dumps({"profile_id": profile_id, **record}, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--profiles", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+
+    seed(args.profiles)
+    print(f"{args.profiles} profiles, page size {args.page_size}")
+    print(f"{'mode':>10} {'peak':>13} {'round-trips':>12} {'time':>10}")
+    measure("full-tree", full_tree)
+    measure("paginated", lambda: export_profiles(NullWriter(), args.page_size))
+
+
+if __name__ == "__main__":
+    main()
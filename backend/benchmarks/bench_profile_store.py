@@ -0,0 +1,91 @@
+"""
+Write throughput: write-behind ProfileStore vs one database call per write.
+
+Simulates users creating a profile, generating a CV and updating their login
+metadata against the local Realtime Database stand-in with an injected
+round-trip latency, and prints field writes/sec and round-trips for:
+
+  direct       – database.py style: save_profile(), update_cv(), update(),
+                 one blocking call each
+  write-behind – ProfileStore: queued, flushed as multi-path updates
+
+Run from the backend folder:
+    python benchmarks/bench_profile_store.py
+    python benchmarks/bench_profile_store.py --users 2000 --latency 0.03 --threads 16
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.local_rtdb import LocalDatabase  # noqa: E402
+from database.profile_store import ProfileStore  # noqa: E402
+
+PROFILE = {
+    "name": "Ayanda Zulu",
+    "location": "Durban",
+    "education": "Matric",
+    "skills": ["hair braiding", "customer service", "cash handling"],
+    "experience": [{"role": "Hairstylist", "description": "Braided hair for clients in the community."}],
+    "languages": ["isiZulu", "English"],
+    "summary": "Friendly and reliable with two years of side-hustle experience.",
+}
+CV_TEXT = "AYANDA ZULU\nDurban\n\nSUMMARY\nFriendly and reliable...\n" * 10
+FIELDS_PER_USER = 5  # profile, created_at, cv, cv_generated_at, last_login
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def direct_user(db):
+    profile_id = str(uuid.uuid4())
+    ref = db.reference(f"profiles/{profile_id}")
+    ref.set({"profile": PROFILE, "created_at": now()})
+    ref.update({"cv": CV_TEXT, "cv_generated_at": now()})
+    ref.update({"last_login": now()})
+
+
+def store_user(store):
+    profile_id = str(uuid.uuid4())
+    store.save_profile(profile_id, PROFILE)
+    store.update_cv(profile_id, CV_TEXT)
+    store.update_fields(profile_id, last_login=now())
+
+
+def run(label, users, threads, latency, work):
+    db = LocalDatabase(latency=latency)
+    store = ProfileStore(db) if label == "write-behind" else None
+    target = store if store else db
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: work(target), range(users)))
+    if store:
+        store.close()  # include the final flush in the timing
+    elapsed = time.perf_counter() - started
+
+    writes = users * FIELDS_PER_USER
+    print(f"{label:>13} {writes / elapsed:>12.0f} {db.calls:>12} {elapsed:>9.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated round-trip seconds")
+    args = parser.parse_args()
+
+    print(f"{args.users} users, {args.threads} threads, {args.latency * 1000:.0f} ms per round-trip")
+    print(f"{'mode':>13} {'writes/sec':>12} {'round-trips':>12} {'time':>10}")
+    run("direct", args.users, args.threads, args.latency, direct_user)
+    run("write-behind", args.users, args.threads, args.latency, store_user)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Interview question bank: model calls and time to first reply text, bank on vs off.
+
+Plays the interview sessions from corpus/e2e.json (en, af and a language
+without a bank) through the Flask test client with the stub model, once with
+the question banks and once with QUESTION_BANK=0 behaviour (every turn from
+the model). Replies are streamed, and the time to the first delta is what
+the user waits for before anything appears.
+
+Prints per run: turns, model calls (hedged requests and summaries
+included), the share of turns served without the model, prompt tokens,
+and time to first text for the opening turn and for all turns.
+
+Run from the backend folder:
+    python benchmarks/bench_question_bank.py
+    python benchmarks/bench_question_bank.py --rounds 5 --latency lognormal:0.8,0.3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "e2e.json")
+
+
+def setup_env(latency, data_dir):
+    # No Firebase or OpenAI account needed: local database stand-in, stub model
+    os.environ.update({
+        "DATABASE_BACKEND": "local",
+        "OPENAI_API_KEY": "stub",
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_LATENCY": latency,
+        "LLM_STUB_CHUNK_DELAY": "0.02",
+        "LLM_STUB_SEED": "7",
+        "SMS_BACKEND": "none",
+        "WARM_UP": "0",
+        "IDEMPOTENCY_DB_PATH": os.path.join(data_dir, "idempotency.db"),
+        "BATCH_DB_PATH": os.path.join(data_dir, "batch_jobs.db"),
+        "STATS_DB_PATH": os.path.join(data_dir, "stats.db"),
+        "TRANSCRIBE_UPLOAD_DIR": os.path.join(data_dir, "transcribe_uploads"),
+    })
+
+
+def play(http, session, round_no):
+    """One interview; returns [(turn number, seconds to first text, prompt tokens estimate)]."""
+    session_id = f"bench-{session['language']}-{round_no}-{time.monotonic_ns()}"
+    rows = []
+    for turn, message in enumerate(session["turns"], start=1):
+        started = time.perf_counter()
+        res = http.post("/chat", json={
+            "session_id": session_id,
+            "message": message,
+            "language": session["language"],
+            "mode": "interview",
+            "stream": True,
+        }, buffered=False)
+        first_text, done = None, None
+        for line in res.response:
+            event = json.loads(line)
+            if event["type"] == "delta" and first_text is None:
+                first_text = time.perf_counter() - started
+            elif event["type"] == "done":
+                done = event
+            elif event["type"] == "error":
+                raise SystemExit(f"chat failed: {event}")
+        res.close()
+        rows.append((turn, first_text, done["context"]["prompt_tokens_estimate"]))
+    return rows
+
+
+def run(spani_app, banks, sessions, rounds):
+    """Rows from play(), model calls (hedges and summaries included) and turns served from the bank."""
+    spani_app.question_banks = banks
+    calls_before = spani_app.llm.calls
+    bank_before = spani_app.metrics.CHAT_TURNS.value(mode="interview", source="bank")
+    http = spani_app.app.test_client()
+    rows = [row for i in range(rounds) for session in sessions for row in play(http, session, i)]
+    bank_turns = spani_app.metrics.CHAT_TURNS.value(mode="interview", source="bank") - bank_before
+    return rows, spani_app.llm.calls - calls_before, bank_turns
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=3, help="times to play every session")
+    parser.add_argument("--latency", default="lognormal:0.5,0.3", help="stub model latency (LLM_STUB_LATENCY)")
+    parser.add_argument("--languages", default="en,af,st", help="corpus interview sessions to play")
+    args = parser.parse_args()
+
+    setup_env(args.latency, tempfile.mkdtemp(prefix="spanisami-qbank-"))
+    import app as spani_app
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        corpus = json.load(f)
+    languages = args.languages.split(",")
+    sessions = [s for s in corpus["chat_sessions"] if s["mode"] == "interview" and s["language"] in languages]
+    banks = spani_app.question_banks
+    if banks is None:
+        raise SystemExit("question banks are switched off (QUESTION_BANK=0)")
+
+    print(f"{len(sessions)} interview sessions ({', '.join(s['language'] for s in sessions)}) x {args.rounds} rounds, "
+          f"stub latency {args.latency}; banks: {', '.join(banks.languages())}")
+    print(f"{'run':<10} {'turns':>6} {'model calls':>12} {'no model':>9} {'prompt tok':>11} "
+          f"{'open p50':>9} {'all p50':>8} {'all p95':>8}")
+    for name, run_banks in (("bank", banks), ("no bank", None)):
+        rows, calls, bank_turns = run(spani_app, run_banks, sessions, args.rounds)
+        first = [seconds for turn, seconds, _ in rows]
+        opening = [seconds for turn, seconds, _ in rows if turn == 1]
+        print(f"{name:<10} {len(rows):>6} {calls:>12} {bank_turns / len(rows):>8.0%} "
+              f"{sum(tokens for _, _, tokens in rows):>11} "
+              f"{statistics.median(opening) * 1000:>7.0f}ms {statistics.median(first) * 1000:>6.0f}ms "
+              f"{percentile(first, 0.95) * 1000:>6.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
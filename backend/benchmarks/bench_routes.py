@@ -0,0 +1,113 @@
+"""
+Per-route server overhead with the stub model: no network, no API spend.
+
+Imports the app with LLM_BACKEND=stub and the local database, then drives
+each route through Flask's in-process test client and prints mean, p50, p95
+and p99 latency per route. The stub's own sleep is subtracted, so the numbers
+are what the server adds on top of the model: parsing, prompt rendering,
+caching, storage, serialisation.
+
+  --latency sets the stub's latency distribution (see llm_client.py), e.g.
+  "lognormal:0.8,0.4", to check that overhead stays flat under model delay;
+  the default 0 measures pure overhead fastest.
+
+Run from the backend folder:
+    python benchmarks/bench_routes.py
+    python benchmarks/bench_routes.py --requests 500 --routes chat,generate_cv
+    python benchmarks/bench_routes.py --latency uniform:0.05,0.15 --requests 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RAW_TEXT = ("I help at my uncle's spaza shop on weekends, braid hair for people in the community, "
+            "and I tutor maths for grade 10s. I live in Umlazi. {i}")
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def route_cases(client, profile_id, cv_text):
+    """{name: function(i) -> response}. Each call should be distinct enough to miss caches unless named *_cached."""
+    def post(path, body, **kwargs):
+        return client.post(path, json=body, **kwargs)
+
+    return {
+        "test": lambda i: client.get("/test"),
+        "build_profile": lambda i: post("/build_profile", {"raw_text": RAW_TEXT.format(i=i), "no_cache": True}),
+        "build_profile_cached": lambda i: post("/build_profile", {"raw_text": RAW_TEXT.format(i=0)}),
+        "generate_cv": lambda i: post("/generate_cv", {"profile_id": profile_id, "target_role": f"role {i}"}),
+        "generate_cv_stream": lambda i: post(
+            "/generate_cv", {"profile_id": profile_id, "target_role": f"streamed role {i}", "stream": True}),
+        "chat": lambda i: post("/chat", {"message": f"Hi, I am looking for work {i}", "session_id": f"bench-{i % 50}"}),
+        "chat_stream": lambda i: post(
+            "/chat", {"message": f"Hi again {i}", "session_id": f"bench-s-{i % 50}", "stream": True}),
+        "cv_pdf": lambda i: post("/cv_pdf", {"cv": cv_text + f"\n{i}"}),
+        "match_jobs": lambda i: client.get(f"/match_jobs?profile_id={profile_id}"),
+        "jobs_near": lambda i: client.get("/jobs_near?town=Soweto&radius_km=25"),
+        "stats": lambda i: client.get("/stats"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--routes", default="", help="comma-separated subset of routes")
+    parser.add_argument("--latency", default="0", help="stub latency distribution")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="spanisami-bench-")
+    os.environ.update({
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_LATENCY": args.latency,
+        "LLM_STUB_SEED": "7",
+        "DATABASE_BACKEND": "local",
+        "LOCAL_DB_PATH": os.path.join(data_dir, "rtdb.json"),
+        "LOCAL_STORAGE_DIR": os.path.join(data_dir, "storage"),
+    })
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    import app as spani_app
+
+    client = spani_app.app.test_client()
+    built = client.post("/build_profile", json={"raw_text": RAW_TEXT.format(i="seed")}).get_json()
+    profile_id = built["profile_id"]
+    cv_text = client.post("/generate_cv", json={"profile_id": profile_id}).get_json()["cv"]
+
+    cases = route_cases(client, profile_id, cv_text)
+    selected = [r for r in args.routes.split(",") if r] or list(cases)
+    llm = spani_app.llm
+
+    print(f"stub latency {args.latency!r}, {args.requests} requests per route (stub sleep subtracted)")
+    print(f"{'route':<22} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'model calls':>12}")
+    for name in selected:
+        call = cases[name]
+        call(-1)  # warm-up
+        overheads, calls_before = [], llm.calls
+        for i in range(args.requests):
+            slept_before = llm.slept
+            started = time.perf_counter()
+            response = call(i)
+            response.get_data()  # drain streamed bodies
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise SystemExit(f"{name}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+            overheads.append((elapsed - (llm.slept - slept_before)) * 1000)
+        ordered = sorted(overheads)
+        print(
+            f"{name:<22} {statistics.mean(ordered):>9.2f} {percentile(ordered, 0.5):>9.2f} "
+            f"{percentile(ordered, 0.95):>9.2f} {percentile(ordered, 0.99):>9.2f} "
+            f"{(llm.calls - calls_before) / args.requests:>12.2f}"
+        )
+
+    spani_app.profile_store.flush()
+
+
+if __name__ == "__main__":
+    main()
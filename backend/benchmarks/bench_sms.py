@@ -0,0 +1,101 @@
+"""
+Login SMS: /request_code latency with inline sending vs the background queue.
+
+Sends a burst of /request_code calls (a class signing up at once) from
+--concurrency threads, with the fake SMS sender standing in for Twilio
+(--sms-latency seconds per message, --failure-rate 503s). Prints:
+
+  inline   – the sender is called inside the request, as /request_code
+             used to call Twilio
+  queued   – the route returns once the code is saved; SmsQueue delivers it
+
+For each: request p50/p95/p99, and the time until every SMS was delivered.
+
+Run from the backend folder:
+    python benchmarks/bench_sms.py
+    python benchmarks/bench_sms.py --phones 500 --sms-latency 0.4 --failure-rate 0.1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def burst(client, phones, concurrency, offset):
+    def one(i):
+        started = time.perf_counter()
+        response = client.post("/request_code", json={"phone": f"083{offset + i:07d}"})
+        if response.status_code != 200:
+            raise SystemExit(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return sorted(pool.map(one, range(phones)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--phones", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sms-latency", type=float, default=0.3)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=16, help="SMS queue workers")
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="spanisami-bench-")
+    os.environ.update({
+        "SMS_BACKEND": "fake",
+        "SMS_FAKE_LATENCY": str(args.sms_latency),
+        "SMS_FAKE_FAILURE_RATE": str(args.failure_rate),
+        "SMS_FAKE_SEED": "7",
+        "SMS_WORKERS": str(args.workers),
+        "LLM_BACKEND": "stub",
+        "DATABASE_BACKEND": "local",  # in memory: rewriting a JSON file per write would dominate
+        "LOCAL_STORAGE_DIR": os.path.join(data_dir, "storage"),
+        "IDEMPOTENCY_DB_PATH": os.path.join(data_dir, "idempotency.db"),
+    })
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+
+    import app as spani_app
+    from sms_queue import SmsSendError
+
+    client = spani_app.app.test_client()
+    queue, sender = spani_app.sms_queue, spani_app.sms_sender
+    queue.backoff_base = 0.05  # keep retries within the run
+
+    print(f"{args.phones} phones x {args.concurrency} concurrent, SMS {args.sms_latency * 1000:.0f} ms, "
+          f"{args.failure_rate:.0%} failures, {args.workers} queue workers")
+    print(f"{'mode':<8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'all delivered s':>16}")
+
+    # Inline: what the route did before, one send (plus retries) per request
+    original_send = queue.send
+
+    def send_inline(to, body, expires_at=None):
+        for _ in range(queue.max_attempts):
+            try:
+                return sender.send(to, body)
+            except SmsSendError:
+                continue
+
+    for label, send, offset in [("inline", send_inline, 0), ("queued", original_send, 10_000_000)]:
+        queue.send = send
+        started = time.perf_counter()
+        times = burst(client, args.phones, args.concurrency, offset)
+        queue.drain(timeout=600)
+        delivered = time.perf_counter() - started
+        print(f"{label:<8} {percentile(times, 0.5):>9.1f} {percentile(times, 0.95):>9.1f} "
+              f"{percentile(times, 0.99):>9.1f} {delivered:>16.1f}")
+    queue.send = original_send
+    print(f"queue: {queue.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Scaling: requests per second through serve.py at 1, 2, 4 and 8 workers.
+
+For each worker count, starts `serve.py --workers N` with the stub model
+(--latency per call), the local database and fresh shared state in a temp
+folder. Then --clients threads send a mixed load for --seconds over
+keep-alive connections:
+
+  build_profile (no cache) → generate_cv with the new profile_id (usually
+  answered by another worker) → match_jobs → cv_pdf → chat on a session
+  that moves between workers
+
+Prints throughput, p50/p95/p99 and errors per worker count. It also checks
+shared state: /stats must count every profile built, whichever worker built
+it, and no call may 404 on a profile or session another worker created.
+Each server is stopped with SIGTERM (graceful drain).
+
+The model wait is I/O, which one process already overlaps on its thread
+pool. Extra workers pay off on the CPU-bound parts (JSON, prompt rendering,
+PDF layout, ranking) once there are cores for them, so compare runs against
+the core count printed at the top.
+
+Run from the backend folder:
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --workers 1,2,4 --clients 64 --seconds 20 --latency 0.2
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, port, latency, data_dir):
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "stub",
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_LATENCY": str(latency),
+        "LLM_STUB_SEED": "7",
+        "DATABASE_BACKEND": "local",
+        "SMS_BACKEND": "none",
+        "LOCAL_DB_PATH": os.path.join(data_dir, "rtdb.json"),
+        "LOCAL_STORAGE_DIR": os.path.join(data_dir, "storage"),
+        "SESSION_BACKEND": "sqlite",
+        "SESSION_DB_PATH": os.path.join(data_dir, "sessions.db"),
+        "CACHE_DB_PATH": os.path.join(data_dir, "response_cache.db"),
+        "IDEMPOTENCY_DB_PATH": os.path.join(data_dir, "idempotency.db"),
+        "BATCH_DB_PATH": os.path.join(data_dir, "batch_jobs.db"),
+        "STATS_DB_PATH": os.path.join(data_dir, "stats.db"),
+        "METRICS_DIR": os.path.join(data_dir, "metrics"),
+    })
+    process = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            connection.request("GET", "/stats")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f"serve.py --workers {workers} did not start: {process.stderr.read().decode()[-2000:]}")
+
+
+class Client:
+    def __init__(self, port):
+        self.port = port
+        self.connection = None
+
+    def call(self, method, path, body=None):
+        """(status, parsed JSON or raw bytes). Reconnects once if the keep-alive connection went away."""
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            try:
+                payload = json.dumps(body) if body is not None else None
+                headers = {"Content-Type": "application/json"} if body is not None else {}
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+                continue
+            is_json = response.getheader("Content-Type", "").startswith("application/json")
+            return response.status, json.loads(data) if is_json else data
+
+
+def user_journey(client, n, record):
+    """One mixed sequence; record(ok, seconds) per request."""
+    def timed(method, path, body=None):
+        started = time.perf_counter()
+        try:
+            status, result = client.call(method, path, body)
+        except Exception:
+            record(False, time.perf_counter() - started)
+            return None
+        record(status < 400, time.perf_counter() - started)
+        return result if status < 400 else None
+
+    built = timed("POST", "/build_profile", {
+        "raw_text": f"I fix phones and help at a spaza shop in Soweto. Learner {n}.", "no_cache": True,
+    })
+    if not built:
+        return False
+    profile_id = built["profile_id"]
+    cv = timed("POST", "/generate_cv", {"profile_id": profile_id, "target_role": f"role {n % 40}"})
+    timed("GET", f"/match_jobs?profile_id={profile_id}")
+    if cv:
+        timed("POST", "/cv_pdf", {"cv": cv["cv"]})
+    session_id = f"bench-{n % 200}"
+    timed("POST", "/chat", {"message": f"Hi, any jobs near me? ({n})", "session_id": session_id})
+    return True
+
+
+def run(workers, args):
+    data_dir = tempfile.mkdtemp(prefix=f"spanisami-workers-{workers}-")
+    port = free_port()
+    process = start_server(workers, port, args.latency, data_dir)
+    times, errors, journeys = [], [0], [0]
+    lock = threading.Lock()
+
+    def record(ok, seconds):
+        with lock:
+            times.append(seconds)
+            if not ok:
+                errors[0] += 1
+
+    stop_at = time.monotonic() + args.seconds
+
+    def loop(index):
+        client = Client(port)
+        n = index
+        while time.monotonic() < stop_at:
+            if user_journey(client, n, record):
+                with lock:
+                    journeys[0] += 1
+            n += args.clients
+
+    # Warm-up: import paths, caches, first SQLite pages
+    warm = Client(port)
+    for i in range(workers * 2):
+        user_journey(warm, -1 - i, lambda ok, seconds: None)
+    stats_before = warm.call("GET", "/stats")[1]["profiles_created"]
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=loop, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    profiles_counted = warm.call("GET", "/stats")[1]["profiles_created"] - stats_before
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=120)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+    ordered = sorted(times)
+    consistent = "ok" if profiles_counted == journeys[0] else f"counted {profiles_counted}/{journeys[0]}"
+    print(f"{workers:>7} {len(ordered) / elapsed:>9.1f} {percentile(ordered, 0.5) * 1000:>9.1f} "
+          f"{percentile(ordered, 0.95) * 1000:>9.1f} {percentile(ordered, 0.99) * 1000:>9.1f} "
+          f"{errors[0]:>7} {consistent:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent client threads")
+    parser.add_argument("--seconds", type=float, default=15.0, help="load duration per worker count")
+    parser.add_argument("--latency", default="0.05", help="stub model latency (llm_client.py syntax)")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.clients} clients, {args.seconds:.0f} s per run, "
+          f"stub latency {args.latency}")
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'/stats':>12}")
+    for workers in [int(w) for w in args.workers.split(",") if w]:
+        run(workers, args)
+
+
+if __name__ == "__main__":
+    main()
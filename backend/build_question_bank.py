@@ -0,0 +1,120 @@
+"""
+Generate an interview question bank for another language (question_bank.py).
+
+Translates an existing bank with one model call and writes it as the next
+version for that language, e.g. question_banks/zu.v1.json. The app picks it
+up on the next start; pin the previous one with QUESTION_BANK_VERSIONS if
+the review finds problems. Have a first-language speaker read it before
+shipping.
+
+    python build_question_bank.py zu
+    python build_question_bank.py xh --source af --model gpt-4.1-mini
+    python build_question_bank.py st --out /tmp/st.json   # try it out first
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date
+
+from dotenv import load_dotenv
+
+from llm_client import make_llm_client
+from prompt_registry import PromptRegistry
+from question_bank import QuestionBanks
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BANK_JSON_SCHEMA = {
+    "name": "question_bank",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["intro", "next", "outro", "questions"],
+        "properties": {
+            "intro": {"type": "string"},
+            "next": {"type": "string"},
+            "outro": {"type": "string"},
+            "questions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["id", "question", "rubric"],
+                    "properties": {
+                        "id": {"type": "string"},
+                        "question": {"type": "string"},
+                        "rubric": {"type": "array", "items": {"type": "string"}},
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+def check_translation(source: dict, translated: dict) -> None:
+    """The same questions in the same order, each with as many rubric points."""
+    expected = [(q["id"], len(q["rubric"])) for q in source["questions"]]
+    got = [(q["id"], len(q["rubric"])) for q in translated["questions"]]
+    if got != expected:
+        raise SystemExit(f"translation does not match the source bank:\n  expected {expected}\n  got      {got}")
+    empty = [q["id"] for q in translated["questions"] if not q["question"].strip()]
+    if empty or not all(translated[field].strip() for field in ("intro", "next", "outro")):
+        raise SystemExit(f"translation has empty fields (questions: {empty or 'none'})")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Translate a SpaniSami interview question bank.")
+    parser.add_argument("language", help="language code of the new bank, e.g. zu")
+    parser.add_argument("--source", default="en", help="language of the bank to translate (default en)")
+    parser.add_argument("--model", default=os.getenv("MODEL_WRITER", "gpt-5.1"))
+    parser.add_argument("--dir", default=os.getenv("QUESTION_BANK_DIR") or os.path.join(BACKEND_DIR, "question_banks"))
+    parser.add_argument("--out", help="write here instead of the next version in --dir")
+    args = parser.parse_args()
+
+    banks = QuestionBanks(args.dir)
+    source_bank = banks.get(args.source)
+    if source_bank is None:
+        raise SystemExit(f"no {args.source} bank in {args.dir}")
+    with open(os.path.join(args.dir, f"{source_bank.label}.json"), encoding="utf-8") as f:
+        source = json.load(f)
+    source = {field: source[field] for field in ("intro", "next", "outro", "questions")}
+
+    prompts = PromptRegistry(os.path.join(BACKEND_DIR, "prompt_templates"))
+    prompt = prompts.render(
+        "translate_question_bank",
+        language=args.language,
+        bank=json.dumps(source, ensure_ascii=False, indent=2),
+    )
+    completion = make_llm_client().complete(
+        args.model,
+        messages=[{"role": "user", "content": prompt}],
+        json_schema=BANK_JSON_SCHEMA,
+    )
+    try:
+        translated = json.loads(completion.text)
+    except ValueError as e:
+        raise SystemExit(f"the model did not return JSON: {e}")
+    check_translation(source, translated)
+
+    out = args.out
+    if not out:
+        current = banks.get(args.language)
+        version = current.version + 1 if current else 1
+        out = os.path.join(args.dir, f"{args.language}.v{version}.json")
+    bank = {
+        "about": f"Generated from {source_bank.label} by {args.model} on {date.today().isoformat()}. "
+                 "Review by a first-language speaker before shipping.",
+        **translated,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(bank, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"wrote {out} ({len(translated['questions'])} questions)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Doing each model call once when the same request arrives several times.
+
+A double-tapped "Generate CV", or a phone re-sending a request on a flaky
+connection, used to start a second identical model call while the first was
+still running. Two layers stop that:
+
+  SingleFlight      – within a process. Concurrent calls with the same key
+                      (the response-cache key of the normalised prompt)
+                      share one upstream call. The first caller runs it and
+                      the rest wait for its result or its error.
+  IdempotencyStore  – across worker processes, for requests that carry an
+                      Idempotency-Key header. A small SQLite table records
+                      each key as pending, then stores the finished response.
+                      A repeat replays the stored response, and a repeat
+                      that arrives while the first is still running waits
+                      for it. A pending row whose worker died is taken over
+                      once its lease runs out.
+
+Both count what they saved, and /stats shows it.
+"""
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+# ---------------------------------------------------
+# IN-PROCESS SINGLE FLIGHT
+# ---------------------------------------------------
+class _Flight:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self, wait_timeout: float = 120.0):
+        self.wait_timeout = wait_timeout
+        self._flights = {}  # {key: _Flight}
+        self._lock = threading.Lock()
+        self._counters = {"leaders": 0, "coalesced": 0, "shared_errors": 0}
+
+    def do(self, key: str, fn: Callable[[], object]) -> tuple:
+        """(result, shared): shared is True when another caller's run was reused."""
+        flight, leader = self.join(key)
+        if not leader:
+            return self.wait(flight), True
+        try:
+            result = fn()
+        except BaseException as e:
+            self.resolve(key, flight, error=e)
+            raise
+        self.resolve(key, flight, result=result)
+        return result, False
+
+    def join(self, key: str) -> tuple:
+        """(flight, is_leader). The leader must call resolve(), whatever happens."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self._counters["leaders"] += 1
+                return flight, True
+            flight.followers += 1
+            self._counters["coalesced"] += 1
+            return flight, False
+
+    def resolve(self, key: str, flight: _Flight, result=None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if error is not None and flight.followers:
+                self._counters["shared_errors"] += 1
+        flight.result, flight.error = result, error
+        flight.done.set()
+
+    def wait(self, flight: _Flight):
+        if not flight.done.wait(self.wait_timeout):
+            raise TimeoutError("timed out waiting for an identical in-flight request")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._counters)
+            result["in_flight"] = len(self._flights)
+        return result
+
+
+# ---------------------------------------------------
+# CROSS-WORKER IDEMPOTENCY KEYS
+# ---------------------------------------------------
+@dataclass(slots=True)
+class StoredResponse:
+    status: int
+    mimetype: str
+    body: bytes
+
+
+class IdempotencyConflict(ValueError):
+    """The key was already used for a request with a different body."""
+
+
+class IdempotencyBusy(TimeoutError):
+    """The first request with this key is still running after the wait timeout."""
+
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: int = 24 * 3600,
+        lease_seconds: float = 180.0,
+        poll_interval: float = 0.05,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            " key TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " state TEXT NOT NULL,"  # pending | done
+            " status INTEGER,"
+            " mimetype TEXT,"
+            " body BLOB,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._counters = {"runs": 0, "replays": 0, "waited": 0, "conflicts": 0, "busy": 0}
+
+    def acquire(self, key: str, fingerprint: str, wait_timeout: float = 60.0) -> Optional[StoredResponse]:
+        """
+        None: the caller owns the key and must finish() or release() it.
+        A StoredResponse: replay it. Raises IdempotencyConflict / IdempotencyBusy.
+        """
+        deadline = time.monotonic() + wait_timeout
+        waited = False
+        while True:
+            state, stored = self._try_claim(key, fingerprint)
+            if state == "claimed":
+                self._count("runs")
+                return None
+            if state == "conflict":
+                self._count("conflicts")
+                raise IdempotencyConflict(key)
+            if state == "done":
+                self._count("waited" if waited else "replays")
+                return stored
+            if time.monotonic() >= deadline:
+                self._count("busy")
+                raise IdempotencyBusy(key)
+            waited = True
+            time.sleep(self.poll_interval)
+
+    def finish(self, key: str, response: StoredResponse) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE idempotency SET state = 'done', status = ?, mimetype = ?, body = ?, expires_at = ?"
+                " WHERE key = ?",
+                (response.status, response.mimetype, response.body, time.time() + self.ttl_seconds, key),
+            )
+
+    def release(self, key: str) -> None:
+        """Give the key up without a stored answer (e.g. a 5xx), so a retry runs again."""
+        with self._lock:
+            self._db.execute("DELETE FROM idempotency WHERE key = ? AND state = 'pending'", (key,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._counters)
+            result["stored"] = self._db.execute(
+                "SELECT COUNT(*) FROM idempotency WHERE state = 'done'"
+            ).fetchone()[0]
+        return result
+
+    def _try_claim(self, key, fingerprint):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT fingerprint, state, status, mimetype, body, expires_at FROM idempotency WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None or row[5] <= now:
+                    # New key, expired answer, or a pending run whose worker died
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO idempotency (key, fingerprint, state, expires_at)"
+                        " VALUES (?, ?, 'pending', ?)",
+                        (key, fingerprint, now + self.lease_seconds),
+                    )
+                    self._db.execute("DELETE FROM idempotency WHERE expires_at <= ?", (now,))
+                    return "claimed", None
+                if row[0] != fingerprint:
+                    return "conflict", None
+                if row[1] == "done":
+                    return "done", StoredResponse(row[2], row[3], bytes(row[4] or b""))
+                return "pending", None
+            finally:
+                self._db.execute("COMMIT")
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
@@ -0,0 +1,86 @@
+"""
+Token-budgeted context window for /chat.
+
+Instead of sending the whole conversation on every turn, /chat sends:
+
+    [system prompt] + [running summary of older turns] + [last N turns verbatim]
+
+The recent window is capped both by turn count and by a token budget. When a
+new turn pushes it over either limit, the oldest turns are folded into the
+running summary in one go, down to `keep_turns // 2`, so the summariser runs
+once every few turns rather than on every request, and only ever sees the
+turns it has not summarised yet.
+"""
+from typing import List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional – fall back to a character-based estimate
+    tiktoken = None
+
+# Per-message overhead the chat format adds around role/content.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    # ~4 characters per token for English; good enough for budgeting
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: List[dict]) -> int:
+    return sum(count_tokens(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages) + 2
+
+
+class ContextWindow:
+    def __init__(self, keep_turns: int = 12, token_budget: int = 1500):
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+
+    def split(self, turns: List[dict]):
+        """
+        Split stored turns (newest last) into (to_fold, recent).
+        `to_fold` is empty while the window still fits.
+        """
+        if self._fits(turns):
+            return [], turns
+
+        # Overflowed: fold down to half the window so the next few turns fit
+        # without another summary call.
+        target = max(self.keep_turns // 2, 1)
+        recent = []
+        tokens = 0
+        for turn in reversed(turns):
+            turn_tokens = count_message_tokens([turn])
+            if recent and (len(recent) >= target or tokens + turn_tokens > self.token_budget // 2):
+                break
+            recent.insert(0, turn)
+            tokens += turn_tokens
+
+        return turns[: len(turns) - len(recent)], recent
+
+    def build(
+        self,
+        system_prompt: str,
+        summary: Optional[str],
+        recent: List[dict],
+    ) -> List[dict]:
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary}",
+            })
+        return messages + recent
+
+    def _fits(self, turns):
+        if len(turns) > self.keep_turns:
+            return False
+        return count_message_tokens(turns) <= self.token_budget
+
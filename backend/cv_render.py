@@ -0,0 +1,228 @@
+"""
+Server-side CV rendering to PDF with fpdf2.
+
+Rendering was done in the browser with jsPDF, which is slow on low-end phones
+and gives different output per device. Here:
+
+  - Each layout is a CvTemplate (page size, margins, fonts, styles). A
+    template document with its fonts already loaded is built once per
+    template, and the font files are kept in memory; renders deep-copy it
+    instead of re-parsing the fonts, which is most of fpdf2's per-document
+    setup cost.
+  - Rendered bytes are memoised in a byte-bounded LRU keyed on a SHA-256 of
+    template name, version and CV text, so downloading the same CV again
+    costs a dict lookup.
+
+Fonts: a Unicode TrueType family (DejaVu Sans by default, CV_FONT_DIR to
+override). Without one, the built-in Helvetica is used and characters
+outside Latin-1 are replaced.
+
+fpdf2 and fontTools are imported on the first render (or warm()), not with
+this module: together they are most of the app's import time.
+"""
+import copy
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+_FONT_DIRS = [
+    os.getenv("CV_FONT_DIR", ""),
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/dejavu",
+    "/Library/Fonts",
+]
+_FONT_FILES = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf"}
+
+# Typographic characters the CV model likes, mapped for the Latin-1 fallback font
+_LATIN1_FALLBACK = str.maketrans({
+    "–": "-", "—": "-", "‑": "-", "‘": "'", "’": "'",
+    "“": '"', "”": '"', "•": "-", "…": "...", " ": " ",
+})
+
+_BULLET = re.compile(r"^\s*(?:[-*•–]|\d+[.)])\s+")
+_MARKDOWN_HEADING = re.compile(r"^\s*#{1,6}\s*")
+_BOLD_MARKERS = re.compile(r"\*\*(.+?)\*\*")
+
+
+@dataclass(frozen=True, slots=True)
+class CvTemplate:
+    name: str = "classic"
+    version: str = "v1"
+    page_format: str = "A4"
+    margin: float = 18  # mm
+    body_size: float = 10.5
+    heading_size: float = 12.5
+    title_size: float = 18
+    line_height: float = 5.2
+    accent: tuple = (24, 94, 160)
+
+
+TEMPLATES = {
+    "classic": CvTemplate(),
+    "compact": CvTemplate(name="compact", margin=12, body_size=9.5, heading_size=11, title_size=15, line_height=4.6),
+}
+
+
+def _find_fonts():
+    for folder in _FONT_DIRS:
+        if folder and all(os.path.isfile(os.path.join(folder, f)) for f in _FONT_FILES.values()):
+            return {style: os.path.join(folder, f) for style, f in _FONT_FILES.items()}
+    return None
+
+
+def _parse_lines(cv_text):
+    """Classify CV lines as title / heading / bullet / text / blank."""
+    blocks = []
+    title_seen = False
+    for raw in cv_text.replace("\r\n", "\n").split("\n"):
+        line = _BOLD_MARKERS.sub(r"\1", raw).rstrip()
+        stripped = line.strip()
+        if not stripped:
+            blocks.append(("blank", ""))
+            continue
+
+        is_markdown_heading = bool(_MARKDOWN_HEADING.match(stripped))
+        stripped = _MARKDOWN_HEADING.sub("", stripped)
+        if not title_seen:
+            blocks.append(("title", stripped))
+            title_seen = True
+        elif is_markdown_heading or (stripped.isupper() and len(stripped) <= 40) or (
+            stripped.endswith(":") and len(stripped) <= 40
+        ):
+            blocks.append(("heading", stripped.rstrip(":")))
+        elif _BULLET.match(stripped):
+            blocks.append(("bullet", _BULLET.sub("", stripped)))
+        else:
+            blocks.append(("text", stripped))
+    return blocks
+
+
+class CvRenderer:
+    def __init__(self, max_cache_bytes: int = 64 * 1024 * 1024):
+        self.max_cache_bytes = max_cache_bytes
+        self._fonts = _find_fonts()
+        self._bases = {}  # {template name: FPDF with fonts loaded}
+        self._font_bytes = {}  # {font path: file contents}
+        self._base_lock = threading.Lock()
+
+        self._cache = OrderedDict()  # {content hash: pdf bytes}
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "renders": 0}
+
+    @property
+    def unicode_fonts(self) -> bool:
+        return self._fonts is not None
+
+    def content_hash(self, cv_text: str, template: str = "classic") -> str:
+        layout = TEMPLATES[template]
+        blob = f"{layout.name}\0{layout.version}\0{cv_text}".encode("utf-8")
+        return hashlib.sha256(blob).hexdigest()
+
+    def render(self, cv_text: str, template: str = "classic") -> tuple:
+        """(pdf bytes, content hash). Raises KeyError for an unknown template."""
+        key = self.content_hash(cv_text, template)
+        with self._lock:
+            pdf = self._cache.get(key)
+            if pdf is not None:
+                self._cache.move_to_end(key)
+                self._counters["hits"] += 1
+                return pdf, key
+            self._counters["misses"] += 1
+
+        pdf = self._render(cv_text, TEMPLATES[template])
+
+        with self._lock:
+            self._counters["renders"] += 1
+            if key not in self._cache and len(pdf) <= self.max_cache_bytes:
+                self._cache[key] = pdf
+                self._cache_bytes += len(pdf)
+                while self._cache_bytes > self.max_cache_bytes:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cache_bytes -= len(evicted)
+        return pdf, key
+
+    def warm(self) -> None:
+        """Load fonts for every template now rather than on the first request."""
+        for layout in TEMPLATES.values():
+            self._base(layout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._counters)
+            result["cached_documents"] = len(self._cache)
+            result["cached_bytes"] = self._cache_bytes
+        result["unicode_fonts"] = self.unicode_fonts
+        return result
+
+    # ---------------------------------------------------
+    # LAYOUT
+    # ---------------------------------------------------
+    def _base(self, layout):
+        from fontTools import ttLib
+        from fpdf import FPDF
+
+        with self._base_lock:
+            base = self._bases.get(layout.name)
+            if base is None:
+                base = FPDF(format=layout.page_format)
+                base.set_margins(layout.margin, layout.margin, layout.margin)
+                base.set_auto_page_break(True, margin=layout.margin)
+                base.set_creator("SpaniSami")
+                if self._fonts:
+                    for style, path in self._fonts.items():
+                        base.add_font("CV", style, path)
+                        with open(path, "rb") as f:
+                            self._font_bytes[path] = f.read()
+                self._bases[layout.name] = base
+
+        pdf = copy.deepcopy(base)
+        # fpdf2's deepcopy shares each font's fontTools object, and output()
+        # subsets that object in place. Give the copy its own, opened lazily
+        # from the preloaded bytes; metrics and widths stay shared.
+        for font in pdf.fonts.values():
+            if hasattr(font, "ttfont"):
+                font.ttfont = ttLib.TTFont(
+                    io.BytesIO(self._font_bytes[str(font.ttffile)]), recalcTimestamp=False, lazy=True,
+                )
+        return pdf
+
+    def _render(self, cv_text, layout):
+        pdf = self._base(layout)
+        family = "CV" if self._fonts else "Helvetica"
+        if not self._fonts:
+            cv_text = cv_text.translate(_LATIN1_FALLBACK).encode("latin-1", "replace").decode("latin-1")
+
+        pdf.add_page()
+        width = pdf.epw
+        for kind, text in _parse_lines(cv_text):
+            if kind == "blank":
+                pdf.ln(layout.line_height * 0.5)
+            elif kind == "title":
+                pdf.set_font(family, "B", layout.title_size)
+                pdf.set_text_color(*layout.accent)
+                pdf.multi_cell(width, layout.title_size * 0.5, text, new_x="LMARGIN", new_y="NEXT")
+                pdf.set_text_color(0, 0, 0)
+                pdf.ln(1)
+            elif kind == "heading":
+                pdf.ln(2)
+                pdf.set_font(family, "B", layout.heading_size)
+                pdf.set_text_color(*layout.accent)
+                pdf.cell(width, layout.heading_size * 0.5, text.upper(), new_x="LMARGIN", new_y="NEXT")
+                pdf.set_draw_color(*layout.accent)
+                pdf.line(pdf.l_margin, pdf.get_y(), pdf.l_margin + width, pdf.get_y())
+                pdf.set_text_color(0, 0, 0)
+                pdf.ln(1.5)
+            elif kind == "bullet":
+                pdf.set_font(family, "", layout.body_size)
+                indent = 5
+                pdf.cell(indent, layout.line_height, "-" if not self._fonts else "•")
+                pdf.multi_cell(width - indent, layout.line_height, text, new_x="LMARGIN", new_y="NEXT")
+            else:
+                pdf.set_font(family, "", layout.body_size)
+                pdf.multi_cell(width, layout.line_height, text, new_x="LMARGIN", new_y="NEXT")
+        return bytes(pdf.output())
@@ -1,33 +1,122 @@
-import firebase_admin
-from firebase_admin import credentials, db
-from supabase import create_client
 from dotenv import load_dotenv
 import uuid
+import base64
+import json
+from collections import OrderedDict
 from datetime import datetime
 import os
+import threading
+
+from .media_storage import upload_stream
+from metrics import instrument_database
 
 load_dotenv()
 
+# "firebase" (default) or "local" – an in-process stand-in for tests/benchmarks
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "firebase").lower()
+
+# Clients are created on first use, not at import: the app imports (and a
+# worker starts serving) without waiting for the SDKs, and without
+# credentials until a route needs them. warm() creates them ahead of time.
+_init_lock = threading.Lock()
+
 # =========================== Firebase Setup ===========================
-FIREBASE_KEY_PATH = os.getenv("FIREBASE_KEY_PATH", "firebase-key.json")
-if not os.path.isfile(FIREBASE_KEY_PATH):
-    raise RuntimeError(f"Firebase service account file not found: {FIREBASE_KEY_PATH}")
+class _LazyFirebase:
+    """firebase_admin.db, initialised by the first reference() call."""
+
+    def __init__(self):
+        self._db = None
+
+    def reference(self, *args, **kwargs):
+        return self.client().reference(*args, **kwargs)
+
+    def client(self):
+        if self._db is None:
+            with _init_lock:
+                if self._db is None:
+                    self._db = _init_firebase()
+        return self._db
+
 
-cred = credentials.Certificate(FIREBASE_KEY_PATH)
-firebase_admin.initialize_app(cred, {
-    "databaseURL": "https://spanisami-3fba1-default-rtdb.firebaseio.com/"
-})
+def _init_firebase():
+    import firebase_admin
+    from firebase_admin import credentials, db as firebase_db
+
+    FIREBASE_KEY_PATH = os.getenv("FIREBASE_KEY_PATH", "firebase-key.json")
+    if not os.path.isfile(FIREBASE_KEY_PATH):
+        raise RuntimeError(f"Firebase service account file not found: {FIREBASE_KEY_PATH}")
+
+    cred = credentials.Certificate(FIREBASE_KEY_PATH)
+    firebase_admin.initialize_app(cred, {
+        "databaseURL": "https://spanisami-3fba1-default-rtdb.firebaseio.com/"
+    })
+    return firebase_db
+
+
+if DATABASE_BACKEND == "local":
+    from .local_rtdb import LocalDatabase
+
+    db = LocalDatabase(
+        path=os.getenv("LOCAL_DB_PATH") or None,
+        latency=float(os.getenv("LOCAL_DB_LATENCY", "0")),
+    )
+else:
+    db = _LazyFirebase()
+
+# Every reference call is timed for /metrics (dependency "db")
+db = instrument_database(db)
 
 # =========================== Supabase Setup ===========================
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment")
+_supabase = None
+_media_storage = None
+
+
+def get_supabase():
+    """The Supabase client, or None in local mode without Supabase config (no signed URLs)."""
+    _init_storage()
+    return _supabase
+
+
+def get_media_storage():
+    """Where uploads go: Supabase Storage, or a local folder in local mode."""
+    _init_storage()
+    return _media_storage
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+def _init_storage():
+    global _supabase, _media_storage
+    if _media_storage is not None:
+        return
+    with _init_lock:
+        if _media_storage is not None:
+            return
+        if SUPABASE_URL and SUPABASE_KEY:
+            from supabase import create_client
+            from .media_storage import SupabaseResumableStorage
+
+            _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+            _media_storage = SupabaseResumableStorage(SUPABASE_URL, SUPABASE_KEY)
+        elif DATABASE_BACKEND == "local":
+            from .local_storage import LocalStorage
+
+            _media_storage = LocalStorage(
+                os.getenv("LOCAL_STORAGE_DIR", "data/storage"),
+                latency=float(os.getenv("LOCAL_STORAGE_LATENCY", "0")),
+            )
+        else:
+            raise RuntimeError("SUPABASE_URL and SUPABASE_KEY must be set in environment")
+
+
+def warm() -> None:
+    """Create the clients and open a database connection (one small read)."""
+    db.reference("profiles").order_by_key().limit_to_first(1).get()
+    get_media_storage()
 
 # Constants
 DEFAULT_BUCKET = "uploads"
+UPLOAD_PARALLEL_PARTS = int(os.getenv("UPLOAD_PARALLEL_PARTS", "4"))
 
 # =========================== Firebase Helpers ===========================
 def _profile_ref(profile_id: str):
@@ -53,44 +142,229 @@ def update_cv(profile_id: str, cv_text: str) -> None:
     })
 
 def get_all_profiles() -> dict:
-    snapshot = db.reference("profiles").get()
-    return snapshot or {}
+    """Every profile in one dict. Pages through the tree, but still holds the
+    whole result in memory – prefer iter_profiles() or export_profiles()."""
+    return dict(iter_profiles())
 
-# =========================== Supabase Storage ===========================
-def upload_file_supabase(local_path: str, bucket_name: str = DEFAULT_BUCKET) -> str:
-    file_name = f"{uuid.uuid4()}_{os.path.basename(local_path)}"
-    with open(local_path, "rb") as f:
-        file_bytes = f.read()
-
-    res = supabase.storage.from_(bucket_name).upload(
-        path=file_name,
-        file=file_bytes,
-        file_options={"content-type": "application/octet-stream", "upsert": False}
-    )
+# =========================== Profile Listing ===========================
+# Ordered, paginated reads instead of one download of the whole "profiles"
+# tree. "created_at" and "cv_generated_at" are indexed server-side
+# (database.rules.json); "key" ordering needs no index.
+PROFILE_ORDERS = ("key", "created_at", "cv_generated_at")
+DEFAULT_PAGE_SIZE = 200
+# Firebase orders null < false < true < numbers < strings, so this is where
+# rows that have a value start
+FIRST_NON_NULL = False
+# Pages of rows a resumed page scans in key order for rows without the value
+# before it reads the null group through the child index instead
+NULL_SCAN_PAGES = 4
 
-    if res.status_code not in (200, 201):
-        raise RuntimeError(f"Supabase upload failed: {res.json()}")
+def encode_cursor(order_by: str, value, key: str) -> str:
+    """Opaque cursor for the row after (value, key) in `order_by` order."""
+    raw = json.dumps([order_by, value, key], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
 
-    return supabase.storage.from_(bucket_name).get_public_url(file_name)
+def decode_cursor(cursor: str):
+    try:
+        order_by, value, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if order_by not in PROFILE_ORDERS:
+        raise ValueError("Invalid cursor")
+    return order_by, value, key
 
+def get_profiles_page(
+    page_size: int = DEFAULT_PAGE_SIZE,
+    order_by: str = "key",
+    cursor: Optional[str] = None,
+    start_at=None,
+    end_at=None,
+) -> tuple:
+    """One page of profiles as (OrderedDict {profile_id: record}, next_cursor).
 
-def upload_file_and_sync(local_path: str, profile_id: str, bucket_name: str = DEFAULT_BUCKET) -> str:
-    file_url = upload_file_supabase(local_path, bucket_name)
+    `start_at`/`end_at` bound the ordered value (a key, or an ISO timestamp for
+    created_at/cv_generated_at). next_cursor is None on the last page.
+    """
+    if order_by not in PROFILE_ORDERS:
+        raise ValueError(f"order_by must be one of {PROFILE_ORDERS}")
+    if page_size < 1:
+        raise ValueError("page_size must be positive")
 
-    file_name = file_url.split(f"/{bucket_name}/")[-1].split("?")[0]
+    after = None  # (value, key) of the last row already returned
+    if cursor:
+        cursor_order, value, key = decode_cursor(cursor)
+        if cursor_order != order_by:
+            raise ValueError("Cursor was issued for a different order_by")
+        after = (value, key)
 
-    _profile_ref(profile_id).update({
+    # One extra row tells us whether another page exists
+    wanted = page_size + 1
+    items = []
+    lower = after[0] if after else start_at
+    if order_by != "key" and lower is None:
+        # Rows without the value sort first, in key order. A child query can
+        # read that group from its start but can't resume part way into it
+        # (start_at takes a value, not a key); see _rows_without_value. The
+        # query then continues from the first non-null value.
+        items = _rows_without_value(order_by, after[1] if after else None, wanted)
+        after, lower = None, FIRST_NON_NULL
+    if len(items) < wanted:
+        items += _rows_after(order_by, after, lower, end_at, wanted - len(items))
+
+    page = OrderedDict(items[:page_size])
+    next_cursor = None
+    if len(items) > page_size:
+        last_key, last_record = items[page_size - 1]
+        next_cursor = encode_cursor(order_by, _order_value(order_by, last_key, last_record), last_key)
+    return page, next_cursor
+
+def iter_profiles(page_size: int = DEFAULT_PAGE_SIZE, order_by: str = "key", start_at=None, end_at=None):
+    """Yield (profile_id, record) in order, holding one page in memory at a time."""
+    cursor = None
+    while True:
+        page, cursor = get_profiles_page(page_size, order_by, cursor, start_at, end_at)
+        yield from page.items()
+        if cursor is None:
+            return
+
+def list_profile_ids() -> list:
+    """Profile IDs only, via a shallow read (no profile or CV payloads)."""
+    snapshot = db.reference("profiles").get(shallow=True)
+    return sorted(snapshot or {})
+
+def export_profiles(out, page_size: int = 500, order_by: str = "key", start_at=None, end_at=None) -> int:
+    """Write profiles to `out` as JSON lines, page by page. Returns rows written."""
+    count = 0
+    for profile_id, record in iter_profiles(page_size, order_by, start_at, end_at):
+        out.write(json.dumps({"profile_id": profile_id, **record}, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+def _rows_after(order_by, after, lower, end_at, wanted):
+    """Up to `wanted` rows after `after` (value, key), from `lower` on."""
+    # Queries are inclusive at start_at, so the row under the cursor (and, for
+    # child orders, earlier rows sharing its value) come back again and are
+    # skipped here. Ask for more if ties fill the whole window.
+    fetch = wanted + (1 if after else 0)
+    while True:
+        rows = _profile_query(order_by, lower, end_at, fetch)
+        items = [
+            (key, record) for key, record in rows.items()
+            if after is None or not _at_or_before(_order_value(order_by, key, record), key, after)
+        ]
+        if len(items) >= wanted or len(rows) < fetch:
+            return items[:wanted]
+        fetch *= 2
+
+def _rows_without_value(order_by, after_key, wanted):
+    """Up to `wanted` rows with no `order_by` value, in key order, after `after_key`."""
+    if after_key is not None:
+        # Resuming inside the group: scanning on in key order costs about one
+        # page when most rows lack the value, so try that first
+        rows = _scan_without_value(order_by, after_key, wanted, NULL_SCAN_PAGES * wanted)
+        if rows is not None:
+            return rows
+    # The group from its start through the child index (end_at(False) stops
+    # at its end; nothing stores false), skipping rows up to after_key
+    fetch = wanted
+    while True:
+        batch = _profile_query(order_by, None, FIRST_NON_NULL, fetch)
+        rows = [
+            (key, record) for key, record in batch.items()
+            if _order_value(order_by, key, record) is None and (after_key is None or key > after_key)
+        ]
+        if len(rows) >= wanted or len(batch) < fetch:
+            return rows[:wanted]
+        fetch *= 2
+
+def _scan_without_value(order_by, after_key, wanted, budget):
+    """Rows without the value in key order after `after_key`, or None once `budget` rows are read first."""
+    rows, read = [], 0
+    while len(rows) < wanted:
+        if read >= budget:
+            return None
+        batch = _profile_query("key", after_key, None, wanted + 1)
+        read += len(batch)
+        scanned = [(key, record) for key, record in batch.items() if key > after_key]
+        rows += [(key, record) for key, record in scanned if _order_value(order_by, key, record) is None]
+        if len(batch) < wanted + 1 or not scanned:
+            break
+        after_key = scanned[-1][0]
+    return rows[:wanted]
+
+def _profile_query(order_by, lower, end_at, limit):
+    ref = db.reference("profiles")
+    query = ref.order_by_key() if order_by == "key" else ref.order_by_child(order_by)
+    if lower is not None:
+        query = query.start_at(lower)
+    if end_at is not None:
+        query = query.end_at(end_at)
+    return query.limit_to_first(limit).get() or {}
+
+def _order_value(order_by, key, record):
+    if order_by == "key":
+        return key
+    return record.get(order_by) if isinstance(record, dict) else None
+
+def _at_or_before(value, key, after):
+    # Rows with equal values are ordered by key
+    after_value, after_key = after
+    return value == after_value and key <= after_key
+
+# =========================== Supabase Storage ===========================
+# Uploads stream in parts (media_storage.py); nothing reads a whole file into memory
+def _object_name(filename: str) -> str:
+    return f"{uuid.uuid4()}_{os.path.basename(filename or 'upload')}"
+
+def upload_file_supabase(local_path: str, bucket_name: str = DEFAULT_BUCKET) -> str:
+    result = upload_stream(
+        get_media_storage(), local_path, bucket_name, _object_name(local_path), parallel=UPLOAD_PARALLEL_PARTS,
+    )
+    return result["url"]
+
+def upload_fileobj(
+    fileobj,
+    filename: str,
+    bucket_name: str = DEFAULT_BUCKET,
+    content_type: Optional[str] = None,
+    size: Optional[int] = None,
+) -> dict:
+    """Stream a file object (e.g. a request body) to storage. Returns the
+    upload result: name, content_type, size, parts, url."""
+    return upload_stream(
+        get_media_storage(),
+        fileobj,
+        bucket_name,
+        _object_name(filename),
+        content_type=content_type,
+        size=size,
+        parallel=UPLOAD_PARALLEL_PARTS,
+    )
+
+def media_record(result: dict) -> dict:
+    """Profile fields describing an uploaded file, written in one update."""
+    return {
         "media_files": {
-            "file_name": file_name,
-            "file_url": file_url,
+            "file_name": result["name"],
+            "file_url": result["url"],
+            "content_type": result["content_type"],
+            "size": result["size"],
         },
         "last_media_upload": datetime.utcnow().isoformat(),
-    })
+    }
 
-    return file_url
+def upload_file_and_sync(local_path: str, profile_id: str, bucket_name: str = DEFAULT_BUCKET) -> str:
+    result = upload_stream(
+        get_media_storage(), local_path, bucket_name, _object_name(local_path), parallel=UPLOAD_PARALLEL_PARTS,
+    )
+    _profile_ref(profile_id).update(media_record(result))
+    return result["url"]
 
 
 def get_signed_url_supabase(file_name: str, bucket_name: str = DEFAULT_BUCKET, expires_in: int = 3600) -> str:
+    supabase = get_supabase()
+    if supabase is None:
+        raise RuntimeError("Signed URLs need SUPABASE_URL and SUPABASE_KEY")
     response = supabase.storage.from_(bucket_name).create_signed_url(file_name, expires_in)
     if response.get("error"):
         raise RuntimeError(f"Failed to create signed URL: {response['error']}")
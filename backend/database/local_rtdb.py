@@ -0,0 +1,337 @@
+"""
+Local stand-in for the Firebase Realtime Database.
+
+Implements the slice of `firebase_admin.db` the backend uses
+(`reference(path)` with get/set/update/delete, multi-path updates, shallow
+reads, ETag compare-and-set, transactions, and ordered queries with
+start_at/end_at/limit) on an in-process JSON tree, so routes, tests and
+benchmarks run with no network and no service-account file. Select it with
+DATABASE_BACKEND=local. The stores built on top (profile_store.py,
+phone_logins.py) work against firebase_admin.db and this stand-in alike.
+
+  - LOCAL_DB_PATH     optional JSON file to load from and persist to. Worker
+                      processes pointing at the same file share one tree:
+                      writes hold an exclusive lock on `<path>.lock`, and
+                      every call reloads the file if another process has
+                      replaced it since
+  - LOCAL_DB_LATENCY  optional seconds to sleep per call, to mimic a network
+                      round-trip in benchmarks
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process per file
+    fcntl = None
+
+
+def _split(path: str):
+    return [part for part in (path or "").strip("/").split("/") if part]
+
+
+_FORBIDDEN = set(".#$[]")
+
+
+def _check_update(parts, keys):
+    """Refuse what the real server refuses (HTTP 400): bad key characters, overlapping paths."""
+    paths = []
+    for key in keys:
+        key_parts = _split(key)
+        if not key_parts or any(_FORBIDDEN & set(part) for part in key_parts):
+            raise ValueError(f"Invalid key in update: {key!r}")
+        paths.append(tuple(parts + key_parts))
+    paths.sort()
+    for shorter, longer in zip(paths, paths[1:]):
+        if longer[:len(shorter)] == shorter:
+            raise ValueError(f"Path {'/'.join(shorter)} is an ancestor of {'/'.join(longer)} in the same update")
+
+
+def _etag(value) -> str:
+    # Firebase's ETag is an opaque content hash; any stable one behaves the same
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.md5(payload.encode("utf-8")).hexdigest()
+
+
+class LocalDatabase:
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0):
+        self.path = path
+        self.latency = latency
+        self.calls = 0  # round-trips served, for benchmarks
+        self._root = {}
+        self._lock = threading.RLock()
+        self._loaded = None  # (mtime_ns, size) of the file the tree was read from
+        self._lock_file = None
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if fcntl is not None:
+                self._lock_file = open(f"{path}.lock", "a")
+            self._reload()
+
+    def reference(self, path: str = "/") -> "LocalReference":
+        return LocalReference(self, _split(path))
+
+    # ---------------------------------------------------
+    # TREE OPERATIONS (used by LocalReference)
+    # ---------------------------------------------------
+    def _round_trip(self):
+        # Sleep outside the tree lock so concurrent calls overlap like real I/O
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @contextmanager
+    def _reading(self):
+        with self._lock:
+            self._reload()
+            yield
+
+    @contextmanager
+    def _writing(self):
+        """Read-modify-write under the thread lock and, across processes, the file lock."""
+        with self._lock:
+            if self._lock_file is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                self._reload()
+                yield
+                self._persist()
+            finally:
+                if self._lock_file is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _reload(self):
+        """Re-read the file if another process replaced it since we last did."""
+        if not self.path:
+            return
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if (st.st_mtime_ns, st.st_size) == self._loaded:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            self._root = json.load(f) or {}
+        self._loaded = (st.st_mtime_ns, st.st_size)
+
+    def _get(self, parts):
+        node = self._root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _set(self, parts, value):
+        if not parts:
+            self._root = value if isinstance(value, dict) else {}
+            return
+        if value is None:
+            self._delete(parts)
+            return
+        node = self._root
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            node = child
+        node[parts[-1]] = value
+
+    def _delete(self, parts):
+        if not parts:
+            self._root = {}
+            return
+        trail = []
+        node = self._root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return
+            trail.append((node, part))
+            node = node[part]
+
+        parent, key = trail.pop()
+        del parent[key]
+        # Prune branches left empty, like Firebase does
+        for parent, key in reversed(trail):
+            if parent[key]:
+                break
+            del parent[key]
+
+    def _persist(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._root, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        st = os.stat(self.path)
+        self._loaded = (st.st_mtime_ns, st.st_size)
+
+
+class LocalReference:
+    def __init__(self, database: LocalDatabase, parts):
+        self._db = database
+        self._parts = parts
+
+    @property
+    def key(self) -> Optional[str]:
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self) -> str:
+        return "/" + "/".join(self._parts)
+
+    def child(self, path: str) -> "LocalReference":
+        return LocalReference(self._db, self._parts + _split(path))
+
+    def get(self, etag: bool = False, shallow: bool = False):
+        """The value, or (value, etag) with etag=True, like firebase_admin."""
+        self._db._round_trip()
+        with self._db._reading():
+            value = self._db._get(self._parts)
+            if etag:
+                return copy.deepcopy(value), _etag(value)
+            if shallow and isinstance(value, dict):
+                return {k: True for k in value}
+            return copy.deepcopy(value)
+
+    def set(self, value) -> None:
+        self._db._round_trip()
+        with self._db._writing():
+            self._db._set(self._parts, copy.deepcopy(value))
+
+    def update(self, value: dict) -> None:
+        """Multi-path update: keys may be nested paths relative to this reference."""
+        self._db._round_trip()
+        _check_update(self._parts, value)
+        with self._db._writing():
+            for key, child_value in value.items():
+                self._db._set(self._parts + _split(key), copy.deepcopy(child_value))
+
+    def delete(self) -> None:
+        self._db._round_trip()
+        with self._db._writing():
+            self._db._delete(self._parts)
+
+    def set_if_unchanged(self, expected_etag: str, value):
+        """
+        One round-trip compare-and-set: (True, value, new etag) if the stored
+        value still has expected_etag, else (False, current value, its etag).
+        """
+        self._db._round_trip()
+        with self._db._writing():
+            current = self._db._get(self._parts)
+            current_etag = _etag(current)
+            if current_etag != expected_etag:
+                return False, copy.deepcopy(current), current_etag
+            self._db._set(self._parts, copy.deepcopy(value))
+            stored = self._db._get(self._parts)
+            return True, copy.deepcopy(stored), _etag(stored)
+
+    def transaction(self, transaction_update):
+        """Read, apply transaction_update(value), compare-and-set; retried on conflict."""
+        value, etag = self.get(etag=True)
+        for _ in range(25):
+            new_value = transaction_update(copy.deepcopy(value))
+            success, value, etag = self.set_if_unchanged(etag, new_value)
+            if success:
+                return new_value
+        raise RuntimeError("transaction failed after 25 attempts")
+
+    # ---------------------------------------------------
+    # QUERIES
+    # ---------------------------------------------------
+    def order_by_key(self) -> "LocalQuery":
+        return LocalQuery(self, None)
+
+    def order_by_child(self, path: str) -> "LocalQuery":
+        return LocalQuery(self, _split(path))
+
+
+def _order_rank(value):
+    """Firebase ordering: null < false < true < numbers < strings < objects."""
+    if value is None:
+        return (0, 0)
+    if value is False:
+        return (1, 0)
+    if value is True:
+        return (2, 0)
+    if isinstance(value, (int, float)):
+        return (3, value)
+    if isinstance(value, str):
+        return (4, value)
+    return (5, 0)
+
+
+class LocalQuery:
+    def __init__(self, ref: LocalReference, child_parts):
+        self._ref = ref
+        self._child = child_parts  # None means order by key
+        self._start = None
+        self._end = None
+        self._limit_first = None
+        self._limit_last = None
+
+    def start_at(self, value) -> "LocalQuery":
+        self._start = value
+        return self
+
+    def end_at(self, value) -> "LocalQuery":
+        self._end = value
+        return self
+
+    def limit_to_first(self, limit: int) -> "LocalQuery":
+        self._limit_first = limit
+        return self
+
+    def limit_to_last(self, limit: int) -> "LocalQuery":
+        self._limit_last = limit
+        return self
+
+    def _sort_value(self, key, value):
+        if self._child is None:
+            return key
+        node = value
+        for part in self._child:
+            node = node.get(part) if isinstance(node, dict) else None
+        return node
+
+    def get(self) -> "OrderedDict":
+        database = self._ref._db
+        database._round_trip()
+        with database._reading():
+            children = database._get(self._ref._parts)
+            if not isinstance(children, dict):
+                return OrderedDict()
+
+            if self._child is None:
+                ordered = sorted(children.items())
+                rank = lambda key, value: key  # noqa: E731
+            else:
+                ordered = sorted(
+                    children.items(),
+                    key=lambda kv: (_order_rank(self._sort_value(*kv)), kv[0]),
+                )
+                rank = lambda key, value: _order_rank(self._sort_value(key, value))  # noqa: E731
+
+            if self._start is not None:
+                start = self._start if self._child is None else _order_rank(self._start)
+                ordered = [kv for kv in ordered if rank(*kv) >= start]
+            if self._end is not None:
+                end = self._end if self._child is None else _order_rank(self._end)
+                ordered = [kv for kv in ordered if rank(*kv) <= end]
+            if self._limit_first is not None:
+                ordered = ordered[: self._limit_first]
+            if self._limit_last is not None:
+                ordered = ordered[-self._limit_last:] if self._limit_last else []
+
+            return OrderedDict((k, copy.deepcopy(v)) for k, v in ordered)
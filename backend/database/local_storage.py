@@ -0,0 +1,71 @@
+"""
+Local stand-in for Supabase Storage.
+
+Stores objects as files under `<root>/<bucket>/<name>`, with the same
+begin/put_part/finish interface as media_storage.SupabaseResumableStorage.
+Parts are written at their offsets with pwrite, so they may arrive in any
+order and in parallel. Used with DATABASE_BACKEND=local and in benchmarks.
+
+  - LOCAL_STORAGE_DIR      where objects are written (default data/storage)
+  - LOCAL_STORAGE_LATENCY  optional seconds to sleep per part, to mimic a
+                           network round-trip in benchmarks
+"""
+import os
+import threading
+import time
+import uuid
+
+from .media_storage import UploadError
+
+
+class LocalStorage:
+    parallel_parts = True
+
+    def __init__(self, root: str = "data/storage", latency: float = 0.0, upsert: bool = False):
+        self.root = root
+        self.latency = latency
+        self.upsert = upsert
+        self.parts_written = 0  # for benchmarks
+        self._lock = threading.Lock()
+
+    def _object_path(self, bucket, name):
+        path = os.path.realpath(os.path.join(self.root, bucket, name))
+        if not path.startswith(os.path.realpath(self.root) + os.sep):
+            raise UploadError(f"Invalid object name: {name}")
+        return path
+
+    def begin(self, bucket, name, content_type, size):
+        path = self._object_path(bucket, name)
+        if os.path.exists(path) and not self.upsert:
+            raise UploadError(f"Object already exists: {bucket}/{name}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.part"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        return {"fd": fd, "tmp": tmp, "path": path, "content_type": content_type}
+
+    def put_part(self, upload, offset, data, last):
+        if self.latency:
+            time.sleep(self.latency)
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(upload["fd"], view, offset)
+            view, offset = view[written:], offset + written
+        with self._lock:
+            self.parts_written += 1
+
+    def finish(self, upload):
+        os.close(upload["fd"])
+        os.replace(upload["tmp"], upload["path"])
+
+    def abort(self, upload):
+        try:
+            os.close(upload["fd"])
+        except OSError:
+            pass
+        try:
+            os.remove(upload["tmp"])
+        except FileNotFoundError:
+            pass
+
+    def public_url(self, bucket, name):
+        return f"file://{self._object_path(bucket, name)}"
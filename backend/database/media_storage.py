@@ -0,0 +1,273 @@
+"""
+Streaming media uploads (voice notes, video CVs, documents).
+
+A file is sent to storage in fixed-size parts read straight from its source,
+so one upload holds at most `parallel` + 1 parts in memory (the extra one
+is the look-ahead that finds the last part) whatever the file size:
+
+  - local paths are memory-mapped one part-sized window at a time
+  - file objects and request streams are read part by part
+
+Storage backends implement begin/put_part/finish/public_url:
+
+  SupabaseResumableStorage – Supabase's TUS resumable-upload endpoint. TUS
+                             appends at the current offset, so parts go one
+                             at a time (parallel_parts = False).
+  LocalStorage             – a directory on disk (local_storage.py). Parts are
+                             written at their offsets, so they go in parallel.
+
+Content types are guessed from the file name, then from the first bytes.
+"""
+import base64
+import mimetypes
+import mmap
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# Supabase resumable uploads require every part except the last to be 6 MB
+DEFAULT_PART_SIZE = 6 * 1024 * 1024
+DEFAULT_PARALLEL_PARTS = 4
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+# (prefix offset, prefix bytes, content type) for formats browsers and phones send
+_SIGNATURES = [
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF8", "image/gif"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"\x1aE\xdf\xa3", "video/webm"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"\xff\xfb", "audio/mpeg"),
+    (0, b"#!AMR", "audio/amr"),
+    (0, b"PK\x03\x04", "application/zip"),
+]
+
+
+class UploadError(RuntimeError):
+    pass
+
+
+def detect_content_type(filename: str, head: bytes = b"") -> str:
+    guessed, _ = mimetypes.guess_type(filename or "")
+    if guessed:
+        return guessed
+
+    for offset, prefix, content_type in _SIGNATURES:
+        if head[offset:offset + len(prefix)] == prefix:
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        # ISO media: M4A voice notes vs MP4/3GP video
+        return "audio/mp4" if head[8:11] == b"M4A" else "video/mp4"
+    return DEFAULT_CONTENT_TYPE
+
+
+# ---------------------------------------------------
+# PART SOURCES
+# ---------------------------------------------------
+def _file_parts(path, size, part_size):
+    """Yield (offset, bytes) by mapping one part-sized window at a time.
+
+    Each window is unmapped before the next is mapped, so resident memory
+    stays at one part per reader instead of growing with the file.
+    """
+    if part_size % mmap.ALLOCATIONGRANULARITY:
+        raise ValueError("part_size must be a multiple of mmap.ALLOCATIONGRANULARITY")
+    with open(path, "rb") as f:
+        for offset in range(0, size, part_size):
+            length = min(part_size, size - offset)
+            with mmap.mmap(f.fileno(), length, offset=offset, access=mmap.ACCESS_READ) as window:
+                yield offset, window[:]
+
+
+def _stream_parts(fileobj, part_size):
+    offset = 0
+    while True:
+        data = _read_exactly(fileobj, part_size)
+        if not data:
+            return
+        yield offset, data
+        offset += len(data)
+
+
+def _read_exactly(fileobj, count):
+    # Request streams may return short reads; parts must be full-sized
+    chunks, remaining = [], count
+    while remaining:
+        chunk = fileobj.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+
+def _with_last_flag(parts):
+    """(offset, data) -> (offset, data, is_last) using a one-part look-ahead."""
+    previous = None
+    for part in parts:
+        if previous is not None:
+            yield (*previous, False)
+        previous = part
+    if previous is not None:
+        yield (*previous, True)
+
+
+# ---------------------------------------------------
+# UPLOAD
+# ---------------------------------------------------
+def upload_stream(
+    storage,
+    source,
+    bucket: str,
+    name: str,
+    content_type: Optional[str] = None,
+    size: Optional[int] = None,
+    part_size: int = DEFAULT_PART_SIZE,
+    parallel: int = DEFAULT_PARALLEL_PARTS,
+) -> dict:
+    """Upload a local path or a readable file object in parts.
+
+    `size` is optional for file objects (request streams); storage is told
+    the length once the last part is known. Returns name, content_type,
+    size, parts and url.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        size = os.path.getsize(source)
+        parts = _file_parts(source, size, part_size)
+    else:
+        parts = _stream_parts(source, part_size)
+
+    parts = _with_last_flag(parts)
+    first = next(parts, None)
+    if content_type is None:
+        content_type = detect_content_type(name, first[1][:64] if first else b"")
+
+    upload = storage.begin(bucket, name, content_type, size)
+    workers = max(1, parallel) if storage.parallel_parts else 1
+    total, count = 0, 0
+    try:
+        if first is None:
+            storage.put_part(upload, 0, b"", True)
+        elif workers == 1:
+            for offset, data, last in _chain(first, parts):
+                storage.put_part(upload, offset, data, last)
+                total, count = offset + len(data), count + 1
+        else:
+            total, count = _put_parallel(storage, upload, _chain(first, parts), workers)
+        storage.finish(upload)
+    except Exception as e:
+        storage.abort(upload)
+        if isinstance(e, UploadError):
+            raise
+        raise UploadError(f"Upload of {bucket}/{name} failed: {e}") from e
+
+    return {
+        "name": name,
+        "content_type": content_type,
+        "size": total,
+        "parts": count,
+        "url": storage.public_url(bucket, name),
+    }
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def _put_parallel(storage, upload, parts, workers):
+    # The semaphore stops the reader from running ahead of the uploads, which
+    # is what bounds memory to `workers` parts plus the look-ahead
+    slots = threading.Semaphore(workers)
+    futures, total, count = [], 0, 0
+
+    def put(offset, data, last):
+        try:
+            storage.put_part(upload, offset, data, last)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-part") as pool:
+        while True:
+            slots.acquire()  # before reading, so a part is only read once it can be sent
+            part = next(parts, None)
+            if part is None:
+                break
+            offset, data, last = part
+            futures.append(pool.submit(put, offset, data, last))
+            total, count = offset + len(data), count + 1
+
+            running = []
+            for future in futures:
+                if future.done():
+                    future.result()  # surface a failed part before reading more
+                else:
+                    running.append(future)
+            futures = running
+    for future in futures:
+        future.result()
+    return total, count
+
+
+# ---------------------------------------------------
+# SUPABASE (TUS resumable uploads)
+# ---------------------------------------------------
+class SupabaseResumableStorage:
+    parallel_parts = False
+
+    def __init__(self, url: str, key: str, timeout: float = 60.0, upsert: bool = False):
+        self.url = url.rstrip("/")
+        self.upsert = upsert
+        import httpx
+
+        self._http = httpx.Client(
+            timeout=timeout,
+            headers={"authorization": f"Bearer {key}", "apikey": key, "tus-resumable": "1.0.0"},
+        )
+
+    def begin(self, bucket, name, content_type, size):
+        metadata = {"bucketName": bucket, "objectName": name, "contentType": content_type}
+        headers = {
+            "upload-metadata": ",".join(
+                f"{k} {base64.b64encode(v.encode('utf-8')).decode('ascii')}" for k, v in metadata.items()
+            ),
+            "x-upsert": "true" if self.upsert else "false",
+        }
+        if size is None:
+            headers["upload-defer-length"] = "1"
+        else:
+            headers["upload-length"] = str(size)
+
+        res = self._http.post(f"{self.url}/storage/v1/upload/resumable", headers=headers)
+        if res.status_code != 201:
+            raise UploadError(f"Supabase upload failed: {res.status_code} {res.text}")
+        return {"location": res.headers["location"], "length_known": size is not None}
+
+    def put_part(self, upload, offset, data, last):
+        headers = {"upload-offset": str(offset), "content-type": "application/offset+octet-stream"}
+        if last and not upload["length_known"]:
+            headers["upload-length"] = str(offset + len(data))
+        res = self._http.patch(upload["location"], content=data, headers=headers)
+        if res.status_code != 204:
+            raise UploadError(f"Supabase upload failed at offset {offset}: {res.status_code} {res.text}")
+
+    def finish(self, upload):
+        pass  # TUS completes when the last byte arrives
+
+    def abort(self, upload):
+        import httpx
+
+        try:
+            self._http.delete(upload["location"])
+        except httpx.HTTPError:
+            pass
+
+    def public_url(self, bucket, name):
+        return f"{self.url}/storage/v1/object/public/{bucket}/{name}"
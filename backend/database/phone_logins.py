@@ -0,0 +1,196 @@
+"""
+Phone login state: pending codes and phone -> profile_id, one node per phone.
+
+Each phone has one record at `phone_numbers/<phone>`. It holds the
+profile_id, name and timestamps, and the pending `login_code`. Keeping the
+code in the same record (rather than a separate `login_codes/<phone>` node)
+lets a login check and consume the code and update the phone record in one
+write.
+
+Every write here is an ETag compare-and-set on that one record
+(`set_if_unchanged`):
+
+  store_code()  – writes the new code and remembers the record and its ETag.
+  record_delivery()
+                – stores the SMS delivery status under `sms` on the record.
+  verify()      – checks the code, removes it, and creates or updates the
+                  phone record, all in one conditional write. When the
+                  record's ETag is cached (from store_code or an earlier
+                  login), that is the only round-trip. If another worker
+                  changed the record meanwhile, the write is refused and
+                  the reply carries the current record, so the check is
+                  redone on fresh data. A code can therefore be used only
+                  once, however many verifications race for it.
+
+The cache is short-lived and bounded. It is only a starting guess for the
+compare-and-set, so a stale entry costs one extra round-trip and never a
+wrong answer.
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+
+class InvalidCode(ValueError):
+    """No pending code for the phone, a different code, or an expired one."""
+
+
+class PhoneLogins:
+    def __init__(self, db, cache_ttl: float = 600.0, cache_size: int = 10000, max_attempts: int = 25):
+        self._db = db
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.max_attempts = max_attempts
+
+        self._cache = OrderedDict()  # {phone: (etag, record, cached_at)}
+        self._lock = threading.Lock()
+        self._counters = {
+            "codes_stored": 0, "logins": 0, "new_users": 0, "rejected": 0,
+            "cache_hits": 0, "cache_misses": 0, "conflicts": 0,
+        }
+
+    def store_code(self, phone: str, code: str, expires_at: float, delivery: Optional[dict] = None) -> None:
+        """delivery: the SMS status to store alongside, e.g. {"status": "queued"}."""
+        def put_code(record):
+            record = record or {}
+            record["login_code"] = {"code": code, "expires_at": expires_at}
+            if delivery is not None:
+                record["sms"] = delivery
+            return record
+
+        self._mutate(phone, put_code)
+        self._count("codes_stored")
+
+    def verify(self, phone: str, code: str, now: Optional[float] = None) -> tuple:
+        """
+        (record, new_user) once the code is consumed. Raises InvalidCode, and
+        then nothing is written.
+        """
+        now_ts = now if now is not None else datetime.now(timezone.utc).timestamp()
+        outcome = {"new_user": False}
+
+        def consume_code(record):
+            pending = (record or {}).get("login_code") or {}
+            if pending.get("code") != code or now_ts > float(pending.get("expires_at", 0)):
+                raise InvalidCode(phone)
+            record.pop("login_code", None)
+            stamp = datetime.now(timezone.utc).isoformat()
+            # Re-run on conflict, so decided afresh each time
+            outcome["new_user"] = not record.get("profile_id")
+            if outcome["new_user"]:
+                # First login: the record so far only held the code
+                record.update({
+                    "profile_id": str(uuid.uuid4()),
+                    "name": record.get("name"),
+                    "email": record.get("email"),
+                    "created_at": stamp,
+                })
+            record["last_login"] = stamp
+            return record
+
+        try:
+            record = self._mutate(phone, consume_code)
+        except InvalidCode:
+            self._count("rejected")
+            raise
+        self._count("logins")
+        if outcome["new_user"]:
+            self._count("new_users")
+        return record, outcome["new_user"]
+
+    def record_delivery(self, phone: str, delivery: dict) -> None:
+        """Store an SMS status update on the phone record (SmsQueue's on_status)."""
+        def put_delivery(record):
+            record = record or {}
+            record["sms"] = delivery
+            return record
+
+        # Same compare-and-set path, so the cached ETag stays current and the
+        # next verify is still one round-trip
+        self._mutate(phone, put_delivery)
+
+    def profile_id(self, phone: str) -> Optional[str]:
+        """The cached profile_id for a phone, without a round-trip, if known."""
+        cached = self._cached(phone, count=False)
+        return (cached[1] or {}).get("profile_id") if cached else None
+
+    def issued(self, profile_id: str) -> bool:
+        """Whether a login handed out this profile_id (indexed query on phone_numbers)."""
+        query = self._db.reference("phone_numbers").order_by_child("profile_id")
+        return bool(query.start_at(profile_id).end_at(profile_id).limit_to_first(1).get())
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._counters)
+            result["cached_phones"] = len(self._cache)
+        return result
+
+    # ---------------------------------------------------
+    # COMPARE-AND-SET
+    # ---------------------------------------------------
+    def _mutate(self, phone, update):
+        """
+        Apply update(record) -> new record with a compare-and-set, retried on
+        conflict. If update raises ValueError on a record that came from the cache, the
+        record is re-read first, because the cached copy may be stale. The
+        error is only raised once the record is known to be current.
+        """
+        ref = self._db.reference(f"phone_numbers/{phone}")
+        cached = self._cached(phone)
+        if cached is not None:
+            etag, record, fresh = cached[0], cached[1], False
+        else:
+            record, etag = ref.get(etag=True)
+            fresh = True
+
+        for _ in range(self.max_attempts):
+            try:
+                new_record = update(copy.deepcopy(record))
+            except ValueError:
+                if fresh:
+                    self._remember(phone, etag, record)
+                    raise
+                record, etag = ref.get(etag=True)
+                fresh = True
+                continue
+            success, record, etag = ref.set_if_unchanged(etag, new_record)
+            if success:
+                self._remember(phone, etag, new_record)
+                return new_record
+            # Refused: the reply carries the current record and its ETag
+            self._count("conflicts")
+            fresh = True
+        self._forget(phone)
+        raise RuntimeError(f"phone_numbers/{phone}: too many conflicting writes")
+
+    def _cached(self, phone, count=True):
+        with self._lock:
+            entry = self._cache.get(phone)
+            if entry is not None and time.monotonic() - entry[2] > self.cache_ttl:
+                del self._cache[phone]
+                entry = None
+            if count:
+                self._counters["cache_hits" if entry is not None else "cache_misses"] += 1
+            if entry is None:
+                return None
+            self._cache.move_to_end(phone)
+            return entry[0], copy.deepcopy(entry[1])
+
+    def _remember(self, phone, etag, record):
+        with self._lock:
+            self._cache[phone] = (etag, copy.deepcopy(record), time.monotonic())
+            self._cache.move_to_end(phone)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, phone):
+        with self._lock:
+            self._cache.pop(phone, None)
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
@@ -0,0 +1,232 @@
+"""
+Profile storage used by the routes: read-through cache + write-behind queue.
+
+Reads hit an in-process LRU first and fall back to one `profiles/<id>` get.
+Writes update the cache immediately and are queued as field paths
+(`profiles/<id>/profile`, `profiles/<id>/cv`, ...). A background thread
+flushes the queue as ONE multi-path `update()` at the database root, either
+every `flush_interval` seconds or as soon as `max_batch` paths are waiting.
+Profile, CV and metadata written close together therefore cost one
+round-trip, and repeated writes to the same field collapse into the last one.
+
+With several worker processes, the cache and queue are per process, so two
+options keep workers consistent:
+
+  cache_ttl   – cached records are re-read after this many seconds, so a
+                CV or profile another worker wrote shows up here too
+  sync_new    – save_profile() flushes before returning, so a profile_id
+                handed to the client can be read by any worker straight away
+
+Because one update carries every profile's writes, a path the database
+refuses (Firebase rejects the whole update with a 400) must not hold up the
+rest. profile_ids are checked against PROFILE_ID before anything is queued,
+and if an update is refused anyway, flush() writes each profile's paths on
+their own and drops the ones that are still refused.
+"""
+import atexit
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
+
+
+PROFILE_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def valid_profile_id(profile_id) -> bool:
+    """uuid4 strings pass; anything that could be a path (".", "#", "$", "[", "]", "/") does not."""
+    return isinstance(profile_id, str) and PROFILE_ID.match(profile_id) is not None
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ProfileStore:
+    def __init__(
+        self,
+        db,
+        cache_size: int = 5000,
+        flush_interval: float = 0.5,
+        max_batch: int = 500,
+        cache_ttl: Optional[float] = None,
+        sync_new: bool = False,
+    ):
+        self._db = db
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.cache_ttl = cache_ttl
+        self.sync_new = sync_new
+
+        self._cache = OrderedDict()  # {profile_id: record dict}
+        self._cached_at = {}  # {profile_id: monotonic time read or created}, for cache_ttl
+        self._pending = {}  # {"profiles/<id>/<field>": value}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._counters = {"cache_hits": 0, "cache_misses": 0, "queued_writes": 0, "flushes": 0, "flushed_paths": 0,
+                          "dropped_paths": 0}
+
+        self._thread = threading.Thread(target=self._run, name="profile-store-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------------------------------------------------
+    # READS
+    # ---------------------------------------------------
+    def get(self, profile_id: str) -> Optional[dict]:
+        if not valid_profile_id(profile_id):
+            return None
+        with self._lock:
+            record = self._cache.get(profile_id)
+            if record is not None and self._expired(profile_id):
+                del self._cache[profile_id]
+                record = None
+            if record is not None:
+                self._cache.move_to_end(profile_id)
+                self._counters["cache_hits"] += 1
+                return dict(record)
+            self._counters["cache_misses"] += 1
+            unflushed = any(path.startswith(f"profiles/{profile_id}/") for path in self._pending)
+
+        # A record evicted from the cache with writes still queued must not be
+        # read back stale from the database
+        if unflushed:
+            self.flush()
+
+        record = self._db.reference(f"profiles/{profile_id}").get()
+        if record is not None:
+            with self._lock:
+                self._remember(profile_id, record)
+        return record
+
+    # ---------------------------------------------------
+    # WRITES (queued)
+    # ---------------------------------------------------
+    def save_profile(self, profile_id: str, profile: dict, **metadata) -> None:
+        self._write(profile_id, {"profile": profile, "created_at": _now_iso(), **metadata})
+        if self.sync_new:
+            self.flush()
+
+    def update_cv(self, profile_id: str, cv_text: str) -> None:
+        self._write(profile_id, {"cv": cv_text, "cv_generated_at": _now_iso()})
+
+    def update_fields(self, profile_id: str, **fields) -> None:
+        self._write(profile_id, fields)
+
+    def _write(self, profile_id, fields):
+        if not valid_profile_id(profile_id):
+            raise ValueError(f"Invalid profile_id: {profile_id!r}")
+        with self._lock:
+            record = self._cache.get(profile_id)
+            if record is not None:
+                record.update(fields)
+                self._cache.move_to_end(profile_id)
+            elif "profile" in fields:
+                self._remember(profile_id, dict(fields))
+
+            for field, value in fields.items():
+                self._pending[f"profiles/{profile_id}/{field}"] = value
+            self._counters["queued_writes"] += len(fields)
+            backlog = len(self._pending)
+
+        if backlog >= self.max_batch:
+            self._wake.set()
+
+    # ---------------------------------------------------
+    # FLUSHING
+    # ---------------------------------------------------
+    def flush(self) -> int:
+        """Write everything queued in one multi-path update. Returns paths written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+            try:
+                self._db.reference("/").update(batch)
+                written = len(batch)
+            except Exception:
+                written = self._flush_each(batch)
+            with self._lock:
+                self._counters["flushes"] += 1
+                self._counters["flushed_paths"] += written
+            return written
+
+    def _flush_each(self, batch):
+        """
+        The combined update was refused: write each profile's paths on their
+        own. A profile refused with ValueError (a bad path), or while others
+        went through (so the database is reachable), is dropped. If none went
+        through, the database is probably down: re-queue everything and raise.
+        """
+        groups = {}
+        for path, value in batch.items():
+            groups.setdefault(path.split("/", 2)[1], {})[path] = value
+
+        written, refused, error = 0, [], None
+        for group in groups.values():
+            try:
+                self._db.reference("/").update(group)
+                written += len(group)
+            except ValueError:
+                self._drop(group)
+            except Exception as e:
+                refused.append(group)
+                error = e
+
+        if refused and not written:
+            # Put the rest back (newer queued values win) and let the next flush retry
+            with self._lock:
+                for group in refused:
+                    self._pending = {**group, **self._pending}
+            raise error
+        for group in refused:
+            self._drop(group)
+        return written
+
+    def _drop(self, group):
+        with self._lock:
+            self._counters["dropped_paths"] += len(group)
+
+    def close(self) -> None:
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._counters)
+            result["cached_profiles"] = len(self._cache)
+            result["pending_paths"] = len(self._pending)
+        return result
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                time.sleep(self.flush_interval)  # back off; the batch was re-queued
+
+    def _remember(self, profile_id, record):
+        self._cache[profile_id] = record
+        self._cache.move_to_end(profile_id)
+        if self.cache_ttl is not None:
+            self._cached_at[profile_id] = time.monotonic()
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            self._cached_at.pop(evicted, None)
+
+    def _expired(self, profile_id):
+        if self.cache_ttl is None:
+            return False
+        return time.monotonic() - self._cached_at.get(profile_id, 0.0) > self.cache_ttl
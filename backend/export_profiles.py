@@ -0,0 +1,42 @@
+"""
+Stream every profile out of the database as JSON lines.
+
+Reads the "profiles" tree one page at a time, so memory stays flat however
+many profiles there are.
+
+    python export_profiles.py --out profiles.jsonl
+    python export_profiles.py --order-by created_at --since 2025-11-01 > november.jsonl
+    python export_profiles.py --ids-only
+"""
+import argparse
+import sys
+
+from database.database import PROFILE_ORDERS, export_profiles, list_profile_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export SpaniSami profiles as JSON lines.")
+    parser.add_argument("--out", help="write here instead of stdout")
+    parser.add_argument("--order-by", choices=PROFILE_ORDERS, default="key")
+    parser.add_argument("--since", help="first value to include (key or ISO timestamp)")
+    parser.add_argument("--until", help="last value to include (key or ISO timestamp)")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--ids-only", action="store_true", help="list profile IDs with a shallow read")
+    args = parser.parse_args()
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        if args.ids_only:
+            ids = list_profile_ids()
+            out.writelines(f"{profile_id}\n" for profile_id in ids)
+            count = len(ids)
+        else:
+            count = export_profiles(out, args.page_size, args.order_by, args.since, args.until)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"exported {count} profiles", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Geospatial lookups for the Job Scanner: where is the user, and which jobs are
+near them.
+
+  Gazetteer – South African towns and townships from a local CSV
+              (seed_data/za_places.csv): name, alternative names, province,
+              and approximate centre. It turns a profile's free-text location
+              ("Umlazi, Durban") into coordinates without a geocoding API.
+
+  GeoIndex  – job coordinates bucketed into a fixed grid of tiles
+              (TILE_DEG degrees square, about 25 km). A radius query scans
+              only the tiles its bounding box touches. A k-nearest query
+              searches outward ring by ring and stops once no closer job can
+              exist. Distances are a vectorised haversine over the candidates.
+
+Each non-empty tile's job list is serialised once and cached with an ETag, so
+the phone can fetch and keep the tiles around it rather than the full job
+list. Changing a job drops only the cache entry for its tile.
+"""
+import csv
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+from job_index import read_jobs
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.2
+TILE_DEG = 0.25
+TILE_FIELDS = ("id", "title", "company", "city", "lat", "lng", "description", "requirements")
+
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+def _normalise(text: str) -> str:
+    return " ".join(_WORDS.findall(text.lower()))
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Distance from one point to arrays of points."""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def tile_for(lat: float, lng: float) -> tuple:
+    return math.floor(lat / TILE_DEG), math.floor(lng / TILE_DEG)
+
+
+def tile_id(tile: tuple) -> str:
+    return f"{tile[0]}_{tile[1]}"
+
+
+def parse_tile_id(value: str) -> tuple:
+    row, col = value.split("_")
+    return int(row), int(col)
+
+
+# ---------------------------------------------------
+# GAZETTEER
+# ---------------------------------------------------
+@dataclass(frozen=True, slots=True)
+class Place:
+    name: str
+    province: str
+    lat: float
+    lng: float
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "province": self.province, "lat": self.lat, "lng": self.lng}
+
+
+class Gazetteer:
+    def __init__(self, path: str):
+        self._places = {}  # {normalised name or alias: Place}
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                place = Place(row["name"], row["province"], float(row["lat"]), float(row["lng"]))
+                for name in [row["name"], *filter(None, (row.get("alt_names") or "").split("|"))]:
+                    self._places.setdefault(_normalise(name), place)
+        self._longest_name = max((len(name.split()) for name in self._places), default=1)
+
+    def __len__(self):
+        return len(self._places)
+
+    def lookup(self, location: Optional[str]) -> Optional[Place]:
+        """Best place for free text like "Umlazi, Durban" or "I stay in Soweto".
+
+        Comma-separated parts are tried most specific (first) to least; within
+        a part, the longest run of words that names a place wins.
+        """
+        if not location:
+            return None
+        for part in location.split(","):
+            words = _normalise(part).split()
+            for size in range(min(self._longest_name, len(words)), 0, -1):
+                for start in range(len(words) - size + 1):
+                    place = self._places.get(" ".join(words[start:start + size]))
+                    if place is not None:
+                        return place
+        return None
+
+
+# ---------------------------------------------------
+# JOB GRID
+# ---------------------------------------------------
+class GeoIndex:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_signature = None
+        self._jobs = {}  # {job id: (row, summary)}
+        self._tiles = {}  # {(tile row, tile col): set of rows}
+        self._lats = np.empty(0, dtype=np.float64)
+        self._lngs = np.empty(0, dtype=np.float64)
+        self._row_ids = []
+        self._tile_rows = {}  # {tile: numpy array of its rows}, rebuilt on change
+        self._tile_cache = {}  # {tile: (etag, json bytes)}
+        if path and os.path.isfile(path):
+            self.refresh_if_changed()
+
+    # ---------------------------------------------------
+    # BUILD / UPDATE
+    # ---------------------------------------------------
+    def build(self, jobs: Iterable[dict]) -> int:
+        with self._lock:
+            summaries = {}
+            for job in jobs:
+                summary = _summary(job)
+                if summary is not None:
+                    summaries[summary["id"]] = summary
+            self._row_ids = list(summaries)
+            self._lats = np.array([s["lat"] for s in summaries.values()], dtype=np.float64)
+            self._lngs = np.array([s["lng"] for s in summaries.values()], dtype=np.float64)
+            self._jobs, self._tiles, self._tile_rows, self._tile_cache = {}, {}, {}, {}
+            for row, (job_id, summary) in enumerate(summaries.items()):
+                self._jobs[job_id] = (row, summary)
+                self._tiles.setdefault(tile_for(summary["lat"], summary["lng"]), set()).add(row)
+            return len(self._jobs)
+
+    def upsert(self, job: dict) -> bool:
+        summary = _summary(job)
+        if summary is None:
+            return self.remove(str(job.get("id")))
+        with self._lock:
+            current = self._jobs.get(summary["id"])
+            if current is not None and current[1] == summary:
+                return False
+            if current is not None:
+                self._drop(summary["id"])
+            row = len(self._row_ids)
+            self._row_ids.append(summary["id"])
+            self._lats = np.append(self._lats, summary["lat"])
+            self._lngs = np.append(self._lngs, summary["lng"])
+            self._jobs[summary["id"]] = (row, summary)
+            tile = tile_for(summary["lat"], summary["lng"])
+            self._tiles.setdefault(tile, set()).add(row)
+            self._tile_rows.pop(tile, None)
+            self._tile_cache.pop(tile, None)
+            return True
+
+    def remove(self, job_id: str) -> bool:
+        with self._lock:
+            if job_id not in self._jobs:
+                return False
+            self._drop(job_id)
+            return True
+
+    def sync(self, jobs: Iterable[dict]) -> dict:
+        counts = {"changed": 0, "removed": 0}
+        seen = set()
+        with self._lock:
+            for job in jobs:
+                seen.add(str(job.get("id")))
+                counts["changed"] += self.upsert(job)
+            for job_id in [j for j in self._jobs if j not in seen]:
+                self.remove(job_id)
+                counts["removed"] += 1
+            # Rows of replaced/removed jobs stay in the coordinate arrays;
+            # rebuild once they outnumber the live ones
+            if len(self._row_ids) > 2 * max(len(self._jobs), 1000):
+                self.build([summary for _, summary in self._jobs.values()])
+        return counts
+
+    def refresh_if_changed(self) -> Optional[dict]:
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature == self._file_signature:
+                return None
+            first_load = self._file_signature is None and not self._jobs
+            self._file_signature = signature
+            if first_load:
+                return {"changed": self.build(read_jobs(self.path)), "removed": 0}
+            return self.sync(read_jobs(self.path))
+
+    def _drop(self, job_id):
+        row, summary = self._jobs.pop(job_id)
+        tile = tile_for(summary["lat"], summary["lng"])
+        rows = self._tiles.get(tile)
+        if rows is not None:
+            rows.discard(row)
+            if not rows:
+                del self._tiles[tile]
+        self._tile_rows.pop(tile, None)
+        self._tile_cache.pop(tile, None)
+
+    # ---------------------------------------------------
+    # QUERIES
+    # ---------------------------------------------------
+    def within(self, lat: float, lng: float, radius_km: float, limit: Optional[int] = None) -> list:
+        """Jobs within radius_km, nearest first, as (summary, distance_km)."""
+        with self._lock:
+            rows = self._rows_in_tiles(self.tiles_covering(lat, lng, radius_km))
+            return self._nearest(lat, lng, rows, limit, max_km=radius_km)
+
+    def nearest(self, lat: float, lng: float, k: int, max_km: Optional[float] = None) -> list:
+        """The k nearest jobs, searching outward tile ring by tile ring."""
+        with self._lock:
+            if not self._jobs:
+                return []
+            center = tile_for(lat, lng)
+            ring_km = TILE_DEG * KM_PER_DEG_LAT * math.cos(math.radians(min(abs(lat) + TILE_DEG, 89.0)))
+            max_ring = self._max_ring(center)
+            rows = np.empty(0, dtype=np.int64)
+            for ring in range(max_ring + 1):
+                rows = np.concatenate([rows, self._rows_in_tiles(self._ring(center, ring))])
+                if len(rows) < k:
+                    continue
+                # Anything outside this ring is at least `ring` tile widths away
+                found = self._nearest(lat, lng, rows, k, max_km)
+                if len(found) == k and found[-1][1] <= ring * ring_km:
+                    return found
+                if max_km is not None and ring * ring_km > max_km:
+                    return found
+            return self._nearest(lat, lng, rows, k, max_km)
+
+    def tiles_covering(self, lat: float, lng: float, radius_km: float) -> list:
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlng = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+        low, high = tile_for(lat - dlat, lng - dlng), tile_for(lat + dlat, lng + dlng)
+        return [(r, c) for r in range(low[0], high[0] + 1) for c in range(low[1], high[1] + 1)]
+
+    def tile(self, tile: tuple) -> tuple:
+        """(etag, JSON bytes) for one tile's jobs, serialised once per change."""
+        with self._lock:
+            cached = self._tile_cache.get(tile)
+            if cached is None:
+                jobs = sorted(
+                    (self._jobs[self._row_ids[row]][1] for row in self._tiles.get(tile, ())),
+                    key=lambda summary: summary["id"],
+                )
+                body = json.dumps({"tile": tile_id(tile), "jobs": jobs}, ensure_ascii=False).encode("utf-8")
+                cached = (hashlib.sha1(body).hexdigest(), body)
+                if jobs:  # empty tiles are cheap, and any id can be asked for
+                    self._tile_cache[tile] = cached
+            return cached
+
+    def warm_tiles(self) -> int:
+        """Serialise every non-empty tile now instead of on first request."""
+        with self._lock:
+            for tile in list(self._tiles):
+                self.tile(tile)
+            return len(self._tiles)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs": len(self._jobs),
+                "tiles": len(self._tiles),
+                "cached_tiles": len(self._tile_cache),
+                "rows": len(self._row_ids),
+            }
+
+    def _rows_in_tiles(self, tiles):
+        arrays = []
+        for tile in tiles:
+            rows = self._tile_rows.get(tile)
+            if rows is None:
+                members = self._tiles.get(tile)
+                if not members:
+                    continue
+                rows = self._tile_rows[tile] = np.fromiter(members, dtype=np.int64, count=len(members))
+            arrays.append(rows)
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    def _nearest(self, lat, lng, rows, limit, max_km):
+        if not len(rows):
+            return []
+        distances = haversine_km(lat, lng, self._lats[rows], self._lngs[rows])
+        if max_km is not None:
+            keep = distances <= max_km
+            rows, distances = rows[keep], distances[keep]
+        if limit is not None and limit < len(rows):
+            top = np.argpartition(distances, limit)[:limit]
+            rows, distances = rows[top], distances[top]
+        order = np.argsort(distances, kind="stable")
+        return [
+            (self._jobs[self._row_ids[row]][1], float(distance))
+            for row, distance in zip(rows[order], distances[order])
+        ]
+
+    def _ring(self, center, ring):
+        if ring == 0:
+            return [center]
+        r0, c0 = center
+        tiles = [(r0 - ring, c) for c in range(c0 - ring, c0 + ring + 1)]
+        tiles += [(r0 + ring, c) for c in range(c0 - ring, c0 + ring + 1)]
+        tiles += [(r, c0 - ring) for r in range(r0 - ring + 1, r0 + ring)]
+        tiles += [(r, c0 + ring) for r in range(r0 - ring + 1, r0 + ring)]
+        return tiles
+
+    def _max_ring(self, center):
+        return max(max(abs(r - center[0]), abs(c - center[1])) for r, c in self._tiles)
+
+
+def _summary(job):
+    """The fields the Job Scanner shows, or None for a job without coordinates."""
+    try:
+        lat, lng = float(job["lat"]), float(job["lng"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    summary = {field: job.get(field) for field in TILE_FIELDS}
+    summary.update(id=str(job["id"]), lat=lat, lng=lng)
+    return summary
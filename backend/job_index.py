@@ -0,0 +1,405 @@
+"""
+Offline job matching: an inverted index over job postings, scored with NumPy.
+
+Postings are read from a JSONL file (seed_data/jobs.jsonl, or JOBS_PATH),
+one job per line: id, title, company, city, lat, lng, description,
+requirements, and optionally skills and languages.
+
+Each term maps to NumPy arrays of (row, weighted term frequency). A query
+built from a profile's skills, past roles, languages and education touches
+only the postings of its own terms. Scoring is BM25, a TF-IDF variant with
+document length normalisation. Each posting stores its precomputed
+length-normalised tf ("impact"), so a query is one scaled scatter-add per
+term into a score vector, and the top k come from argpartition. Jobs in the
+profile's town get a boost.
+
+Updates are incremental. An upserted job gets a new row and its old row is
+tombstoned; rows are compacted once a quarter of them are dead. IDF is read
+at query time. Impacts are recomputed only when the average job length has
+drifted by more than 5%. refresh_if_changed() re-syncs from the file when its mtime
+changes, touching only the jobs whose content changed.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Iterable, Optional
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and any are as at be by can for from have in into is it its of on or our the to we will "
+    "with you your able basic good".split()
+)
+
+# Each occurrence of a term counts this many times towards its frequency
+JOB_FIELD_WEIGHTS = {"title": 3, "skills": 2, "requirements": 2, "languages": 1, "description": 1}
+PROFILE_FIELD_WEIGHTS = {"skills": 3.0, "roles": 2.0, "languages": 1.0, "experience": 1.0, "education": 0.5, "summary": 0.5}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Per-posting BM25 impacts assume an average job length; recompute them once
+# updates move the real average by more than this fraction
+IMPACT_DRIFT = 0.05
+LOCATION_BOOST = 0.5  # score × 1.5 for jobs in the profile's town
+COMPACT_DEAD_FRACTION = 0.25
+
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if len(token) < 2 or token in _STOPWORDS:
+            continue
+        # Light plural folding: "customers" ~ "customer", but not "glass"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _field_text(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value if v)
+    return str(value or "")
+
+
+def job_terms(job: dict) -> Counter:
+    terms = Counter()
+    for field_name, weight in JOB_FIELD_WEIGHTS.items():
+        for token in tokenize(_field_text(job.get(field_name))):
+            terms[token] += weight
+    return terms
+
+
+def profile_terms(profile) -> Counter:
+    """Weighted query terms from a profile_schema.Profile."""
+    fields = {
+        "skills": profile.skills,
+        "roles": [e.role for e in profile.experience],
+        "experience": [e.description for e in profile.experience],
+        "languages": profile.languages,
+        "education": profile.education,
+        "summary": profile.summary,
+    }
+    terms = Counter()
+    for field_name, value in fields.items():
+        for token in tokenize(_field_text(value)):
+            terms[token] += PROFILE_FIELD_WEIGHTS[field_name]
+    return terms
+
+
+def _digest(job: dict) -> str:
+    return hashlib.sha1(json.dumps(job, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _impacts(tf, doc_len, avg_len):
+    """BM25 term-frequency component, precomputed per posting."""
+    return tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avg_len))
+
+
+class _Postings:
+    """Growable (row, tf, impact) arrays for one term."""
+
+    __slots__ = ("rows", "tfs", "impacts", "size")
+
+    def __init__(self, rows=None, tfs=None, impacts=None):
+        self.rows = rows if rows is not None else np.empty(4, dtype=np.int32)
+        self.tfs = tfs if tfs is not None else np.empty(4, dtype=np.float32)
+        self.impacts = impacts if impacts is not None else np.empty(4, dtype=np.float32)
+        self.size = 0 if rows is None else len(rows)
+
+    def append(self, row, tf, impact):
+        if self.size == len(self.rows):
+            capacity = max(4, self.size * 2)
+            self.rows = np.resize(self.rows, capacity)
+            self.tfs = np.resize(self.tfs, capacity)
+            self.impacts = np.resize(self.impacts, capacity)
+        self.rows[self.size] = row
+        self.tfs[self.size] = tf
+        self.impacts[self.size] = impact
+        self.size += 1
+
+
+class _Column:
+    """Growable 1-D NumPy array (per-row attributes)."""
+
+    __slots__ = ("data", "size")
+
+    def __init__(self, dtype, values=None):
+        self.data = np.asarray(values, dtype=dtype) if values is not None else np.empty(16, dtype=dtype)
+        self.size = 0 if values is None else len(self.data)
+
+    def append(self, value):
+        if self.size == len(self.data):
+            self.data = np.resize(self.data, max(16, self.size * 2))
+        self.data[self.size] = value
+        self.size += 1
+
+    def view(self):
+        return self.data[: self.size]
+
+
+class JobIndex:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._file_signature = None
+        self._reset()
+        if path and os.path.isfile(path):
+            self.refresh_if_changed()
+
+    def _reset(self):
+        self._vocab = {}  # {term: term id}
+        self._postings = []  # [_Postings] by term id
+        self._df = []  # live documents per term id
+        self._jobs = {}  # {job id: (row, job dict, digest)}
+        self._row_ids = []  # job id per row
+        self._alive = _Column(np.bool_)
+        self._doc_len = _Column(np.float32)
+        self._city = _Column(np.int32)
+        self._cities = {}  # {lowercase city: city id}
+        self._city_names = {}  # {lowercase city: name as written in the postings}
+        self._total_len = 0.0
+        self._impact_avg_len = 1.0  # average length the stored impacts were computed with
+        self._dead = 0
+
+    # ---------------------------------------------------
+    # BUILD / UPDATE
+    # ---------------------------------------------------
+    def build(self, jobs: Iterable[dict]) -> int:
+        """Replace the index with `jobs` in one bulk pass. Returns jobs indexed."""
+        with self._lock:
+            self._reset()
+            term_ids, rows, tfs = array("i"), array("i"), array("f")
+            doc_lens, cities = [], []
+            # Last version of each id wins
+            for job_id, job in {str(job["id"]): job for job in jobs}.items():
+                row = len(self._row_ids)
+                terms = job_terms(job)
+                for term, tf in terms.items():
+                    term_id = self._term_id(term)
+                    self._df[term_id] += 1
+                    term_ids.append(term_id)
+                    rows.append(row)
+                    tfs.append(tf)
+                length = float(sum(terms.values()))
+                doc_lens.append(length)
+                cities.append(self._city_id(job.get("city")))
+                self._row_ids.append(job_id)
+                self._jobs[job_id] = (row, job, _digest(job))
+                self._total_len += length
+
+            self._alive = _Column(np.bool_, np.ones(len(self._row_ids), dtype=np.bool_))
+            self._doc_len = _Column(np.float32, doc_lens)
+            self._city = _Column(np.int32, cities)
+
+            # Group (row, tf) pairs by term with one stable sort
+            term_ids = np.frombuffer(term_ids, dtype=np.int32)
+            order = np.argsort(term_ids, kind="stable")
+            rows = np.frombuffer(rows, dtype=np.int32)[order]
+            tfs = np.frombuffer(tfs, dtype=np.float32)[order]
+            self._impact_avg_len = max(self._total_len / len(self._jobs), 1.0) if self._jobs else 1.0
+            impacts = _impacts(tfs, self._doc_len.view()[rows], self._impact_avg_len).astype(np.float32)
+            bounds = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(self._vocab)))])
+            self._postings = [
+                _Postings(rows[lo:hi].copy(), tfs[lo:hi].copy(), impacts[lo:hi].copy())
+                for lo, hi in zip(bounds[:-1], bounds[1:])
+            ]
+            return len(self._jobs)
+
+    def upsert(self, job: dict) -> bool:
+        """Add or replace one job. Returns False if it was already indexed unchanged."""
+        job_id = str(job["id"])
+        digest = _digest(job)
+        with self._lock:
+            current = self._jobs.get(job_id)
+            if current is not None and current[2] == digest:
+                return False
+            if current is not None:
+                self._remove_row(job_id)
+            self._add_row(job_id, job, digest)
+            self._maybe_compact()
+            return True
+
+    def remove(self, job_id: str) -> bool:
+        with self._lock:
+            if str(job_id) not in self._jobs:
+                return False
+            self._remove_row(str(job_id))
+            self._maybe_compact()
+            return True
+
+    def sync(self, jobs: Iterable[dict]) -> dict:
+        """Make the index match `jobs`, touching only what changed."""
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+        with self._lock:
+            for job in jobs:
+                job_id = str(job["id"])
+                seen.add(job_id)
+                existed = job_id in self._jobs
+                if self.upsert(job):
+                    counts["updated" if existed else "added"] += 1
+                else:
+                    counts["unchanged"] += 1
+            for job_id in [j for j in self._jobs if j not in seen]:
+                self.remove(job_id)
+                counts["removed"] += 1
+        return counts
+
+    def refresh_if_changed(self) -> Optional[dict]:
+        """Re-sync from the postings file if it changed since the last look."""
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if signature == self._file_signature:
+                return None
+            first_load = self._file_signature is None and not self._jobs
+            self._file_signature = signature
+            if first_load:
+                self.build(read_jobs(self.path))
+                return {"added": len(self._jobs), "updated": 0, "removed": 0, "unchanged": 0}
+            return self.sync(read_jobs(self.path))
+
+    def _add_row(self, job_id, job, digest):
+        row = len(self._row_ids)
+        terms = job_terms(job)
+        length = float(sum(terms.values()))
+        for term, tf in terms.items():
+            term_id = self._term_id(term)
+            self._postings[term_id].append(row, tf, _impacts(tf, length, self._impact_avg_len))
+            self._df[term_id] += 1
+        self._row_ids.append(job_id)
+        self._alive.append(True)
+        self._doc_len.append(length)
+        self._city.append(self._city_id(job.get("city")))
+        self._jobs[job_id] = (row, job, digest)
+        self._total_len += length
+
+    def _remove_row(self, job_id):
+        row, job, _ = self._jobs.pop(job_id)
+        for term in job_terms(job):
+            self._df[self._vocab[term]] -= 1
+        self._alive.data[row] = False
+        self._total_len -= float(self._doc_len.data[row])
+        self._dead += 1
+
+    def _maybe_compact(self):
+        rows = len(self._row_ids)
+        if rows >= 1000 and self._dead > rows * COMPACT_DEAD_FRACTION:
+            self.build([job for _, job, _ in sorted(self._jobs.values(), key=lambda entry: entry[0])])
+
+    def _recompute_impacts(self):
+        live = len(self._row_ids) - self._dead
+        self._impact_avg_len = max(self._total_len / live, 1.0)
+        doc_len = self._doc_len.view()
+        for postings in self._postings:
+            size = postings.size
+            postings.impacts[:size] = _impacts(
+                postings.tfs[:size], doc_len[postings.rows[:size]], self._impact_avg_len,
+            )
+
+    def _term_id(self, term):
+        term_id = self._vocab.get(term)
+        if term_id is None:
+            term_id = self._vocab[term] = len(self._vocab)
+            self._postings.append(_Postings())
+            self._df.append(0)
+        return term_id
+
+    def _city_id(self, city):
+        if not city:
+            return -1
+        key = city.strip().lower()
+        city_id = self._cities.get(key)
+        if city_id is None:
+            city_id = self._cities[key] = len(self._cities)
+            self._city_names[key] = city.strip()
+        return city_id
+
+    # ---------------------------------------------------
+    # QUERIES
+    # ---------------------------------------------------
+    def city_for(self, location: Optional[str]) -> Optional[str]:
+        """The indexed town named in a free-text location, e.g. "Soweto, Johannesburg"."""
+        if not location:
+            return None
+        text = f" {' '.join(_TOKEN.findall(location.lower()))} "
+        with self._lock:
+            matches = [city for city in self._cities if f" {city} " in text]
+        return self._city_names[max(matches, key=len)] if matches else None
+
+    def search(self, terms: Counter, k: int = 10, city: Optional[str] = None) -> list:
+        """Top-k (job, score) for weighted query terms, best first."""
+        with self._lock:
+            rows_total = len(self._row_ids)
+            live = rows_total - self._dead
+            if not live or not terms:
+                return []
+
+            if abs(self._total_len / live - self._impact_avg_len) > IMPACT_DRIFT * self._impact_avg_len:
+                self._recompute_impacts()
+
+            scores = np.zeros(rows_total, dtype=np.float32)
+            for term, query_weight in terms.items():
+                term_id = self._vocab.get(term)
+                if term_id is None or not self._df[term_id]:
+                    continue
+                postings = self._postings[term_id]
+                df = self._df[term_id]
+                idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+                # Rows are unique within a term, so fancy-index += is safe
+                scores[postings.rows[: postings.size]] += np.float32(query_weight * idf) * postings.impacts[: postings.size]
+
+            if self._dead:
+                scores *= self._alive.view()
+            city_id = self._cities.get(city.strip().lower()) if city else None
+            if city_id is not None:
+                scores[self._city.view() == city_id] *= 1 + LOCATION_BOOST
+
+            k = min(k, rows_total)
+            top = np.argpartition(scores, -k)[-k:]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [
+                (self._jobs[self._row_ids[row]][1], float(scores[row]))
+                for row in top
+                if scores[row] > 0
+            ]
+
+    def match_profile(self, profile, k: int = 10, city: Optional[str] = None) -> list:
+        return self.search(profile_terms(profile), k=k, city=city or self.city_for(profile.location))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs": len(self._jobs),
+                "rows": len(self._row_ids),
+                "dead_rows": self._dead,
+                "terms": len(self._vocab),
+                "postings": int(sum(p.size for p in self._postings)),
+            }
+
+
+def read_jobs(path: str):
+    """Yield jobs from a JSONL file, skipping blank and malformed lines."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(job, dict) and job.get("id") is not None:
+                yield job
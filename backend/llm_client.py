@@ -0,0 +1,359 @@
+"""
+One interface for every model call the backend makes.
+
+Routes ask an `LLMClient` to `complete()` or `stream()` a prompt (a single
+string) or a chat (a list of messages), optionally with a JSON schema for
+structured output. Two implementations:
+
+  OpenAIClient – the real thing. Prompts go to the Responses API and chats
+                 to Chat Completions, exactly as the routes called them
+                 before.
+  StubClient   – no network. Canned, templated replies (a profile that
+                 matches the requested schema, a CV-shaped document, a short
+                 chat answer), derived from a hash of the input so the same
+                 request always gets the same reply. Latency and failures are
+                 drawn from configurable distributions, so load tests measure
+                 the server's own overhead under realistic model timing.
+
+make_llm_client() picks one from LLM_BACKEND (openai | stub). The stub reads:
+
+  LLM_STUB_LATENCY       seconds before the reply (or the first streamed
+                         chunk): "0.3", "uniform:0.2,1.5", "normal:0.8,0.2"
+                         or "lognormal:<median>,<sigma>"; default 0
+  LLM_STUB_MODEL_LATENCY  per-model overrides of LLM_STUB_LATENCY,
+                         e.g. "gpt-5.1=lognormal:3,0.6;gpt-4.1-mini=0.8"
+  LLM_STUB_CHUNK_DELAY   seconds between streamed chunks; same syntax
+  LLM_STUB_FAILURE_RATE  fraction of calls that raise LLMError (0–1)
+  LLM_STUB_FAILURE_STATUS  status codes to fail with, e.g. "429,503"
+  LLM_STUB_SEED          seed for the latency/failure draws
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+
+class LLMError(RuntimeError):
+    """A failed model call. status_code mirrors the upstream HTTP status."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+@dataclass(slots=True)
+class Completion:
+    text: str
+    model: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+class CompletionStream:
+    """
+    Iterate for text deltas; token counts are filled in once the stream ends.
+    produce(stream) returns the delta generator and may set the token counts.
+    """
+
+    def __init__(self, model: str, produce: Callable[["CompletionStream"], Iterator[str]]):
+        self.model = model
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self._deltas = produce(self)
+
+    def __iter__(self):
+        return self._deltas
+
+
+class LLMClient:
+    name = "base"
+
+    def complete(
+        self,
+        model: str,
+        prompt: Optional[str] = None,
+        messages: Optional[List[dict]] = None,
+        json_schema: Optional[dict] = None,
+    ) -> Completion:
+        raise NotImplementedError
+
+    def stream(self, model: str, prompt: Optional[str] = None, messages: Optional[List[dict]] = None) -> CompletionStream:
+        raise NotImplementedError
+
+    def warm(self) -> None:
+        """Set up the connection now rather than on the first call (app.py's warm-up)."""
+
+
+# ---------------------------------------------------
+# OPENAI
+# ---------------------------------------------------
+class OpenAIClient(LLMClient):
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None):
+        self._api_key = api_key
+        self._openai = None
+        self._lock = threading.Lock()
+
+    @property
+    def _client(self):
+        # The openai package takes longer to import than the rest of the app;
+        # load it on the first call
+        if self._openai is None:
+            with self._lock:
+                if self._openai is None:
+                    from openai import OpenAI
+
+                    self._openai = OpenAI(api_key=self._api_key or os.getenv("OPENAI_API_KEY"))
+        return self._openai
+
+    def warm(self):
+        # A free request, so the TLS connection is open before the first real one
+        self._client.models.list()
+
+    def complete(self, model, prompt=None, messages=None, json_schema=None):
+        if messages is None:
+            response = self._client.responses.create(model=model, input=prompt)
+            usage = getattr(response, "usage", None)
+            return Completion(
+                response.output_text, model,
+                usage.input_tokens if usage else None, usage.output_tokens if usage else None,
+            )
+
+        options = {}
+        if json_schema is not None:
+            options["response_format"] = {"type": "json_schema", "json_schema": json_schema}
+        completion = self._client.chat.completions.create(model=model, messages=messages, **options)
+        usage = getattr(completion, "usage", None)
+        return Completion(
+            completion.choices[0].message.content or "", model,
+            usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None,
+        )
+
+    def stream(self, model, prompt=None, messages=None):
+        if messages is None:
+            events = self._client.responses.create(model=model, input=prompt, stream=True)
+            return CompletionStream(model, lambda result: self._response_deltas(events, result))
+
+        chunks = self._client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        return CompletionStream(model, lambda result: self._chat_deltas(chunks, result))
+
+    @staticmethod
+    def _response_deltas(events, result):
+        for event in events:
+            if event.type == "response.output_text.delta" and event.delta:
+                yield event.delta
+            elif event.type == "response.completed":
+                usage = getattr(event.response, "usage", None)
+                if usage:
+                    result.prompt_tokens, result.completion_tokens = usage.input_tokens, usage.output_tokens
+
+    @staticmethod
+    def _chat_deltas(chunks, result):
+        for chunk in chunks:
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                result.prompt_tokens, result.completion_tokens = usage.prompt_tokens, usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+# ---------------------------------------------------
+# LOCAL STUB
+# ---------------------------------------------------
+class Latency:
+    """A latency distribution parsed from "0.3", "uniform:a,b", "normal:mean,sd" or "lognormal:median,sigma"."""
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, spec: str = "0"):
+        kind, _, params = (spec or "0").partition(":")
+        if not params:
+            kind, params = "fixed", kind
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",")]
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        else:
+            value = rng.lognormvariate(math.log(p[0]), p[1]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+_STUB_NAMES = ["Ayanda Zulu", "Thabo Mokoena", "Lerato Dlamini", "Sipho Nkosi", "Naledi Khumalo", "Kagiso Molefe"]
+_STUB_TOWNS = ["Soweto, Johannesburg", "Umlazi, Durban", "Khayelitsha, Cape Town", "Mamelodi, Pretoria",
+               "Seshego, Polokwane", "Mangaung, Bloemfontein"]
+_STUB_SKILLS = ["Customer service", "Cash handling", "Stock taking", "Hair braiding", "Tutoring maths",
+                "Time management", "Basic computer skills", "Teamwork", "Cooking", "Sales"]
+_STUB_ROLES = [("Shop assistant", "Served customers and handled cash at a family spaza shop."),
+               ("Hairstylist", "Braided hair for regular clients booked over WhatsApp."),
+               ("Maths tutor", "Helped Grade 10 learners prepare for tests."),
+               ("Car wash attendant", "Washed and valeted cars on weekends.")]
+_STUB_LANGUAGES = ["English", "isiZulu", "isiXhosa", "Sesotho", "Afrikaans", "Setswana"]
+_STUB_SAMPLES = {
+    "name": _STUB_NAMES,
+    "location": _STUB_TOWNS,
+    "education": ["Matric (Grade 12)", "Grade 11", "N3 Engineering Studies"],
+    "skills": _STUB_SKILLS,
+    "languages": _STUB_LANGUAGES,
+    "role": [role for role, _ in _STUB_ROLES],
+    "description": [description for _, description in _STUB_ROLES],
+    "summary": ["Friendly, reliable and quick to learn, with hands-on experience serving customers."],
+}
+_STUB_CHAT_REPLIES = [
+    "Thanks for sharing! What kind of work have you done, even informally?",
+    "Great. Which languages do you speak, and how well?",
+    "Nice one. What is the highest grade or qualification you finished?",
+    "Got it. Which town or area are you looking for work in?",
+]
+
+
+class StubClient(LLMClient):
+    name = "stub"
+
+    def __init__(
+        self,
+        latency: str = "0",
+        chunk_delay: str = "0",
+        model_latency: Optional[dict] = None,
+        failure_rate: float = 0.0,
+        failure_statuses=(503,),
+        seed: Optional[int] = None,
+    ):
+        self.latency = Latency(latency)
+        self.model_latency = {model: Latency(spec) for model, spec in (model_latency or {}).items()}
+        self.chunk_delay = Latency(chunk_delay)
+        self.failure_rate = failure_rate
+        self.failure_statuses = tuple(failure_statuses)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.slept = 0.0  # total seconds spent in simulated latency
+
+    @classmethod
+    def from_env(cls) -> "StubClient":
+        seed = os.getenv("LLM_STUB_SEED")
+        statuses = os.getenv("LLM_STUB_FAILURE_STATUS", "503")
+        model_latency = dict(
+            item.split("=", 1) for item in os.getenv("LLM_STUB_MODEL_LATENCY", "").split(";") if "=" in item
+        )
+        return cls(
+            latency=os.getenv("LLM_STUB_LATENCY", "0"),
+            model_latency=model_latency,
+            chunk_delay=os.getenv("LLM_STUB_CHUNK_DELAY", "0"),
+            failure_rate=float(os.getenv("LLM_STUB_FAILURE_RATE", "0")),
+            failure_statuses=[int(s) for s in statuses.split(",") if s.strip()],
+            seed=int(seed) if seed else None,
+        )
+
+    def complete(self, model, prompt=None, messages=None, json_schema=None):
+        delay, failure = self._draw(model)
+        self._sleep(delay)
+        if failure:
+            raise LLMError(f"stub failure ({failure})", status_code=failure)
+        text = self._reply(prompt, messages, json_schema)
+        return Completion(text, model, _estimate_tokens(prompt, messages), _estimate_tokens(text, None))
+
+    def stream(self, model, prompt=None, messages=None):
+        delay, failure = self._draw(model)
+        text = self._reply(prompt, messages, None)
+        prompt_tokens = _estimate_tokens(prompt, messages)
+        return CompletionStream(model, lambda result: self._stream_deltas(text, delay, failure, result, prompt_tokens))
+
+    def _stream_deltas(self, text, delay, failure, result, prompt_tokens):
+        self._sleep(delay)
+        if failure:
+            raise LLMError(f"stub failure ({failure})", status_code=failure)
+        words = text.split(" ")
+        for i in range(0, len(words), 4):
+            if i:
+                with self._lock:
+                    pause = self.chunk_delay.sample(self._rng)
+                self._sleep(pause)
+            yield " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+        result.prompt_tokens, result.completion_tokens = prompt_tokens, _estimate_tokens(text, None)
+
+    def _sleep(self, seconds):
+        if seconds:
+            time.sleep(seconds)
+            with self._lock:
+                self.slept += seconds
+
+    def _draw(self, model):
+        with self._lock:
+            self.calls += 1
+            delay = self.model_latency.get(model, self.latency).sample(self._rng)
+            failed = self.failure_rate and self._rng.random() < self.failure_rate
+            return delay, (self._rng.choice(self.failure_statuses) if failed else None)
+
+    def _reply(self, prompt, messages, json_schema):
+        text = prompt if messages is None else json.dumps(messages, ensure_ascii=False)
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        if json_schema is not None:
+            return json.dumps(_sample_for_schema(json_schema.get("schema", json_schema), rng, None), ensure_ascii=False)
+        if messages is not None:
+            return rng.choice(_STUB_CHAT_REPLIES)
+        return _stub_document(rng)
+
+
+def _sample_for_schema(schema, rng, field_name):
+    kinds = schema.get("type", "string")
+    kind = next((k for k in kinds if k != "null"), "string") if isinstance(kinds, list) else kinds
+    if kind == "object":
+        return {name: _sample_for_schema(sub, rng, name) for name, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_sample_for_schema(schema.get("items", {}), rng, field_name) for _ in range(rng.randint(2, 4))]
+    if kind in ("number", "integer"):
+        return rng.randint(1, 10)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return rng.choice(_STUB_SAMPLES.get(field_name, ["stub"]))
+
+
+def _stub_document(rng):
+    name, town = rng.choice(_STUB_NAMES), rng.choice(_STUB_TOWNS)
+    lines = [name, town, "", "SUMMARY", _STUB_SAMPLES["summary"][0], "", "EDUCATION",
+             rng.choice(_STUB_SAMPLES["education"]), "", "INFORMAL EXPERIENCE"]
+    for role, description in rng.sample(_STUB_ROLES, 2):
+        lines += [role, f"- {description}"]
+    lines += ["", "SKILLS", *(f"- {skill}" for skill in rng.sample(_STUB_SKILLS, 4))]
+    lines += ["", "LANGUAGES", ", ".join(rng.sample(_STUB_LANGUAGES, 2))]
+    return "\n".join(lines)
+
+
+def _estimate_tokens(prompt, messages):
+    text = prompt if messages is None else " ".join(str(m.get("content", "")) for m in messages)
+    return max(1, len(text or "") // 4)
+
+
+def make_llm_client() -> LLMClient:
+    """Build the client selected by LLM_BACKEND (openai | stub)."""
+    backend = os.getenv("LLM_BACKEND", "openai").lower()
+    if backend == "stub":
+        return StubClient.from_env()
+    if backend != "openai":
+        raise RuntimeError(f"Unknown LLM_BACKEND: {backend}")
+    return OpenAIClient()
@@ -0,0 +1,504 @@
+"""
+Counters, gauges and histograms for /metrics (Prometheus text format).
+
+Updates are lock-free on the hot path. Each thread writes to its own shard (a
+plain dict reached through a thread-local), and a scrape adds the shards
+together. The only lock is taken once per thread, to register its shard.
+Shards of threads that have exited are folded into one running total when
+a new thread registers and on every scrape, so short-lived threads don't
+pile up.
+
+With several worker processes (serve.py), Registry.share(METRICS_DIR) has
+each process write its totals to `<dir>/<pid>.json` every second. A scrape
+answered by any worker adds in the other workers' files, so counters such
+as the /stats totals count every process. Counters and histograms of a
+worker that exited stay in the sum; its gauges are dropped.
+
+Where a request's time goes:
+
+  track("db", "get")     – context manager around a dependency call. It
+                           observes spanisami_dependency_seconds and adds the
+                           elapsed time to the current request's breakdown.
+  instrument_database()  – wraps firebase_admin.db (or the local stand-in)
+                           so every reference get/set/update/... is tracked
+                           as "db".
+  init_app(app)          – per-route request histograms, in-flight gauges
+                           and the per-request split into model / db / twilio
+                           / speech / app (everything else) time. Streamed responses
+                           are measured until the last chunk is sent.
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COMPONENTS = ("model", "db", "twilio", "speech")
+_ENVIRON_KEY = "spanisami.timings"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}  # {name: metric}, in registration order
+        self._collectors = []  # callables returning exposition lines
+        self._shards = []  # [(thread, shard)]
+        self._retired = {}  # summed shards of exited threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._share_dir = None
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(self, name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge(self, name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help_text, labels, buckets))
+
+    def add_collector(self, collect):
+        """collect() -> list of exposition lines, rendered after the registered metrics."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        totals = self._merged()
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render(totals)
+        for collect in self._collectors:
+            lines += collect()
+        return "\n".join(lines) + "\n"
+
+    def share(self, directory: str, interval: float = 1.0) -> None:
+        """Publish this process's totals every `interval` seconds and merge the other processes' into scrapes."""
+        os.makedirs(directory, exist_ok=True)
+        self._share_dir = directory
+
+        def publish_forever():
+            while True:
+                time.sleep(interval)
+                self.publish()
+
+        threading.Thread(target=publish_forever, name="metrics-publisher", daemon=True).start()
+        atexit.register(self.publish)
+
+    def publish(self) -> None:
+        if self._share_dir is None:
+            return
+        series = [[name, list(values), value] for (name, values), value in self._local_totals().items()]
+        path = os.path.join(self._share_dir, f"{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "series": series}, f)
+        os.replace(tmp, path)
+
+    def shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._retire_exited()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_exited(self):
+        """Fold the shards of exited threads into _retired. Caller holds _lock."""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+                continue
+            for key, value in shard.items():
+                _add(self._retired, key, value)
+        self._shards = live
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def _merged(self):
+        """{(name, label values): number or [bucket counts..., sum]} summed over every thread (and process)."""
+        totals = self._local_totals()
+        if self._share_dir is not None:
+            for key, value in self._other_processes():
+                _add(totals, key, value)
+        return totals
+
+    def _local_totals(self):
+        with self._lock:
+            self._retire_exited()
+            shards = [shard for _, shard in self._shards]
+            totals = {}
+            for key, value in self._retired.items():
+                _add(totals, key, value)
+        for shard in shards:
+            for key, value in list(shard.items()):
+                _add(totals, key, list(value) if isinstance(value, list) else value)
+        return totals
+
+    def _local_series(self, key):
+        """One series summed over this process's threads, without merging the rest."""
+        with self._lock:
+            self._retire_exited()
+            shards = [shard for _, shard in self._shards]
+            totals = {}
+            if key in self._retired:
+                _add(totals, key, self._retired[key])
+        for shard in shards:
+            value = shard.get(key)
+            if value is not None:
+                _add(totals, key, list(value) if isinstance(value, list) else value)
+        return totals.get(key)
+
+    def _other_processes(self):
+        own = f"{os.getpid()}.json"
+        for filename in os.listdir(self._share_dir):
+            if not filename.endswith(".json") or filename == own:
+                continue
+            try:
+                with open(os.path.join(self._share_dir, filename), encoding="utf-8") as f:
+                    published = json.load(f)
+            except (OSError, ValueError):
+                continue  # removed or being replaced
+            alive = _pid_alive(published["pid"])
+            for name, values, value in published["series"]:
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == "gauge" and not alive):
+                    continue
+                yield (name, tuple(values)), value
+
+
+def _add(totals, key, value):
+    if isinstance(value, list):
+        merged = totals.setdefault(key, [0] * len(value))
+        for i, part in enumerate(value):
+            merged[i] += part
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, registry, name, help_text, labels):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return self.name, tuple(str(labels[label]) for label in self.labels)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def _series(self, totals):
+        return sorted((key[1], value) for key, value in totals.items() if key[0] == self.name)
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labels, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        shard = self.registry.shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.registry._merged().get(self._key(labels), 0)
+
+    def render(self, totals):
+        series = self._series(totals)
+        if not series and self.labels:
+            return self._header()
+        series = series or [((), 0)]
+        return self._header() + [f"{self.name}{self._label_text(values)} {_number(v)}" for values, v in series]
+
+
+class Gauge(Counter):
+    """Goes up and down (e.g. requests in flight); sharded like a counter, so no set()."""
+
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labels, buckets):
+        super().__init__(registry, name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        shard = self.registry.shard()
+        key = self._key(labels)
+        counts = shard.get(key)
+        if counts is None:
+            counts = shard[key] = [0] * (len(self.buckets) + 2)  # buckets, +Inf, sum
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def counts(self, **labels) -> list:
+        """[count per bucket..., +Inf count, sum] for one series in this process."""
+        return self.registry._local_series(self._key(labels)) or [0] * (len(self.buckets) + 2)
+
+    def quantile(self, q, counts=None, **labels):
+        """
+        Estimated from the buckets like Prometheus' histogram_quantile: linear
+        within the bucket holding the q-th observation, capped at the last
+        finite bound. None before any observation.
+        """
+        counts = counts or self.counts(**labels)
+        total = sum(counts[:-1])
+        if not total:
+            return None
+        rank, running, lower = q * total, 0, 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and running + count >= rank:
+                return lower + (bound - lower) * (rank - running) / count
+            running += count
+            lower = bound
+        return self.buckets[-1]
+
+    def snapshot(self, **labels) -> dict:
+        """Count, sum, p50/p95/p99 and cumulative buckets of one series, for /stats."""
+        counts = self.counts(**labels)
+        cumulative, running = {}, 0
+        for bound, count in zip([*self.buckets, "+Inf"], counts[:-1]):
+            running += count
+            cumulative[str(bound)] = running
+        return {
+            "count": running,
+            "sum": round(counts[-1], 4),
+            "p50": self.quantile(0.5, counts),
+            "p95": self.quantile(0.95, counts),
+            "p99": self.quantile(0.99, counts),
+            "buckets": cumulative,
+        }
+
+    def render(self, totals):
+        lines = self._header()
+        for values, counts in self._series(totals):
+            running = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts[:-1]):
+                running += count
+                lines.append(f"{self.name}_bucket{self._label_text(values, [('le', _number(bound))])} {running}")
+            lines.append(f"{self.name}_sum{self._label_text(values)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{self._label_text(values)} {running}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+# ---------------------------------------------------
+# APP-WIDE METRICS
+# ---------------------------------------------------
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "spanisami_request_seconds", "Request latency, including streamed bodies.", ("route", "method", "status"),
+)
+REQUEST_COMPONENT_SECONDS = registry.histogram(
+    "spanisami_request_component_seconds",
+    "Per-request time split into model, db, twilio, speech and app (the rest).", ("route", "component"),
+)
+REQUESTS_IN_FLIGHT = registry.gauge("spanisami_requests_in_flight", "Requests being handled.", ("route",))
+DEPENDENCY_SECONDS = registry.histogram(
+    "spanisami_dependency_seconds", "Latency of single calls to a dependency.", ("dependency", "operation"),
+)
+DEPENDENCY_ERRORS = registry.counter(
+    "spanisami_dependency_errors_total", "Dependency calls that raised.", ("dependency", "operation"),
+)
+DEPENDENCY_IN_FLIGHT = registry.gauge(
+    "spanisami_dependency_in_flight", "Dependency calls waiting for an answer.", ("dependency",),
+)
+LLM_TOKENS = registry.counter("spanisami_llm_tokens_total", "Tokens per model.", ("model", "kind"))
+# Written by model_router.py; registered here so shared scrapes sum them over workers
+MODEL_LATENCY_SECONDS = registry.histogram(
+    "spanisami_model_latency_seconds",
+    "Model call latency per attempt (complete, or first_token for streams).", ("model", "kind"),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+)
+MODEL_EVENTS = registry.counter(
+    "spanisami_model_events_total", "Model calls, errors, timeouts, hedges and fallbacks.", ("model", "event"),
+)
+CHAT_TURNS = registry.counter(
+    "spanisami_chat_turns_total",
+    "/chat turns by where the reply came from: bank (no model call), feedback (model feedback + bank question) or model.",
+    ("mode", "source"),
+)
+CHAT_FIRST_TEXT_SECONDS = registry.histogram(
+    "spanisami_chat_first_text_seconds", "Time until a /chat turn's first reply text, by source.", ("mode", "source"),
+)
+
+
+@contextmanager
+def track(dependency: str, operation: str, observe: bool = True):
+    """
+    Time a dependency call. With observe=False the time only counts towards
+    the current request's breakdown (e.g. the gaps between streamed chunks).
+    """
+    timings = _request_timings()
+    if observe:
+        DEPENDENCY_IN_FLIGHT.inc(dependency=dependency)
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        if observe:
+            DEPENDENCY_ERRORS.inc(dependency=dependency, operation=operation)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        if observe:
+            DEPENDENCY_IN_FLIGHT.dec(dependency=dependency)
+            DEPENDENCY_SECONDS.observe(elapsed, dependency=dependency, operation=operation)
+        if timings is not None:
+            timings[dependency] = timings.get(dependency, 0.0) + elapsed
+
+
+def _request_timings():
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return None
+    if not has_request_context():
+        return None
+    return request.environ.get(_ENVIRON_KEY)
+
+
+def init_app(app, path="/metrics"):
+    """Request metrics for every route, plus GET <path> serving the exposition."""
+    from flask import Response, request
+
+    @app.before_request
+    def _start_request():
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        request.environ[_ENVIRON_KEY] = {}
+        request.environ["spanisami.started"] = time.perf_counter()
+        request.environ["spanisami.route"] = route
+        REQUESTS_IN_FLIGHT.inc(route=route)
+
+    @app.after_request
+    def _finish_request(response):
+        environ = request.environ
+        if _ENVIRON_KEY not in environ:
+            return response
+        timings = environ[_ENVIRON_KEY]
+        started, route, method = environ["spanisami.started"], environ["spanisami.route"], request.method
+        status = str(response.status_code)
+
+        def finish():
+            total = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec(route=route)
+            REQUEST_SECONDS.observe(total, route=route, method=method, status=status)
+            spent = 0.0
+            for component in COMPONENTS:
+                seconds = timings.get(component, 0.0)
+                spent += seconds
+                REQUEST_COMPONENT_SECONDS.observe(seconds, route=route, component=component)
+            REQUEST_COMPONENT_SECONDS.observe(max(0.0, total - spent), route=route, component="app")
+
+        # Runs when the server closes the response, i.e. after a stream's last chunk
+        response.call_on_close(finish)
+        environ["spanisami.finishing"] = True
+        return response
+
+    @app.teardown_request
+    def _abandoned_request(error):
+        # An unhandled exception skips after_request; still count the request
+        environ = request.environ
+        if _ENVIRON_KEY not in environ or environ.get("spanisami.finishing"):
+            return
+        route = environ["spanisami.route"]
+        REQUESTS_IN_FLIGHT.dec(route=route)
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - environ["spanisami.started"], route=route, method=request.method, status="500",
+        )
+
+    @app.route(path, methods=["GET"])
+    def metrics_endpoint():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+# ---------------------------------------------------
+# DATABASE INSTRUMENTATION
+# ---------------------------------------------------
+# Reference/query methods that go over the network
+_DB_CALLS = {"get", "set", "update", "push", "delete", "transaction", "set_if_unchanged", "get_if_changed"}
+
+
+class _TimedReference:
+    def __init__(self, inner):
+        self._inner = inner
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        if not callable(attr):
+            return attr
+        if name in _DB_CALLS:
+            def timed(*args, **kwargs):
+                with track("db", name):
+                    result = attr(*args, **kwargs)
+                return _TimedReference(result) if name == "push" else result
+            return timed
+
+        def chained(*args, **kwargs):
+            # Query builders (order_by_child, limit_to_first, child, ...) return
+            # references/queries whose calls should be timed too
+            result = attr(*args, **kwargs)
+            return _TimedReference(result) if hasattr(result, "get") and not isinstance(result, dict) else result
+        return chained
+
+
+class _TimedDatabase:
+    def __init__(self, inner):
+        self._inner = inner
+
+    def reference(self, *args, **kwargs):
+        return _TimedReference(self._inner.reference(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+def instrument_database(db):
+    """db with every reference call timed as dependency "db"."""
+    return _TimedDatabase(db)
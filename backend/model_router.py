@@ -0,0 +1,317 @@
+"""
+Picks the model for each call and keeps slow ones from setting the tail.
+
+Routes ask for a route name ("generate_cv", "chat", ...) instead of a model.
+Each route has an ordered list of tiers (a tier is a model plus a timeout
+and a relative cost) and optional budgets:
+
+  timeout         – seconds to wait for an attempt before moving on to the
+                    route's next tier. A stream counts as answered at its
+                    first chunk.
+  latency_budget  – a tier whose observed p95 is above this moves to the back
+                    of the list until it recovers.
+  max_cost        – tiers that cost more than this are skipped.
+  hedge           – when an attempt outlives its model's p95, send the
+                    same request again and take whichever answers first.
+                    Hedges are capped at HEDGE_MAX_RATIO of calls.
+
+Retryable upstream errors (429/5xx) also move on to the next tier. Every
+attempt's latency goes into metrics.MODEL_LATENCY_SECONDS per model, with
+timed-out and hedged-away calls recorded when they eventually finish. The
+p95s above are estimated from this process's buckets of that histogram;
+/stats shows them, and /metrics sums the buckets and the call/error/hedge
+counts over workers.
+
+Config comes from default_routing(), built from MODEL_FAST / MODEL_WRITER. Point
+MODEL_ROUTING_PATH at a JSON file of the same shape to replace it.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Optional
+
+import metrics
+from llm_client import CompletionStream, LLMError
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MAX_RATIO = 0.1
+HEDGE_MIN_DELAY = 0.1
+
+
+class ModelTimeout(LLMError):
+    def __init__(self, model: str, timeout: float):
+        super().__init__(f"{model} did not answer within {timeout:g}s", status_code=504)
+
+
+@dataclass(frozen=True, slots=True)
+class Tier:
+    name: str
+    model: str
+    timeout: float = 30.0
+    cost: float = 1.0  # relative, e.g. USD per 1M input tokens
+
+
+@dataclass(frozen=True, slots=True)
+class RoutePolicy:
+    tiers: tuple
+    timeout: Optional[float] = None
+    latency_budget: Optional[float] = None
+    max_cost: Optional[float] = None
+    hedge: bool = False
+
+
+def default_routing() -> dict:
+    fast = os.getenv("MODEL_FAST", "gpt-4.1-mini")
+    writer = os.getenv("MODEL_WRITER", "gpt-5.1")
+    return {
+        "tiers": {
+            "fast": {"model": fast, "timeout": 20, "cost": 0.4},
+            "writer": {"model": writer, "timeout": 45, "cost": 1.25},
+        },
+        "routes": {
+            "test": {"tiers": ["writer", "fast"], "timeout": 15},
+            "build_profile": {"tiers": ["fast"], "timeout": 30, "hedge": True},
+            "generate_cv": {"tiers": ["writer", "fast"], "timeout": 25, "latency_budget": 20, "hedge": True},
+            "chat": {"tiers": ["fast"], "timeout": 20, "hedge": True},
+            "chat_summary": {"tiers": ["fast"], "timeout": 30},
+        },
+    }
+
+
+def load_routing() -> dict:
+    path = os.getenv("MODEL_ROUTING_PATH")
+    if not path:
+        return default_routing()
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---------------------------------------------------
+# ROUTER
+# ---------------------------------------------------
+class ModelRouter:
+    def __init__(self, llm, routing: Optional[dict] = None, max_workers: int = 256, latency=None):
+        routing = routing or default_routing()
+        self.llm = llm
+        self.tiers = {name: Tier(name, **spec) for name, spec in routing["tiers"].items()}
+        self.routes = {}
+        for route, spec in routing["routes"].items():
+            spec = dict(spec)
+            tiers = tuple(self.tiers[name] for name in spec.pop("tiers"))
+            self.routes[route] = RoutePolicy(tiers=tiers, **spec)
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model")
+        # A metrics.Histogram labelled (model, kind); benchmarks pass their own
+        self.latency = latency or metrics.MODEL_LATENCY_SECONDS
+        self._counters = {}  # {model: {"calls", "errors", "timeouts", "hedges", "hedge_wins", "fallbacks"}}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0  # model calls running on the pool, hedges included
+
+    def primary_model(self, route: str) -> str:
+        return self._plan(self.routes[route])[0].model
+
+    def complete(self, route: str, prompt=None, messages=None, json_schema=None):
+        """Completion from the first tier that answers in time; .model says which one."""
+        def attempt(model):
+            return self.llm.complete(model, prompt=prompt, messages=messages, json_schema=json_schema)
+
+        with metrics.track("model", route):
+            completion = self._run(route, "complete", attempt)
+        _count_tokens(completion)
+        return completion
+
+    def stream(self, route: str, prompt=None, messages=None) -> CompletionStream:
+        """A stream from the first tier whose first chunk arrives in time."""
+        def attempt(model):
+            inner = self.llm.stream(model, prompt=prompt, messages=messages)
+            deltas = iter(inner)
+            first = next(deltas, None)
+            return inner, deltas, first
+
+        with metrics.track("model", route):
+            inner, deltas, first = self._run(route, "first_token", attempt, discard=_close_stream)
+
+        def produce(outer):
+            try:
+                delta = first
+                while delta is not None:
+                    yield delta
+                    # Waiting for the next chunk is model time for this request
+                    with metrics.track("model", route, observe=False):
+                        delta = next(deltas, None)
+            finally:
+                outer.prompt_tokens, outer.completion_tokens = inner.prompt_tokens, inner.completion_tokens
+                _count_tokens(outer)
+
+        return CompletionStream(inner.model, produce)
+
+    def close(self, timeout: float = 30.0) -> bool:
+        """
+        Wait up to `timeout` seconds for in-flight model calls (including
+        hedges nobody waits for any more), then stop the pool. For graceful
+        shutdown; False if calls were still running.
+        """
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._idle.wait(remaining)
+            drained = not self._in_flight
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        return drained
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = {model: dict(counters) for model, counters in self._counters.items()}
+            in_flight = self._in_flight
+        for model, counters in models.items():
+            for kind in ("complete", "first_token"):
+                snapshot = self.latency.snapshot(model=model, kind=kind)
+                if snapshot["count"]:
+                    counters[kind] = snapshot
+        return {
+            "routes": {
+                route: [tier.model for tier in self._plan(policy)] for route, policy in self.routes.items()
+            },
+            "models": models,
+            "in_flight": in_flight,
+        }
+
+    # ---------------------------------------------------
+    # INTERNALS
+    # ---------------------------------------------------
+    def _plan(self, policy):
+        tiers = [t for t in policy.tiers if policy.max_cost is None or t.cost <= policy.max_cost]
+        tiers = tiers or list(policy.tiers[-1:])
+        if policy.latency_budget is None:
+            return tiers
+        within, over = [], []
+        for tier in tiers:
+            p95 = self._p95(tier.model, "complete")
+            (over if p95 is not None and p95 > policy.latency_budget else within).append(tier)
+        return within + over
+
+    def _run(self, route, kind, attempt, discard=None):
+        policy = self.routes[route]
+        plan = self._plan(policy)
+        last_error = None
+        for position, tier in enumerate(plan):
+            if position:
+                self._count(tier.model, "fallbacks")
+            try:
+                return self._race(policy, tier, kind, attempt, discard)
+            except ModelTimeout as e:
+                last_error = e
+            except Exception as e:
+                if getattr(e, "status_code", None) not in RETRYABLE_STATUS:
+                    raise
+                last_error = e
+        raise last_error
+
+    def _race(self, policy, tier, kind, attempt, discard):
+        """One tier: the call, plus a hedged duplicate if it runs past the model's p95."""
+        timeout = policy.timeout or tier.timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        hedge_at = started + self._hedge_delay(tier.model, kind) if policy.hedge else None
+        if hedge_at is not None and hedge_at >= deadline:
+            hedge_at = None
+
+        futures = {self._pool.submit(self._timed, tier.model, kind, attempt): "primary"}
+        error = None
+        while futures:
+            wake = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, _ = wait(futures, timeout=max(0.0, wake - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                label = futures.pop(future)
+                if future.exception() is None:
+                    if label == "hedge":
+                        self._count(tier.model, "hedge_wins")
+                    _discard_when_done(futures, discard)
+                    return future.result()
+                error = future.exception()
+            if not futures:
+                break
+            now = time.monotonic()
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                if self._may_hedge(tier.model):
+                    self._count(tier.model, "hedges")
+                    futures[self._pool.submit(self._timed, tier.model, kind, attempt)] = "hedge"
+            elif now >= deadline:
+                self._count(tier.model, "timeouts")
+                _discard_when_done(futures, discard)
+                raise ModelTimeout(tier.model, timeout)
+        raise error
+
+    def _timed(self, model, kind, attempt):
+        self._count(model, "calls")
+        with self._lock:
+            self._in_flight += 1
+        started = time.monotonic()
+        try:
+            result = attempt(model)
+        except Exception:
+            self._count(model, "errors")
+            raise
+        finally:
+            with self._idle:
+                self._in_flight -= 1
+                if not self._in_flight:
+                    self._idle.notify_all()
+        self.latency.observe(time.monotonic() - started, model=model, kind=kind)
+        return result
+
+    def _p95(self, model, kind):
+        """The model's p95 in this process, or None until HEDGE_MIN_SAMPLES calls have finished."""
+        counts = self.latency.counts(model=model, kind=kind)
+        if sum(counts[:-1]) < HEDGE_MIN_SAMPLES:
+            return None
+        return self.latency.quantile(0.95, counts)
+
+    def _hedge_delay(self, model, kind):
+        p95 = self._p95(model, kind)
+        return float("inf") if p95 is None else max(HEDGE_MIN_DELAY, p95)
+
+    def _may_hedge(self, model):
+        with self._lock:
+            counters = self._counters.get(model, {})
+            return counters.get("hedges", 0) < HEDGE_MAX_RATIO * counters.get("calls", 0)
+
+    def _count(self, model, name):
+        with self._lock:
+            counters = self._counters.setdefault(
+                model, {"calls": 0, "errors": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "fallbacks": 0},
+            )
+            counters[name] += 1
+        metrics.MODEL_EVENTS.inc(model=model, event=name)
+
+
+def _count_tokens(result):
+    if result.prompt_tokens:
+        metrics.LLM_TOKENS.inc(result.prompt_tokens, model=result.model, kind="prompt")
+    if result.completion_tokens:
+        metrics.LLM_TOKENS.inc(result.completion_tokens, model=result.model, kind="completion")
+
+
+def _discard_when_done(futures, discard):
+    """Hand the results of calls nobody is waiting for any more to discard()."""
+    if discard is None:
+        return
+    for future in futures:
+        future.add_done_callback(lambda f: f.exception() is None and discard(f.result()))
+
+
+def _close_stream(result):
+    """Release the connection of a stream that lost the race."""
+    _, deltas, _ = result
+    close = getattr(deltas, "close", None)
+    if close is not None:
+        close()
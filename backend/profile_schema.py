@@ -0,0 +1,207 @@
+"""
+Typed youth profile, parsed once on the server.
+
+/build_profile asks the model for structured output matching
+PROFILE_JSON_SCHEMA and parses the reply into a `Profile` right away. After
+that, CV generation, search and storage all work on that object instead of
+passing raw model text around.
+
+`parse_profile` handles the common ways a reply goes wrong without a second
+model call: code fences around the JSON, chatter before or after it, and
+replies cut off mid-object (missing closing quotes/brackets, trailing commas).
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+PROFILE_JSON_SCHEMA = {
+    "name": "youth_profile",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["name", "location", "education", "skills", "experience", "languages", "summary"],
+        "properties": {
+            "name": {"type": ["string", "null"]},
+            "location": {"type": ["string", "null"]},
+            "education": {"type": "string"},
+            "skills": {"type": "array", "items": {"type": "string"}},
+            "experience": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["role", "description"],
+                    "properties": {
+                        "role": {"type": "string"},
+                        "description": {"type": "string"},
+                    },
+                },
+            },
+            "languages": {"type": "array", "items": {"type": "string"}},
+            "summary": {"type": "string"},
+        },
+    },
+}
+
+
+class ProfileParseError(ValueError):
+    pass
+
+
+@dataclass(slots=True)
+class Experience:
+    role: str
+    description: str = ""
+
+
+@dataclass(slots=True)
+class Profile:
+    name: Optional[str] = None
+    location: Optional[str] = None
+    education: Optional[str] = None
+    skills: List[str] = field(default_factory=list)
+    experience: List[Experience] = field(default_factory=list)
+    languages: List[str] = field(default_factory=list)
+    summary: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Profile":
+        if not isinstance(data, dict):
+            raise ProfileParseError("profile must be a JSON object")
+        return cls(
+            name=_text(data.get("name")),
+            location=_text(data.get("location")),
+            education=_text(data.get("education")),
+            skills=_text_list(data.get("skills")),
+            experience=[_experience(e) for e in _as_list(data.get("experience")) if e],
+            languages=_text_list(data.get("languages")),
+            summary=_text(data.get("summary")),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "location": self.location,
+            "education": self.education,
+            "skills": list(self.skills),
+            "experience": [{"role": e.role, "description": e.description} for e in self.experience],
+            "languages": list(self.languages),
+            "summary": self.summary,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+
+# ---------------------------------------------------
+# FIELD COERCION
+# ---------------------------------------------------
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value if value and value.lower() not in ("null", "none", "n/a") else None
+
+
+def _as_list(value) -> list:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        return re.split(r"[,;\n]", value)
+    return [value]
+
+
+def _text_list(value) -> List[str]:
+    return [t for t in (_text(v) for v in _as_list(value)) if t]
+
+
+def _experience(value) -> Experience:
+    if isinstance(value, dict):
+        return Experience(role=_text(value.get("role")) or "", description=_text(value.get("description")) or "")
+    return Experience(role=_text(value) or "")
+
+
+# ---------------------------------------------------
+# PARSING + REPAIR
+# ---------------------------------------------------
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+
+
+def parse_profile(text) -> Profile:
+    """Parse model output (or a client-sent dict/string) into a Profile."""
+    if isinstance(text, dict):
+        return Profile.from_dict(text)
+    if not isinstance(text, str) or not text.strip():
+        raise ProfileParseError("profile is empty")
+
+    # Fast path: the structured-output reply is already clean JSON
+    try:
+        return Profile.from_dict(json.loads(text))
+    except ValueError:
+        pass
+
+    return Profile.from_dict(_repair(text))
+
+
+def _repair(text: str) -> dict:
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    start = text.find("{")
+    if start < 0:
+        raise ProfileParseError("no JSON object in model output")
+    text = text[start:]
+
+    end = text.rfind("}")
+    if end >= 0:
+        try:
+            return json.loads(text[: end + 1])
+        except ValueError:
+            pass
+
+    # Truncated reply: close what is open, backing off one element at a time
+    candidate = text
+    for _ in range(20):
+        try:
+            return json.loads(_close_open_structures(candidate))
+        except ValueError:
+            cut = candidate.rfind(",")
+            if cut <= 0:
+                break
+            candidate = candidate[:cut]
+
+    raise ProfileParseError("could not repair model output into JSON")
+
+
+def _close_open_structures(text: str) -> str:
+    closers = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            closers.append("}")
+        elif ch == "[":
+            closers.append("]")
+        elif ch in "}]" and closers:
+            closers.pop()
+
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",")
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(closers))
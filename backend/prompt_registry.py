@@ -0,0 +1,92 @@
+"""
+Versioned prompt templates, loaded once at startup.
+
+Templates live in prompt_templates/ as `<name>.v<N>.txt` and use `$placeholder`
+substitution (string.Template), so JSON examples need no brace escaping.
+Every template keeps its static instructions first and the per-request values
+last. The leading part of each prompt is then byte-identical across requests
+and the provider's prefix cache can reuse it.
+
+The newest version of each template is used unless PROMPT_VERSIONS pins one,
+e.g. PROMPT_VERSIONS="chat_system=1,generate_cv=2" for an A/B run.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from string import Template
+
+_FILE_NAME = re.compile(r"^(?P<name>[a-z_]+)\.v(?P<version>\d+)\.txt$")
+
+
+class PromptTemplate:
+    __slots__ = ("name", "version", "template")
+
+    def __init__(self, name: str, version: int, text: str):
+        self.name = name
+        self.version = version
+        self.template = Template(text.strip())
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}.v{self.version}"
+
+    def render(self, **values) -> str:
+        return self.template.substitute(**values)
+
+
+class PromptRegistry:
+    def __init__(self, directory: str, pinned_versions: str = "", cache_size: int = 256):
+        self._templates = {}
+        self._rendered = OrderedDict()  # {(name, values): text}
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+        pins = {}
+        for item in filter(None, (p.strip() for p in pinned_versions.split(","))):
+            name, _, version = item.partition("=")
+            pins[name.strip()] = int(version)
+
+        available = {}
+        for file_name in sorted(os.listdir(directory)):
+            match = _FILE_NAME.match(file_name)
+            if match:
+                available.setdefault(match["name"], []).append(int(match["version"]))
+
+        for name, versions in available.items():
+            version = pins.get(name, max(versions))
+            if version not in versions:
+                raise RuntimeError(f"Prompt {name} has no version {version} in {directory}")
+            with open(os.path.join(directory, f"{name}.v{version}.txt"), encoding="utf-8") as f:
+                self._templates[name] = PromptTemplate(name, version, f.read())
+
+    def get(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def version(self, name: str) -> str:
+        return self._templates[name].label
+
+    def render(self, name: str, **values) -> str:
+        return self._templates[name].render(**values)
+
+    def render_cached(self, name: str, **values) -> str:
+        """
+        Render and memoise. Only for prompts whose values come from a small set
+        (e.g. the chat system prompt per language and mode), never user text.
+        """
+        key = (name, tuple(sorted(values.items())))
+        with self._lock:
+            text = self._rendered.get(key)
+            if text is not None:
+                self._rendered.move_to_end(key)
+                return text
+
+        text = self.render(name, **values)
+        with self._lock:
+            self._rendered[key] = text
+            while len(self._rendered) > self._cache_size:
+                self._rendered.popitem(last=False)
+        return text
+
+    def versions(self) -> dict:
+        return {name: t.label for name, t in self._templates.items()}
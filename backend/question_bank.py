@@ -0,0 +1,160 @@
+"""
+Pre-written interview questions for /chat interview mode, one bank per language.
+
+Practice interviews mostly ask the same questions ("Tell me about yourself",
+strengths and weaknesses, a difficult customer, ...). The model used to
+write every one of them again, for every user, in every language. A bank
+fixes the questions and a short feedback rubric for each, so:
+
+  - the opening turn (intro + first question) is served without a model call
+  - after each answer the model only writes the feedback, guided by the
+    question's rubric (prompt_templates/interview_feedback), and the next
+    question is appended from the bank
+  - after the last question, and for languages without a bank, the
+    conversation carries on with the normal chat prompt
+
+Banks live in question_banks/ as `<language>.v<N>.json`, are loaded once at
+startup and versioned like the prompt templates: the newest version is used
+unless QUESTION_BANK_VERSIONS pins one, e.g. "zu=1,af=2". New languages are
+generated from an existing bank with build_question_bank.py.
+
+Where a session is in the bank is read from the conversation itself: the last
+assistant turn ends with the question that is being answered. Nothing extra
+is stored, and it survives summarising older turns (context_window.py).
+"""
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+_FILE_NAME = re.compile(r"^(?P<language>[a-z]{2,3})\.v(?P<version>\d+)\.json$")
+
+
+@dataclass(frozen=True, slots=True)
+class Question:
+    id: str
+    text: str
+    rubric: tuple
+
+    @property
+    def rubric_text(self) -> str:
+        return "\n".join(f"- {point}" for point in self.rubric)
+
+
+@dataclass(frozen=True, slots=True)
+class Bank:
+    language: str
+    version: int
+    intro: str
+    next_prefix: str
+    outro: str
+    questions: tuple
+
+    @property
+    def label(self) -> str:
+        return f"{self.language}.v{self.version}"
+
+    def opening(self) -> str:
+        return f"{self.intro}\n\n{self.questions[0].text}"
+
+    def answering(self, reply: str) -> Optional[int]:
+        """Index of the question the assistant's `reply` ended with, if any."""
+        reply = reply.rstrip()
+        for i, question in enumerate(self.questions):
+            if reply.endswith(question.text):
+                return i
+        return None
+
+    def follow_up(self, index: int) -> str:
+        """What comes after the feedback on question `index`: the next question or the outro."""
+        if index + 1 < len(self.questions):
+            return f"{self.next_prefix} {self.questions[index + 1].text}"
+        return self.outro
+
+
+@dataclass(frozen=True, slots=True)
+class ScriptedTurn:
+    """
+    An interview turn the bank can (partly) answer.
+    reply     – the whole reply, no model call needed (the opening)
+    answered  – otherwise the question the user just answered; the model
+                writes feedback on it and `follow_up` is added after that
+    """
+    bank: str
+    reply: Optional[str] = None
+    answered: Optional[Question] = None
+    follow_up: str = ""
+
+
+def load_bank(path: str, language: str, version: int) -> Bank:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    questions = tuple(
+        Question(q["id"], q["question"].strip(), tuple(q["rubric"])) for q in data["questions"]
+    )
+    if not questions:
+        raise RuntimeError(f"Question bank {path} has no questions")
+    return Bank(language, version, data["intro"].strip(), data["next"].strip(), data["outro"].strip(), questions)
+
+
+class QuestionBanks:
+    def __init__(self, directory: str, pinned_versions: str = ""):
+        self.directory = directory
+        self._banks = {}
+
+        pins = {}
+        for item in filter(None, (p.strip() for p in pinned_versions.split(","))):
+            language, _, version = item.partition("=")
+            pins[language.strip()] = int(version)
+
+        available = {}
+        for file_name in sorted(os.listdir(directory)):
+            match = _FILE_NAME.match(file_name)
+            if match:
+                available.setdefault(match["language"], []).append(int(match["version"]))
+
+        for language, versions in available.items():
+            version = pins.get(language, max(versions))
+            if version not in versions:
+                raise RuntimeError(f"Question bank {language} has no version {version} in {directory}")
+            path = os.path.join(directory, f"{language}.v{version}.json")
+            self._banks[language] = load_bank(path, language, version)
+
+    def get(self, language: str) -> Optional[Bank]:
+        return self._banks.get(language)
+
+    def languages(self) -> List[str]:
+        return sorted(self._banks)
+
+    def plan(self, language: str, history: List[dict]) -> Optional[ScriptedTurn]:
+        """
+        How the bank handles this turn (`history` ends with the new user
+        message), or None when it is a free-form turn for the chat prompt.
+        """
+        bank = self._banks.get(language)
+        if bank is None:
+            return None
+        replies = [turn for turn in history if turn["role"] == "assistant"]
+        if not replies:
+            return ScriptedTurn(bank.label, reply=bank.opening())
+        index = bank.answering(replies[-1]["content"])
+        if index is None:
+            return None
+        return ScriptedTurn(bank.label, answered=bank.questions[index], follow_up=bank.follow_up(index))
+
+    def stats(self) -> dict:
+        return {
+            "banks": {language: bank.label for language, bank in sorted(self._banks.items())},
+            "questions": {language: len(bank.questions) for language, bank in sorted(self._banks.items())},
+        }
+
+
+def make_question_banks() -> Optional[QuestionBanks]:
+    """The banks in QUESTION_BANK_DIR, or None with QUESTION_BANK=0 (every turn goes to the model)."""
+    if os.getenv("QUESTION_BANK", "1") == "0":
+        return None
+    directory = os.getenv("QUESTION_BANK_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "question_banks"
+    )
+    return QuestionBanks(directory, pinned_versions=os.getenv("QUESTION_BANK_VERSIONS", ""))
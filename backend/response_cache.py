@@ -0,0 +1,150 @@
+"""
+Content-addressed cache for model responses.
+
+Keys are a SHA-256 of the normalised prompt inputs plus the model name, so a
+phone retrying the same /build_profile or /generate_cv payload gets the
+earlier answer instead of paying for a fresh model call.
+
+Two tiers:
+  - an in-process LRU (always on)
+  - an optional SQLite file with TTL and size-based eviction, shared by every
+    worker process on the machine and kept across restarts
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalise(value):
+    """Canonical form of a prompt input: JSON re-serialised with sorted keys, text whitespace-collapsed."""
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return _WHITESPACE.sub(" ", value).strip()
+        if isinstance(parsed, (dict, list)):
+            return json.dumps(parsed, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return _WHITESPACE.sub(" ", value).strip()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return value
+
+
+def make_key(kind: str, model: str, **inputs) -> str:
+    payload = {
+        "kind": kind,
+        "model": model,
+        "inputs": {k: _normalise(v) for k, v in inputs.items()},
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = 512,
+        db_path: Optional[str] = None,
+        ttl_seconds: int = 24 * 3600,
+        max_disk_entries: int = 10000,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_entries = max_disk_entries
+
+        self._memory = OrderedDict()  # {key: (expires_at, value)}
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at)")
+
+    # ---------------------------------------------------
+    # PUBLIC API
+    # ---------------------------------------------------
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0], row[1])
+                    self._counters["disk_hits"] += 1
+                    return row[0]
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._counters["stores"] += 1
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, expires_at),
+                )
+                self._evict_disk(now)
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._counters)
+            result["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                result["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = result["memory_hits"] + result["disk_hits"] + result["misses"]
+        result["hit_rate"] = round((lookups - result["misses"]) / lookups, 3) if lookups else 0.0
+        return result
+
+    # ---------------------------------------------------
+    # INTERNALS (caller holds self._lock)
+    # ---------------------------------------------------
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        )
@@ -0,0 +1,242 @@
+"""
+Production entry point: N worker processes sharing one listening socket.
+
+    python serve.py --workers 4 --port 5000
+
+The master binds the port, then forks the workers (pre-fork). Each worker
+imports the app itself, after the fork, so that its threads (model pool,
+profile flusher, SMS workers) belong to it. Each worker serves the socket
+with uvicorn through asgi.py's thread pool. The kernel spreads new
+connections over the workers. The master restarts a worker that dies.
+
+State that has to be the same whichever worker answers is kept outside the
+processes. Unless they are already set, the master sets these for the
+workers:
+
+  SESSION_BACKEND=sqlite     /chat histories     (data/sessions.db)
+  CACHE_DB_PATH              model answer cache  (data/response_cache.db)
+  METRICS_DIR                /metrics and /stats totals, summed over workers
+  PROFILE_CACHE_TTL=5        per-worker profile cache re-reads after 5 s
+  PROFILE_SYNC_NEW=1         new profiles are written before /build_profile
+                             answers, so the next call can land anywhere
+  AUDIO_CACHE_DIR            /speak audio synthesised by any worker
+                             (data/audio_cache)
+  LOCAL_DB_PATH              (DATABASE_BACKEND=local only) one JSON file the
+                             workers share under a file lock
+
+Idempotency keys, batch jobs and uploads are already files under data/, and
+phone logins are compare-and-set on the database, so they need nothing.
+The in-process request coalescing and the SMS per-phone limits stay
+per worker.
+
+SIGTERM or SIGINT: graceful stop. Workers stop accepting, finish the
+requests in flight (streams and LLM calls included) for up to
+--graceful-timeout seconds, then wait for background model calls, drain the
+SMS queue and flush queued profile writes (see app.py) before exiting.
+Workers still running after that are killed.
+
+Each worker imports the app without loading fonts or opening connections,
+so it accepts quickly; once uvicorn is listening, serve.py calls the
+module's start_warm_up() (app.py, re-exported by asgi.py) to load them in the
+background.
+
+Needs fork (Linux/macOS). --workers 1 runs in-process anywhere.
+"""
+import argparse
+import importlib
+import os
+import shutil
+import signal
+import socket
+import sys
+import threading
+import time
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+RESTART_BACKOFF = 1.0  # seconds to wait before replacing a worker that died young
+
+
+def shared_state_defaults(workers: int) -> None:
+    if workers <= 1:
+        return
+    defaults = {
+        "SESSION_BACKEND": "sqlite",
+        "SESSION_DB_PATH": os.path.join(DATA_DIR, "sessions.db"),
+        "CACHE_DB_PATH": os.path.join(DATA_DIR, "response_cache.db"),
+        "METRICS_DIR": os.path.join(DATA_DIR, "metrics"),
+        "PROFILE_CACHE_TTL": "5",
+        "PROFILE_SYNC_NEW": "1",
+        "AUDIO_CACHE_DIR": os.path.join(DATA_DIR, "audio_cache"),
+    }
+    if os.getenv("DATABASE_BACKEND", "firebase").lower() == "local":
+        defaults["LOCAL_DB_PATH"] = os.path.join(DATA_DIR, "local_rtdb.json")
+    for name, value in defaults.items():
+        if not os.getenv(name):
+            os.environ[name] = value
+
+
+def bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def load_app(target: str):
+    """"module:attribute", looked up from the current directory first; a Flask (WSGI) app is wrapped like asgi.py.
+
+    Returns (app, module).
+    """
+    sys.path.insert(0, os.getcwd())
+    module_name, _, attribute = target.partition(":")
+    module = importlib.import_module(module_name)
+    app = getattr(module, attribute or "app")
+    if hasattr(app, "wsgi_app"):
+        from a2wsgi import WSGIMiddleware
+
+        app = WSGIMiddleware(
+            app,
+            workers=int(os.getenv("ASGI_THREADS", "256")),
+            send_queue_size=int(os.getenv("ASGI_SEND_QUEUE", "32")),
+        )
+    return app, module
+
+
+def run_worker(sock: socket.socket, args) -> None:
+    import uvicorn
+
+    app, module = load_app(args.app)
+    config = uvicorn.Config(
+        app,
+        lifespan="off",
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        access_log=False,
+    )
+    server = uvicorn.Server(config)
+    start_warm_up = getattr(module, "start_warm_up", None)
+    if start_warm_up is not None:
+        threading.Thread(target=_warm_up_when_serving, args=(server, start_warm_up), daemon=True).start()
+    server.run(sockets=[sock])
+
+
+def _warm_up_when_serving(server, start_warm_up) -> None:
+    # The module's warm-up (see app.py) runs once this worker accepts connections
+    while not server.started:
+        if server.should_exit:
+            return
+        time.sleep(0.05)
+    start_warm_up()
+
+
+class Master:
+    def __init__(self, sock: socket.socket, args):
+        self.sock = sock
+        self.args = args
+        self.workers = {}  # {pid: started_at}
+        self.stopping = False
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.args.workers):
+            self._spawn()
+        print(f"serve: {self.args.workers} workers on {self.args.host}:{self.args.port} (master {os.getpid()})",
+              flush=True)
+
+        while not self.stopping:
+            self._reap(replace=True)
+            time.sleep(0.2)
+        self._shutdown()
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return
+        # Worker: default signal handling until uvicorn installs its own
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(self.sock, self.args)
+        except BaseException:
+            import traceback
+
+            traceback.print_exc()
+            code = 1
+        finally:
+            # sys.exit, not os._exit: atexit hooks drain queues and flush writes
+            sys.exit(code)
+
+    def _reap(self, replace: bool) -> None:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None or not replace or self.stopping:
+                continue
+            print(f"serve: worker {pid} exited ({os.waitstatus_to_exitcode(status)}), replacing", flush=True)
+            if time.monotonic() - started < 5:
+                time.sleep(RESTART_BACKOFF)
+            self._spawn()
+
+    def _stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def _shutdown(self) -> None:
+        # The workers hold their own copies; ours must not keep the port open
+        self.sock.close()
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        # Requests in flight get --graceful-timeout; the drain hooks after it
+        # get their own (SHUTDOWN_DRAIN_SECONDS) plus a little slack
+        drain = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+        deadline = time.monotonic() + self.args.graceful_timeout + drain + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap(replace=False)
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            print(f"serve: worker {pid} did not stop in time, killing", flush=True)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--app", default="asgi:asgi_app", help="module:attribute (ASGI, or a Flask app)")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("GRACEFUL_TIMEOUT", "60")),
+                        help="seconds to finish in-flight requests on shutdown")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "warning"))
+    args = parser.parse_args()
+
+    shared_state_defaults(args.workers)
+    metrics_dir = os.getenv("METRICS_DIR")
+    if metrics_dir and os.path.isdir(metrics_dir):
+        # Totals restart with the server; workers publish afresh
+        shutil.rmtree(metrics_dir)
+
+    sock = bind(args.host, args.port)
+    if args.workers <= 1 or not hasattr(os, "fork"):
+        run_worker(sock, args)
+        return
+    Master(sock, args).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Bounded conversation store for /chat.
+
+Replaces the old module-level `conversations` dict, which never forgot a
+session and let every history grow without limit. Both backends share the
+same rules:
+
+  - sessions idle for longer than `idle_ttl` seconds are dropped
+  - at most `max_sessions` are kept; the least recently used go first
+  - each session keeps only its last `max_turns` messages
+  - stored bytes (message content, UTF-8) are tracked for /stats
+
+Each session can also carry a running summary of turns that were folded out
+of the verbatim history (see context_window.py).
+
+Backends:
+  - MemorySessionStore  – per process, lost on restart
+  - SQLiteSessionStore  – one file, survives restarts and is shared by every
+                          worker process on the machine
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+
+def _message_bytes(message: dict) -> int:
+    return len((message.get("content") or "").encode("utf-8"))
+
+
+class MemorySessionStore:
+    def __init__(self, idle_ttl: int = 3600, max_sessions: int = 10000, max_turns: int = 40):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+
+        self._sessions = OrderedDict()  # {session_id: {"messages": [...], "summary": str, "last_access": ts, "bytes": n}}
+        self._lock = threading.Lock()
+        self._evicted = 0
+
+    def get(self, session_id: str) -> List[dict]:
+        """Return a copy of the session's messages (empty list for new/expired sessions)."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            session["last_access"] = now
+            self._sessions.move_to_end(session_id)
+            return list(session["messages"])
+
+    def append(self, session_id: str, *messages: dict) -> None:
+        now = time.time()
+        with self._lock:
+            # Drop an expired session first, so it is not revived with its old messages
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = {"messages": [], "summary": None, "last_access": now, "bytes": 0}
+                self._sessions[session_id] = session
+
+            session["messages"].extend(messages)
+            session["bytes"] += sum(_message_bytes(m) for m in messages)
+
+            overflow = len(session["messages"]) - self.max_turns
+            if overflow > 0:
+                dropped = session["messages"][:overflow]
+                del session["messages"][:overflow]
+                session["bytes"] -= sum(_message_bytes(m) for m in dropped)
+
+            session["last_access"] = now
+            self._sessions.move_to_end(session_id)
+            self._expire(now)
+
+    def get_summary(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            self._expire(time.time())
+            session = self._sessions.get(session_id)
+            return session["summary"] if session else None
+
+    def fold(self, session_id: str, summary: str, count: int) -> None:
+        """Replace the oldest `count` messages with an updated running summary."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            dropped = session["messages"][:count]
+            del session["messages"][:count]
+            session["bytes"] -= sum(_message_bytes(m) for m in dropped)
+            session["bytes"] += len(summary.encode("utf-8")) - len((session["summary"] or "").encode("utf-8"))
+            session["summary"] = summary
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "turns": sum(len(s["messages"]) for s in self._sessions.values()),
+                "bytes": sum(s["bytes"] for s in self._sessions.values()),
+                "evicted": self._evicted,
+            }
+
+    def _expire(self, now):
+        # OrderedDict is kept in last-access order, so stale sessions sit at the front
+        cutoff = now - self.idle_ttl
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if oldest["last_access"] >= cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[oldest_id]
+            self._evicted += 1
+
+
+class SQLiteSessionStore:
+    def __init__(self, path: str, idle_ttl: int = 3600, max_sessions: int = 10000, max_turns: int = 40):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " last_access REAL NOT NULL,"
+            " summary TEXT,"
+            " bytes INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " bytes INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, seq)")
+        self._lock = threading.Lock()
+        self._evicted = 0
+
+    def get(self, session_id: str) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            cur = self._db.execute("UPDATE sessions SET last_access = ? WHERE id = ?", (now, session_id))
+            if cur.rowcount == 0:
+                return []
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def append(self, session_id: str, *messages: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Drop an expired session first, so the upsert does not revive its old messages
+                self._expire(now)
+                self._db.execute(
+                    "INSERT INTO sessions (id, last_access) VALUES (?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET last_access = excluded.last_access",
+                    (session_id, now),
+                )
+                self._db.executemany(
+                    "INSERT INTO messages (session_id, role, content, bytes) VALUES (?, ?, ?, ?)",
+                    [(session_id, m["role"], m["content"], _message_bytes(m)) for m in messages],
+                )
+                self._db.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND seq NOT IN ("
+                    " SELECT seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?)",
+                    (session_id, session_id, self.max_turns),
+                )
+                self._update_bytes(session_id)
+                self._expire(now)  # max_sessions
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def get_summary(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            self._expire(time.time())
+            row = self._db.execute("SELECT summary FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def fold(self, session_id: str, summary: str, count: int) -> None:
+        """Replace the oldest `count` messages with an updated running summary."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "DELETE FROM messages WHERE seq IN ("
+                    " SELECT seq FROM messages WHERE session_id = ? ORDER BY seq LIMIT ?)",
+                    (session_id, count),
+                )
+                self._db.execute("UPDATE sessions SET summary = ? WHERE id = ?", (summary, session_id))
+                self._update_bytes(session_id)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions, total_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions"
+            ).fetchone()
+            turns = self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "sessions": sessions,
+            "turns": turns,
+            "bytes": total_bytes,
+            "evicted": self._evicted,
+        }
+
+    def _update_bytes(self, session_id):
+        self._db.execute(
+            "UPDATE sessions SET bytes ="
+            " (SELECT COALESCE(SUM(bytes), 0) FROM messages WHERE session_id = ?)"
+            " + LENGTH(CAST(COALESCE(summary, '') AS BLOB))"
+            " WHERE id = ?",
+            (session_id, session_id),
+        )
+
+    def _expire(self, now):
+        cur = self._db.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.idle_ttl,))
+        self._evicted += max(cur.rowcount, 0)
+        cur = self._db.execute(
+            "DELETE FROM sessions WHERE id IN ("
+            " SELECT id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+        self._evicted += max(cur.rowcount, 0)
+
+
+def make_session_store():
+    """Build the store selected by SESSION_BACKEND (memory | sqlite)."""
+    options = {
+        "idle_ttl": int(os.getenv("SESSION_IDLE_TTL", "3600")),
+        "max_sessions": int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+        "max_turns": int(os.getenv("SESSION_MAX_TURNS", "40")),
+    }
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "data/sessions.db"), **options)
+    if backend != "memory":
+        raise RuntimeError(f"Unknown SESSION_BACKEND: {backend}")
+    return MemorySessionStore(**options)
@@ -0,0 +1,80 @@
+"""
+Small state shared by every worker process on the machine, in one SQLite file.
+
+Module globals such as a `profiles` dict or a `stats` counter dict are one
+copy per process: under several workers (serve.py) a profile built on one
+worker is "not found" on the next, and `stats[...] += 1` from concurrent
+threads can lose updates. Used for the /stats totals in app.py and for the
+demo app at the repository root.
+
+  SharedDict      – string keys, JSON values.
+  SharedCounters  – each increment is one atomic UPSERT, so no update is lost
+                    across threads or processes.
+
+WAL mode lets readers run alongside the one writer.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+
+def _connect(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class SharedDict:
+    def __init__(self, path: str, table: str = "kv"):
+        if not table.isidentifier():
+            raise ValueError(f"bad table name: {table}")
+        self.table = table
+        self._db = _connect(path)
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            row = self._db.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __setitem__(self, key: str, value) -> None:
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)",
+                (key, json.dumps(value, ensure_ascii=False)),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class SharedCounters:
+    def __init__(self, path: str, names=()):
+        self._db = _connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        for name in names:
+            self._db.execute("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", (name,))
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, amount),
+            )
+
+    def value(self, name: str) -> int:
+        return self.values().get(name, 0)
+
+    def values(self, names: Optional[list] = None) -> dict:
+        with self._lock:
+            rows = self._db.execute("SELECT name, value FROM counters").fetchall()
+        result = dict(rows)
+        return {name: result.get(name, 0) for name in names} if names is not None else result
@@ -0,0 +1,409 @@
+"""
+Outbound SMS, sent by background workers instead of inside the request.
+
+/request_code used to call Twilio inline, so every login waited on Twilio's
+API, and a burst of sign-ups (a school registering a class at once) queued
+up behind it. Now the route saves the code, calls SmsQueue.send(), and
+returns. The message is delivered from here:
+
+  workers         – a small thread pool. Each wake-up a worker claims a
+                    batch of ready messages in one pass over the queue: its
+                    share of what is waiting, at most `batch_size`.
+  per destination – at most one queued message per phone. Asking for a code
+                    again before the first SMS went out replaces its text
+                    (the old code is no longer valid anyway), and a phone
+                    gets at most one SMS every `min_interval` seconds.
+  retries         – 429, 5xx and network errors are retried with exponential
+                    backoff and jitter, honouring Retry-After. Other errors
+                    (e.g. an invalid number) fail at once. A message is
+                    dropped as "expired" once the code it carries has run out.
+  status          – on_status(phone, status) is called for every change
+                    (queued / retrying / sent / failed / expired). The app
+                    stores it on the phone record.
+
+Senders:
+
+  TwilioSender    – Twilio's messages.create. The twilio package is imported
+                    and the client built on the first send (or warm()).
+                    TwilioRestException has no headers, so the HTTP client
+                    keeps each thread's last response for Retry-After.
+  FakeSmsSender   – records messages in memory (optionally appending them to
+                    a JSONL outbox file) with optional latency and failures
+                    (optionally with a Retry-After), for tests and benchmarks.
+
+Select with SMS_BACKEND=twilio|fake|none. The default is twilio when its
+credentials are set, and none otherwise.
+"""
+import atexit
+import email.utils
+import heapq
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+import metrics
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class SmsSendError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None,
+                 retryable: bool = True):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.retryable = retryable
+
+
+@dataclass(slots=True)
+class SmsMessage:
+    to: str
+    body: str
+    expires_at: Optional[float] = None  # epoch seconds; not worth sending after this
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    ready_at: float = 0.0  # monotonic
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Seconds from a Retry-After header (delay-seconds or an HTTP date), None if absent or unreadable."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# ---------------------------------------------------
+# SENDERS
+# ---------------------------------------------------
+class TwilioSender:
+    def __init__(self, sid: str, token: str, from_: str):
+        self.sid = sid
+        self.from_ = from_
+        self._token = token
+        self._client = None
+        self._lock = threading.Lock()
+        self._responses = threading.local()  # .last: this thread's last Twilio response
+
+    def warm(self) -> None:
+        self.client()
+
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.http.http_client import TwilioHttpClient
+                    from twilio.rest import Client
+
+                    responses = self._responses
+
+                    class RecordingHttpClient(TwilioHttpClient):
+                        def request(self, *args, **kwargs):
+                            responses.last = None
+                            responses.last = super().request(*args, **kwargs)
+                            return responses.last
+
+                    self._client = Client(self.sid, self._token, http_client=RecordingHttpClient())
+        return self._client
+
+    def send(self, to: str, body: str) -> str:
+        """The provider's message id. Raises SmsSendError."""
+        from twilio.base.exceptions import TwilioRestException
+
+        try:
+            with metrics.track("twilio", "messages.create"):
+                message = self.client().messages.create(body=body, from_=self.from_, to=to)
+        except TwilioRestException as e:
+            response = getattr(self._responses, "last", None)
+            headers = getattr(response, "headers", None) or {}
+            raise SmsSendError(str(e), status=e.status, retry_after=parse_retry_after(headers.get("Retry-After")),
+                               retryable=e.status in RETRYABLE_STATUS) from e
+        except Exception as e:
+            # Connection resets, timeouts, ...
+            raise SmsSendError(str(e)) from e
+        return message.sid
+
+
+class FakeSmsSender:
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, failure_status: int = 503,
+                 outbox_path: Optional[str] = None, seed: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.retry_after = retry_after  # sent with failures, like Twilio's 429 Retry-After
+        self.outbox_path = outbox_path
+        self.sent = []  # [{"sid", "to", "body", "sent_at"}]
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FakeSmsSender":
+        seed = os.getenv("SMS_FAKE_SEED")
+        return cls(
+            latency=float(os.getenv("SMS_FAKE_LATENCY", "0")),
+            failure_rate=float(os.getenv("SMS_FAKE_FAILURE_RATE", "0")),
+            failure_status=int(os.getenv("SMS_FAKE_FAILURE_STATUS", "503")),
+            outbox_path=os.getenv("SMS_FAKE_OUTBOX") or None,
+            seed=int(seed) if seed else None,
+            retry_after=parse_retry_after(os.getenv("SMS_FAKE_RETRY_AFTER")),
+        )
+
+    def send(self, to: str, body: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.failure_rate:
+                self.failures += 1
+                raise SmsSendError(f"fake SMS failure ({self.failure_status})", status=self.failure_status,
+                                   retry_after=self.retry_after, retryable=self.failure_status in RETRYABLE_STATUS)
+            record = {"sid": "SM" + uuid.uuid4().hex, "to": to, "body": body,
+                      "sent_at": datetime.now(timezone.utc).isoformat()}
+            self.sent.append(record)
+            if self.outbox_path:
+                with open(self.outbox_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record["sid"]
+
+    def messages_to(self, phone: str) -> list:
+        with self._lock:
+            return [record for record in self.sent if record["to"] == phone]
+
+
+def make_sms_sender(twilio_sid: Optional[str] = None, twilio_token: Optional[str] = None,
+                    from_: Optional[str] = None):
+    """A sender from SMS_BACKEND, or None when SMS is off (codes are only returned in JSON)."""
+    has_twilio = bool(twilio_sid and twilio_token and from_)
+    backend = os.getenv("SMS_BACKEND", "twilio" if has_twilio else "none").lower()
+    if backend == "fake":
+        return FakeSmsSender.from_env()
+    if backend == "twilio":
+        if not has_twilio:
+            raise RuntimeError("SMS_BACKEND=twilio needs TWILIO_SID, TWILIO_TOKEN and TWILIO_FROM")
+        return TwilioSender(twilio_sid, twilio_token, from_)
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown SMS_BACKEND: {backend}")
+
+
+# ---------------------------------------------------
+# QUEUE
+# ---------------------------------------------------
+class SmsQueue:
+    def __init__(
+        self,
+        sender,
+        on_status: Optional[Callable[[str, dict], None]] = None,
+        workers: int = 4,
+        batch_size: int = 10,
+        min_interval: float = 15.0,
+        max_attempts: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.sender = sender
+        self.on_status = on_status
+        self.workers = workers
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._heap = []  # [(ready_at, seq, phone)]; stale entries are skipped
+        self._pending = {}  # {phone: SmsMessage} waiting to be sent
+        self._sending = set()  # phones a worker is sending to right now
+        self._last_sent = {}  # {phone: monotonic time of the last delivered SMS}
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._counters = {
+            "queued": 0, "superseded": 0, "sent": 0, "retried": 0, "failed": 0, "expired": 0,
+            "rate_limited": 0, "status_errors": 0,
+        }
+        self._random = random.Random()
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"sms-worker-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.close)
+
+    def send(self, to: str, body: str, expires_at: Optional[float] = None) -> SmsMessage:
+        """Queue an SMS and return at once. Replaces a message to `to` that hasn't gone out yet."""
+        with self._cond:
+            message = self._pending.get(to)
+            if message is not None:
+                message.body, message.expires_at = body, expires_at
+                self._counters["superseded"] += 1
+                return message
+            message = self._pending[to] = SmsMessage(to=to, body=body, expires_at=expires_at)
+            message.ready_at = time.monotonic()
+            self._push(message)
+            self._counters["queued"] += 1
+            self._cond.notify()
+        return message
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """Wait until nothing is queued or being sent. False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._sending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, 0.05))
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the workers after trying to send what is queued for up to `timeout` seconds."""
+        if self._stopped:
+            return
+        self.drain(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+    def stats(self) -> dict:
+        with self._cond:
+            result = dict(self._counters)
+            result["pending"] = len(self._pending)
+            result["sending"] = len(self._sending)
+        return result
+
+    # ---------------------------------------------------
+    # WORKERS
+    # ---------------------------------------------------
+    def _push(self, message):
+        self._seq += 1
+        heapq.heappush(self._heap, (message.ready_at, self._seq, message.to))
+
+    def _run(self):
+        while True:
+            batch = self._claim_batch()
+            if batch is None:
+                return
+            for message in batch:
+                self._deliver(message)
+
+    def _claim_batch(self):
+        """Up to batch_size messages that may be sent now; None once stopped."""
+        with self._cond:
+            while True:
+                if self._stopped:
+                    return None
+                now = time.monotonic()
+                # Leave the other workers their share of a burst
+                limit = min(self.batch_size, max(1, len(self._pending) // self.workers))
+                batch = []
+                while self._heap and self._heap[0][0] <= now and len(batch) < limit:
+                    ready_at, _, phone = heapq.heappop(self._heap)
+                    message = self._pending.get(phone)
+                    if message is None or message.ready_at != ready_at:
+                        continue
+                    if phone in self._sending:
+                        # Another worker is still on this phone; look again shortly
+                        message.ready_at = now + 0.1
+                        self._push(message)
+                        continue
+                    allowed_at = self._last_sent.get(phone, float("-inf")) + self.min_interval
+                    if allowed_at > now:
+                        message.ready_at = allowed_at
+                        self._push(message)
+                        self._counters["rate_limited"] += 1
+                        continue
+                    del self._pending[phone]
+                    self._sending.add(phone)
+                    batch.append(message)
+                if batch:
+                    return batch
+                timeout = self._heap[0][0] - now if self._heap else 1.0
+                self._cond.wait(max(0.001, min(timeout, 1.0)))
+
+    def _deliver(self, message):
+        if message.expires_at is not None and time.time() > message.expires_at:
+            self._finish(message, "expired")
+            return
+
+        message.attempts += 1
+        try:
+            sid = self.sender.send(message.to, message.body)
+        except SmsSendError as e:
+            if e.retryable and message.attempts < self.max_attempts:
+                self._retry(message, e)
+            else:
+                self._finish(message, "failed", error=str(e))
+            return
+        except Exception as e:
+            self._finish(message, "failed", error=str(e))
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            self._last_sent[message.to] = now
+            if len(self._last_sent) > 10000:
+                self._last_sent = {
+                    phone: at for phone, at in self._last_sent.items() if now - at < self.min_interval
+                }
+        self._finish(message, "sent", sid=sid)
+
+    def _retry(self, message, error):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (message.attempts - 1))
+        delay = max(error.retry_after or 0.0, delay * (0.5 + self._random.random()))
+        with self._cond:
+            self._sending.discard(message.to)
+            self._counters["retried"] += 1
+            if message.to in self._pending:
+                # A newer message to this phone was queued meanwhile; it replaces this one
+                self._counters["superseded"] += 1
+                self._cond.notify_all()
+                return
+            message.ready_at = time.monotonic() + delay
+            self._pending[message.to] = message
+            self._push(message)
+            self._cond.notify_all()
+        self._report(message, "retrying", error=str(error))
+
+    def _finish(self, message, status, **extra):
+        with self._cond:
+            self._sending.discard(message.to)
+            self._counters[status] += 1
+            self._cond.notify_all()
+        self._report(message, status, **extra)
+
+    def _report(self, message, status, **extra):
+        if self.on_status is None:
+            return
+        update = {
+            "status": status,
+            "message_id": message.id,
+            "attempts": message.attempts,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        update.update({key: value for key, value in extra.items() if value is not None})
+        try:
+            self.on_status(message.to, update)
+        except Exception:
+            # A lost status write must not stop the worker
+            with self._cond:
+                self._counters["status_errors"] += 1
@@ -0,0 +1,521 @@
+"""
+Speech for voice mode: speech to text (/transcribe) and text to speech (/speak).
+
+Voice mode used the browser's SpeechRecognition and speechSynthesis. Many
+of our users' phones don't have them, and where they exist isiZulu and
+isiXhosa are barely supported. The phone now records audio and sends it
+here, and plays the audio /speak streams back.
+
+Engines, chosen with STT_BACKEND and TTS_BACKEND (openai | local). Both
+default to local when LLM_BACKEND=stub and to openai otherwise:
+
+  OpenAITranscriber  – OpenAI's transcription API (STT_MODEL).
+  OpenAISynthesizer  – OpenAI's speech API (TTS_MODEL, TTS_VOICE), as MP3
+                       streamed while it is generated.
+  LocalSynthesizer   – offline and dependency-free, for tests, benchmarks
+                       and keyless development: a WAV with one tone per word,
+                       produced sentence by sentence. The text goes into the
+                       file's INFO chunk. TTS_LOCAL_LATENCY is the delay per
+                       sentence, to behave like a real engine.
+  LocalTranscriber   – offline: reads that INFO chunk back, so the local
+                       engines round-trip; any other audio gets a fixed phrase
+                       in the requested language. STT_LOCAL_LATENCY per call.
+
+AudioCache keeps synthesised audio by SHA-256 of (engine, voice, language,
+text). It has a byte-bounded in-memory LRU, plus an optional folder that all
+workers share (AUDIO_CACHE_DIR). Prompts that repeat, such as interview
+questions, are synthesised once.
+
+TranscriptionUploads collects the chunks of one recording in a file under
+data/. A phone can send audio while the user is still talking, and any
+worker can take the next chunk.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+LANGUAGE_NAMES = {
+    "en": "English", "af": "Afrikaans", "zu": "isiZulu", "xh": "isiXhosa", "st": "Sesotho",
+    "tn": "Setswana", "nso": "Sepedi", "ts": "Xitsonga", "ve": "Tshivenda", "ss": "siSwati",
+    "nr": "isiNdebele",
+}
+
+
+class SpeechError(RuntimeError):
+    """A failed transcription or synthesis. status_code mirrors the upstream HTTP status."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass(slots=True)
+class Transcript:
+    text: str
+    language: str
+    engine: str
+
+
+def normalise_text(text: str) -> str:
+    """What is spoken: surrounding and repeated whitespace don't change the audio, so they don't change the key."""
+    return " ".join(text.split())
+
+
+_openai = None
+_openai_lock = threading.Lock()
+
+
+def _openai_client():
+    global _openai
+    if _openai is None:
+        with _openai_lock:
+            if _openai is None:
+                from openai import OpenAI
+
+                _openai = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai
+
+
+# ---------------------------------------------------
+# SPEECH TO TEXT
+# ---------------------------------------------------
+class OpenAITranscriber:
+    name = "openai"
+    # Languages the API accepts as a hint; for the rest it detects the language
+    hinted_languages = {"en", "af"}
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or os.getenv("STT_MODEL", "gpt-4o-mini-transcribe")
+
+    def transcribe(self, audio, language: str = "en", content_type: str = "audio/webm") -> Transcript:
+        """`audio` is a binary file object."""
+        options = {"language": language} if language in self.hinted_languages else {}
+        extension = content_type.split("/")[-1].split(";")[0] or "webm"
+        try:
+            result = _openai_client().audio.transcriptions.create(
+                model=self.model, file=(f"audio.{extension}", audio, content_type), **options,
+            )
+        except Exception as e:
+            raise SpeechError(f"Transcription failed: {e}", getattr(e, "status_code", None)) from e
+        return Transcript(result.text.strip(), language, self.name)
+
+    def warm(self) -> None:
+        _openai_client()
+
+
+class LocalTranscriber:
+    name = "local"
+    FALLBACK = {
+        "en": "I am looking for work near my home",
+        "af": "Ek soek werk naby my huis",
+        "zu": "Ngifuna umsebenzi eduze kwasekhaya",
+        "xh": "Ndifuna umsebenzi kufutshane nekhaya",
+        "st": "Ke batla mosebetsi haufi le hae",
+    }
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def transcribe(self, audio, language: str = "en", content_type: str = "audio/wav") -> Transcript:
+        if self.latency:
+            time.sleep(self.latency)
+        info = read_wav_info(audio.read())
+        if info and info.get("text"):
+            return Transcript(info["text"], info.get("language") or language, self.name)
+        return Transcript(self.FALLBACK.get(language, self.FALLBACK["en"]), language, self.name)
+
+    def warm(self) -> None:
+        pass
+
+
+def make_transcriber():
+    """The engine selected by STT_BACKEND (openai | local)."""
+    backend = os.getenv("STT_BACKEND", _default_backend()).lower()
+    if backend == "local":
+        return LocalTranscriber(latency=float(os.getenv("STT_LOCAL_LATENCY", "0")))
+    if backend == "openai":
+        return OpenAITranscriber()
+    raise ValueError(f"Unknown STT_BACKEND: {backend}")
+
+
+# ---------------------------------------------------
+# TEXT TO SPEECH
+# ---------------------------------------------------
+class OpenAISynthesizer:
+    name = "openai"
+    content_type = "audio/mpeg"
+
+    def __init__(self, model: Optional[str] = None, default_voice: Optional[str] = None):
+        self.model = model or os.getenv("TTS_MODEL", "gpt-4o-mini-tts")
+        self.default_voice = default_voice or os.getenv("TTS_VOICE", "coral")
+        self.engine_id = f"openai/{self.model}"  # part of the cache key
+
+    def stream(self, text: str, language: str = "en", voice: Optional[str] = None) -> Iterator[bytes]:
+        options = {}
+        if self.model.startswith("gpt-4o"):
+            options["instructions"] = (
+                f"Speak {LANGUAGE_NAMES.get(language, 'English')} clearly and warmly, "
+                "with a South African accent."
+            )
+        try:
+            with _openai_client().audio.speech.with_streaming_response.create(
+                model=self.model, voice=voice or self.default_voice, input=text, response_format="mp3", **options,
+            ) as response:
+                yield from response.iter_bytes(8192)
+        except Exception as e:
+            raise SpeechError(f"Speech synthesis failed: {e}", getattr(e, "status_code", None)) from e
+
+    def finalise(self, audio: bytes) -> bytes:
+        return audio
+
+    def warm(self) -> None:
+        _openai_client()
+
+
+class LocalSynthesizer:
+    name = "local"
+    content_type = "audio/wav"
+    sample_rate = 16000
+    voices = {"default": 180.0, "low": 120.0, "high": 240.0}  # base pitch, Hz
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.default_voice = "default"
+        self.engine_id = f"local/{self.sample_rate}"
+
+    def stream(self, text: str, language: str = "en", voice: Optional[str] = None) -> Iterator[bytes]:
+        voice = voice or self.default_voice
+        if voice not in self.voices:
+            raise SpeechError(f"Unknown voice: {voice}", 400)
+        # Sizes are unknown until the end; players accept the maximum for streamed WAV
+        yield _wav_header(self.sample_rate, 0xFFFFFFFF, {"text": text, "language": language, "voice": voice})
+        for sentence in re.split(r"(?<=[.!?])\s+", text):
+            if self.latency:
+                time.sleep(self.latency)
+            yield self._sentence(sentence, self.voices[voice])
+
+    def finalise(self, audio: bytes) -> bytes:
+        """The streamed WAV with its real sizes, for the cache."""
+        return _fix_wav_sizes(audio)
+
+    def warm(self) -> None:
+        pass
+
+    def _sentence(self, sentence, base_pitch):
+        rate = self.sample_rate
+        samples = array("h")
+        for word in sentence.split():
+            pitch = base_pitch + int(hashlib.md5(word.lower().encode("utf-8")).hexdigest()[:2], 16) % 80
+            count = int(rate * min(0.5, 0.05 + 0.045 * len(word)))
+            step = 2 * math.pi * pitch / rate
+            fade = max(1, rate // 200)
+            samples.extend(
+                int(8000 * math.sin(step * i) * min(1.0, i / fade, (count - i) / fade)) for i in range(count)
+            )
+            samples.extend([0] * (rate // 12))
+        samples.extend([0] * (rate // 4))
+        if struct.pack("=h", 1) != struct.pack("<h", 1):
+            samples.byteswap()
+        return samples.tobytes()
+
+
+def make_synthesizer():
+    """The engine selected by TTS_BACKEND (openai | local)."""
+    backend = os.getenv("TTS_BACKEND", _default_backend()).lower()
+    if backend == "local":
+        return LocalSynthesizer(latency=float(os.getenv("TTS_LOCAL_LATENCY", "0")))
+    if backend == "openai":
+        return OpenAISynthesizer()
+    raise ValueError(f"Unknown TTS_BACKEND: {backend}")
+
+
+def _default_backend():
+    return "local" if os.getenv("LLM_BACKEND", "openai").lower() == "stub" else "openai"
+
+
+# ---------------------------------------------------
+# WAV
+# ---------------------------------------------------
+def _wav_header(sample_rate, data_size, info):
+    comment = json.dumps(info, ensure_ascii=False).encode("utf-8")
+    comment += b"\0" * (2 - len(comment) % 2)  # NUL-terminated, padded to an even size
+    info_chunk = b"INFO" + b"ICMT" + struct.pack("<I", len(comment)) + comment
+    fmt = struct.pack("<HHIIHH", 1, 1, sample_rate, sample_rate * 2, 2, 16)
+    riff_size = 0xFFFFFFFF if data_size == 0xFFFFFFFF else 4 + 8 + len(fmt) + 8 + len(info_chunk) + 8 + data_size
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"LIST" + struct.pack("<I", len(info_chunk)) + info_chunk
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+def _chunks(wav):
+    """(chunk id, offset of its size field, data) for each top-level RIFF chunk."""
+    position = 12
+    while position + 8 <= len(wav):
+        chunk_id, size = wav[position:position + 4], struct.unpack("<I", wav[position + 4:position + 8])[0]
+        if chunk_id == b"data":
+            size = min(size, len(wav) - position - 8)
+        yield chunk_id, position + 4, wav[position + 8:position + 8 + size]
+        position += 8 + size + size % 2
+
+
+def _fix_wav_sizes(wav):
+    if wav[:4] != b"RIFF" or wav[8:12] != b"WAVE":
+        return wav
+    fixed = bytearray(wav)
+    fixed[4:8] = struct.pack("<I", len(wav) - 8)
+    for chunk_id, size_at, data in _chunks(wav):
+        if chunk_id == b"data":
+            fixed[size_at:size_at + 4] = struct.pack("<I", len(data))
+    return bytes(fixed)
+
+
+def read_wav_info(wav: bytes) -> Optional[dict]:
+    """The JSON LocalSynthesizer put in the INFO comment, or None."""
+    if wav[:4] != b"RIFF" or wav[8:12] != b"WAVE":
+        return None
+    for chunk_id, _, data in _chunks(wav):
+        if chunk_id == b"LIST" and data[:4] == b"INFO" and data[4:8] == b"ICMT":
+            try:
+                return json.loads(data[12:].rstrip(b"\0").decode("utf-8"))
+            except ValueError:
+                return None
+    return None
+
+
+# ---------------------------------------------------
+# AUDIO CACHE
+# ---------------------------------------------------
+class AudioCache:
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, directory: Optional[str] = None,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()  # {key: audio bytes}
+        self._bytes = 0
+        self._disk_bytes = None  # summed on the first write
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(engine: str, voice: str, language: str, text: str) -> str:
+        blob = json.dumps([engine, voice, language, normalise_text(text)], ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return audio
+        audio = self._read_disk(key)
+        with self._lock:
+            if audio is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._remember(key, audio)
+        return audio
+
+    def set(self, key: str, audio: bytes) -> None:
+        with self._lock:
+            self._counters["stores"] += 1
+            self._remember(key, audio)
+        self._write_disk(key, audio)
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = dict(self._counters)
+            result["entries"] = len(self._memory)
+            result["bytes"] = self._bytes
+        return result
+
+    def _remember(self, key, audio):
+        if len(audio) > self.max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._memory[key] = audio
+        self._bytes += len(audio)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._counters["evictions"] += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)  # recently used: pruned last
+        except OSError:
+            return None
+        return audio
+
+    def _write_disk(self, key, audio):
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(audio)
+        os.replace(temp, path)
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(audio)
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._prune_disk()
+
+    def _disk_files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _prune_disk(self):
+        """Delete the least recently used files down to 80% of max_disk_bytes."""
+        files = sorted(self._disk_files(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in files)
+        for path, size, _ in files:
+            if total <= self.max_disk_bytes * 0.8:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+
+# ---------------------------------------------------
+# CHUNKED UPLOADS FOR /transcribe
+# ---------------------------------------------------
+class UploadError(ValueError):
+    def __init__(self, message: str, status_code: int = 400, expected_seq: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.expected_seq = expected_seq
+
+
+class TranscriptionUploads:
+    """
+    One recording sent as numbered chunks (seq 0, 1, 2, ...). A chunk sent
+    twice (a retry) is acknowledged and ignored; a gap is a 409 that names
+    the chunk expected next. Uploads untouched for `ttl_seconds` are deleted.
+    """
+
+    _ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+    def __init__(self, directory: str, max_bytes: int = 25 * 1024 * 1024, ttl_seconds: int = 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._last_cleanup = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, upload_id: str, seq: int, stream, content_type: Optional[str] = None) -> dict:
+        """Add chunk `seq`; returns the upload's state {"seq", "bytes", "content_type"}."""
+        if not self._ID.match(upload_id or ""):
+            raise UploadError("upload_id must be 8-64 letters, digits, '-' or '_'")
+        self._cleanup()
+        state_path, audio_path = self._paths(upload_id)
+        state = self._state(state_path) or {"seq": -1, "bytes": 0, "content_type": content_type}
+        if seq <= state["seq"]:
+            return state  # a retry of a chunk we already have
+        if seq != state["seq"] + 1:
+            raise UploadError(f"Expected chunk {state['seq'] + 1}", 409, expected_seq=state["seq"] + 1)
+
+        written = 0
+        with open(audio_path, "ab") as f:
+            f.truncate(state["bytes"])  # drop the tail of a chunk that failed half way
+            while True:
+                block = stream.read(64 * 1024)
+                if not block:
+                    break
+                written += len(block)
+                if state["bytes"] + written > self.max_bytes:
+                    f.truncate(state["bytes"])
+                    raise UploadError(f"Recording is larger than {self.max_bytes} bytes", 413)
+                f.write(block)
+        state = {"seq": seq, "bytes": state["bytes"] + written,
+                 "content_type": state.get("content_type") or content_type}
+        self._save_state(state_path, state)
+        return state
+
+    def open(self, upload_id: str):
+        """(binary file object, state) of a finished upload."""
+        state_path, audio_path = self._paths(upload_id)
+        state = self._state(state_path)
+        if state is None:
+            raise UploadError("Unknown upload_id", 404)
+        return open(audio_path, "rb"), state
+
+    def discard(self, upload_id: str) -> None:
+        for path in self._paths(upload_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _paths(self, upload_id):
+        base = os.path.join(self.directory, upload_id)
+        return base + ".json", base + ".audio"
+
+    @staticmethod
+    def _state(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_state(path, state):
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp, path)
+
+    def _cleanup(self):
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl_seconds:
+                    os.remove(path)
+            except OSError:
+                pass
+
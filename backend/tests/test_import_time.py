@@ -0,0 +1,25 @@
+"""
+Startup budget: `import app` must stay fast and must not load the heavy
+clients, which are created on first use or by the background warm-up.
+Uses the same measurement as benchmarks/bench_import_time.py.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from bench_import_time import LAZY_MODULES, import_times  # noqa: E402
+
+BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "500"))
+RUNS = 3
+
+
+def test_import_app_within_budget(tmp_path):
+    # Fastest of a few fresh processes, so a busy machine does not fail the test
+    runs = [import_times(str(tmp_path)) for _ in range(RUNS)]
+    times, loaded = min(runs, key=lambda run: run[0]["app"][0])
+
+    total_ms = times["app"][0] / 1000
+    assert total_ms <= BUDGET_MS, f"import app took {total_ms:.0f} ms, budget {BUDGET_MS:.0f} ms"
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    assert not eager, f"imported at startup, should load on first use: {eager}"
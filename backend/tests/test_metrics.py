@@ -0,0 +1,36 @@
+import threading
+
+from metrics import Registry
+
+
+def test_shards_of_exited_threads_are_folded_in():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Calls.", ("route",))
+    seconds = registry.histogram("call_seconds", "Call time.", buckets=(0.1, 1))
+
+    def work():
+        calls.inc(route="/chat")
+        seconds.observe(0.5)
+
+    for _ in range(50):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    calls.inc(route="/chat")
+
+    assert calls.value(route="/chat") == 51
+    assert registry._merged()[("call_seconds", ())] == [0, 50, 0, 25.0]
+    # Only this thread's shard is left
+    assert len(registry._shards) == 1
+
+
+def test_histogram_quantile_from_buckets():
+    latency = Registry().histogram("latency_seconds", "Latency.", ("model",), buckets=(1, 2, 4))
+    assert latency.quantile(0.95, model="writer") is None
+
+    for seconds in [0.5] * 50 + [1.5] * 40 + [3] * 10:
+        latency.observe(seconds, model="writer")
+
+    assert latency.quantile(0.5, model="writer") == 1.0
+    assert latency.quantile(0.95, model="writer") == 3.0  # halfway through (2, 4]
+    assert latency.snapshot(model="writer")["count"] == 100
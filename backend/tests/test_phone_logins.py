@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from database.local_rtdb import LocalDatabase
+from database.phone_logins import InvalidCode, PhoneLogins
+
+PHONE = "+27821234567"
+
+
+def race(workers, phone, code, racers):
+    """Verify the same code from `racers` threads at once; (records, rejected count)."""
+    barrier = threading.Barrier(racers)
+    results, rejected, errors = [], [], []
+
+    def attempt(logins):
+        barrier.wait()
+        try:
+            results.append(logins.verify(phone, code))
+        except InvalidCode:
+            rejected.append(1)
+        except Exception as e:  # anything else is a bug
+            errors.append(e)
+
+    threads = [threading.Thread(target=attempt, args=(workers[i % len(workers)],)) for i in range(racers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    return results, len(rejected)
+
+
+def totals(workers, name):
+    return sum(logins.stats()[name] for logins in workers)
+
+
+@pytest.fixture
+def db():
+    # A small delay per call so the racing threads really interleave
+    return LocalDatabase(latency=0.002)
+
+
+@pytest.mark.parametrize("racers", [2, 16])
+def test_concurrent_verify_redeems_code_once(db, racers):
+    # Separate instances have separate ETag caches, like worker processes
+    workers = [PhoneLogins(db) for _ in range(4)]
+    workers[0].store_code(PHONE, "123456", time.time() + 300)
+
+    results, rejected = race(workers, PHONE, "123456", racers)
+
+    assert len(results) == 1
+    assert rejected == racers - 1
+    record, new_user = results[0]
+    assert new_user
+    assert totals(workers, "logins") == 1
+    assert totals(workers, "new_users") == 1
+    assert totals(workers, "rejected") == racers - 1
+    stored = db.reference(f"phone_numbers/{PHONE}").get()
+    assert "login_code" not in stored
+    assert stored["profile_id"] == record["profile_id"]
+
+
+def test_concurrent_verify_keeps_existing_profile(db):
+    workers = [PhoneLogins(db) for _ in range(4)]
+    workers[0].store_code(PHONE, "111111", time.time() + 300)
+    first, _ = workers[0].verify(PHONE, "111111")
+    workers[1].store_code(PHONE, "222222", time.time() + 300)
+
+    results, rejected = race(workers, PHONE, "222222", 12)
+
+    assert len(results) == 1 and rejected == 11
+    record, new_user = results[0]
+    assert not new_user
+    assert record["profile_id"] == first["profile_id"]
+    assert totals(workers, "logins") == 2
+    assert totals(workers, "new_users") == 1
+
+
+def test_wrong_or_expired_code_writes_nothing(db):
+    logins = PhoneLogins(db)
+    logins.store_code(PHONE, "123456", time.time() + 300)
+    before = db.reference(f"phone_numbers/{PHONE}").get()
+
+    with pytest.raises(InvalidCode):
+        logins.verify(PHONE, "654321")
+    with pytest.raises(InvalidCode):
+        logins.verify(PHONE, "123456", now=time.time() + 301)
+
+    assert db.reference(f"phone_numbers/{PHONE}").get() == before
+    assert logins.stats()["rejected"] == 2
+    assert logins.stats()["logins"] == 0
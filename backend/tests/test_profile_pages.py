@@ -0,0 +1,131 @@
+import os
+import random
+
+import pytest
+
+os.environ.setdefault("DATABASE_BACKEND", "local")
+
+from database import database  # noqa: E402
+from database.local_rtdb import LocalDatabase, _order_rank  # noqa: E402
+
+STAMPS = [f"2025-11-0{day}T08:00:00" for day in range(1, 6)]
+
+
+@pytest.fixture
+def profiles(monkeypatch):
+    """A local database with many rows lacking cv_generated_at and heavy ties on the rest."""
+    db = LocalDatabase()
+    monkeypatch.setattr(database, "db", db)
+    rng = random.Random(7)
+    records = {}
+    for i in rng.sample(range(1000), 400):
+        record = {"profile": {"name": f"user {i}"}, "created_at": rng.choice(STAMPS)}
+        if rng.random() < 0.4:
+            record["cv_generated_at"] = rng.choice(STAMPS)
+        records[f"p{i:04d}"] = record
+    db.reference("profiles").set(records)
+    return records
+
+
+def expected_order(records, order_by):
+    def sort_key(item):
+        key, record = item
+        return (_order_rank(database._order_value(order_by, key, record)), key)
+    return [key for key, _ in sorted(records.items(), key=sort_key)]
+
+
+@pytest.mark.parametrize("order_by", database.PROFILE_ORDERS)
+@pytest.mark.parametrize("page_size", [2, 7, 64, 1000])
+def test_pages_return_every_row_once_in_order(profiles, order_by, page_size):
+    keys = [key for key, _ in database.iter_profiles(page_size, order_by)]
+
+    assert keys == expected_order(profiles, order_by)
+
+
+def test_cursor_resumes_inside_the_null_group(profiles):
+    page, cursor = database.get_profiles_page(5, "cv_generated_at")
+    assert all("cv_generated_at" not in record for record in page.values())
+    assert database.decode_cursor(cursor)[1] is None
+
+    rest, _ = database.get_profiles_page(1000, "cv_generated_at", cursor)
+
+    assert list(page) + list(rest) == expected_order(profiles, "cv_generated_at")
+
+
+def test_bounds_skip_rows_without_a_value(profiles):
+    keys = [key for key, _ in database.iter_profiles(9, "cv_generated_at", start_at=STAMPS[1], end_at=STAMPS[3])]
+
+    expected = [
+        key for key in expected_order(profiles, "cv_generated_at")
+        if STAMPS[1] <= (profiles[key].get("cv_generated_at") or "") <= STAMPS[3]
+    ]
+    assert keys == expected
+
+
+def test_rows_without_a_value_are_read_a_bounded_number_of_times(profiles, monkeypatch):
+    # Distinct values after the null group, so ties don't add re-reads
+    for n, (key, record) in enumerate(sorted(profiles.items())):
+        if "cv_generated_at" in record:
+            database.db.reference(f"profiles/{key}/cv_generated_at").set(f"2025-12-01T00:00:{n:04d}")
+    rows_read = []
+    query = database._profile_query
+
+    def counting_query(*args):
+        rows = query(*args)
+        rows_read.append(len(rows))
+        return rows
+
+    monkeypatch.setattr(database, "_profile_query", counting_query)
+    page_size = 10
+    count = sum(1 for _ in database.iter_profiles(page_size, "cv_generated_at"))
+
+    assert count == len(profiles)
+    # Each page scans on from where the last one stopped, so the whole export
+    # reads about one pass over the null group in key order plus the rest once
+    assert sum(rows_read) <= 2 * len(profiles)
+
+
+def pages_read(order_by, page_size, monkeypatch):
+    """Rows each get_profiles_page call reads, over a whole iteration."""
+    per_page, rows_read = [], []
+    query = database._profile_query
+
+    def counting_query(*args):
+        rows = query(*args)
+        rows_read.append(len(rows))
+        return rows
+
+    monkeypatch.setattr(database, "_profile_query", counting_query)
+    cursor = None
+    while True:
+        rows_read.clear()
+        _, cursor = database.get_profiles_page(page_size, order_by, cursor)
+        per_page.append(sum(rows_read))
+        if cursor is None:
+            return per_page
+
+
+@pytest.mark.parametrize("without_value", [5, 60])
+def test_each_page_reads_a_bounded_number_of_rows(monkeypatch, without_value):
+    # Nearly every profile has created_at; a few older ones don't
+    db = LocalDatabase()
+    monkeypatch.setattr(database, "db", db)
+    rng = random.Random(3)
+    total = 2000
+    missing = set(rng.sample(range(total), without_value))
+    db.reference("profiles").set({
+        f"p{i:05d}": {"profile": {}} if i in missing else {"profile": {}, "created_at": f"2025-11-01T{i:08d}"}
+        for i in range(total)
+    })
+    page_size = 20
+
+    per_page = pages_read("created_at", page_size, monkeypatch)
+
+    assert len(per_page) == total // page_size
+    # The first page reads the null group through the index, not the whole tree
+    assert per_page[0] <= 2 * (page_size + 1)
+    # Resumed pages inside the null group read at most a few pages in key order
+    # and then the group itself; past it, one page plus the row under the cursor
+    bound = database.NULL_SCAN_PAGES * (page_size + 1) + 2 * (without_value + page_size + 1)
+    assert max(per_page) <= bound < total
+    assert max(per_page[without_value // page_size + 1:]) <= page_size + 2
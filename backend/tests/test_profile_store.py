@@ -0,0 +1,71 @@
+import uuid
+
+import pytest
+
+from database.local_rtdb import LocalDatabase
+from database.phone_logins import PhoneLogins
+from database.profile_store import ProfileStore
+
+
+@pytest.fixture
+def db():
+    return LocalDatabase()
+
+
+@pytest.fixture
+def store(db):
+    # A long interval keeps the background thread out of the way; tests flush themselves
+    store = ProfileStore(db, flush_interval=60)
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("profile_id", ["a.b.c.d.e", "abc#defgh", "x$yyyyyyyy", "a[1]bbbbbb", "p/../other", "short", 12345678])
+def test_invalid_profile_id_is_not_queued(store, profile_id):
+    with pytest.raises(ValueError):
+        store.save_profile(profile_id, {"name": "x"})
+    assert store.get(profile_id) is None
+    assert store.stats()["pending_paths"] == 0
+
+
+def test_refused_path_does_not_block_other_writes(db, store):
+    good = [str(uuid.uuid4()) for _ in range(3)]
+    for profile_id in good:
+        store.save_profile(profile_id, {"name": profile_id})
+    # Slips past the id check but is refused by the database: an ancestor of
+    # another path in the same update
+    store._pending["profiles/" + good[0]] = {"overwrite": True}
+
+    assert store.flush() == (len(good) - 1) * 2
+    assert store.stats()["pending_paths"] == 0
+    assert store.stats()["dropped_paths"] == 3
+    for profile_id in good[1:]:
+        assert db.reference(f"profiles/{profile_id}/profile").get() == {"name": profile_id}
+
+    # Later writes go through as one update again
+    store.update_cv(good[1], "cv")
+    assert store.flush() == 2
+
+
+def test_batch_is_kept_while_database_is_down(db, store, monkeypatch):
+    profile_id = str(uuid.uuid4())
+    store.save_profile(profile_id, {"name": "x"})
+
+    def down(value):
+        raise ConnectionError("no route to host")
+
+    monkeypatch.setattr(type(db.reference("/")), "update", lambda self, value: down(value))
+    with pytest.raises(ConnectionError):
+        store.flush()
+    assert store.stats()["pending_paths"] == 2
+    monkeypatch.undo()
+    assert store.flush() == 2
+
+
+def test_issued_profile_ids(db):
+    logins = PhoneLogins(db)
+    logins.store_code("+27820000000", "123456", expires_at=4e9)
+    record, new_user = logins.verify("+27820000000", "123456", now=1.0)
+    assert new_user
+    assert logins.issued(record["profile_id"])
+    assert not logins.issued(str(uuid.uuid4()))
@@ -0,0 +1,63 @@
+import pytest
+
+import session_store
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path, clock):
+    if request.param == "memory":
+        return MemorySessionStore(idle_ttl=60)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), idle_ttl=60)
+
+
+def turn(text):
+    return {"role": "user", "content": text}
+
+
+def test_append_after_idle_ttl_starts_empty(store, clock):
+    store.append("s1", turn("old question"), {"role": "assistant", "content": "old answer"})
+    store.fold("s1", "old summary", 1)
+    clock.now += 61
+
+    store.append("s1", turn("new question"))
+
+    assert store.get("s1") == [turn("new question")]
+    assert store.get_summary("s1") is None
+
+
+def test_expired_session_is_gone(store, clock):
+    store.append("s1", turn("hello"))
+    store.fold("s1", "summary", 0)
+    clock.now += 61
+
+    assert store.get_summary("s1") is None
+    assert store.get("s1") == []
+    assert store.stats()["sessions"] == 0
+    assert store.stats()["evicted"] == 1
+
+
+def test_access_keeps_session_alive(store, clock):
+    store.append("s1", turn("hello"))
+    clock.now += 50
+    assert store.get("s1") == [turn("hello")]
+    clock.now += 50
+
+    store.append("s1", turn("again"))
+
+    assert store.get("s1") == [turn("hello"), turn("again")]
@@ -0,0 +1,26 @@
+import time
+
+from sms_queue import FakeSmsSender, SmsQueue, parse_retry_after
+
+
+def test_retry_waits_for_retry_after():
+    sender = FakeSmsSender(failure_rate=1.0, failure_status=429, retry_after=30)
+    queue = SmsQueue(sender, workers=1, backoff_base=0.01, backoff_max=0.01)
+    try:
+        message = queue.send("+27820000000", "code 123456")
+        deadline = time.monotonic() + 5
+        while sender.failures == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+
+        assert sender.failures == 1
+        assert message.ready_at - time.monotonic() > 25
+    finally:
+        queue.close(timeout=0.1)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0  # in the past
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
@@ -128,6 +128,63 @@ function setVoiceVisualState(state) {
   voiceOrbWrapper.classList.add(`state-${state}`);
 }
 
+// =======================
+// STREAMING HELPER (NDJSON)
+// =======================
+// Reads a chunked NDJSON response from the backend and calls onEvent for
+// every complete line, so text can be shown while the model is still writing.
+async function readNdjsonStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    let newlineIdx;
+    while ((newlineIdx = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, newlineIdx).trim();
+      buffer = buffer.slice(newlineIdx + 1);
+      if (line) onEvent(JSON.parse(line));
+    }
+  }
+
+  const rest = buffer.trim();
+  if (rest) onEvent(JSON.parse(rest));
+}
+
+// =======================
+// IDEMPOTENT POSTS
+// =======================
+// One Idempotency-Key per button press. If the connection drops before an
+// answer arrives, the same request is sent again with the same key, and the
+// backend returns the first call's result instead of making a second model call.
+async function postIdempotent(url, body, retries = 2) {
+  const key =
+    window.crypto && crypto.randomUUID
+      ? crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+  const options = {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "Idempotency-Key": key,
+    },
+    body: JSON.stringify(body),
+  };
+
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await fetch(url, options);
+    } catch (err) {
+      if (attempt >= retries) throw err;
+      await new Promise((resolve) => setTimeout(resolve, 500 * (attempt + 1)));
+    }
+  }
+}
+
 // =======================
 // STATE (TEXT CV)
 // =======================
@@ -145,6 +202,12 @@ let isListening = false;
 let lastTranscript = "";
 let voiceSessionId = null; // session_id from backend
 const VOICE_MODE = "cv"; // "cv" or "interview"
+// Browser speech recognition only works well for these; other languages, and
+// browsers without it, record audio and send it to the backend's /transcribe
+const BROWSER_STT_LANGUAGES = new Set(["en", "af"]);
+const TRANSCRIBE_CHUNK_MS = 1000; // audio is uploaded in chunks while the user talks
+let serverRecording = null; // { recorder, id, seq, sent, langCode } while recording
+let replyAudio = null; // the /speak reply currently playing
 
 // =======================
 // 1) CREATE PROFILE (TEXT INPUT)
@@ -165,15 +228,11 @@ if (btnCreateProfile) {
       const profileIdFromLogin = localStorage.getItem("spaniProfileId");
       const phoneFromLogin = localStorage.getItem("spaniUserPhone") || null;
 
-      const res = await fetch(`${BASE_URL}/build_profile`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          raw_text: text,
-          preferred_language: "en",
-          profile_id: profileIdFromLogin,   // optional – backend can ignore if None
-          phone: phoneFromLogin,           // optional – for name/email sync later
-        }),
+      const res = await postIdempotent(`${BASE_URL}/build_profile`, {
+        raw_text: text,
+        preferred_language: "en",
+        profile_id: profileIdFromLogin,   // optional – backend can ignore if None
+        phone: phoneFromLogin,           // optional – for name/email sync later
       });
 
       if (!res.ok) {
@@ -183,13 +242,8 @@ if (btnCreateProfile) {
       const data = await res.json();
       currentProfileId = data.profile_id || null;
 
-      // profile is JSON string from backend – try to parse it for nicer display
-      try {
-        currentProfile = data.profile ? JSON.parse(data.profile) : null;
-      } catch (e) {
-        console.warn("Could not parse profile JSON, keeping raw text.", e);
-        currentProfile = data.profile || null;
-      }
+      // profile arrives already parsed and validated by the backend
+      currentProfile = data.profile || null;
 
       profileOutputEl.textContent = JSON.stringify(
         {
@@ -230,22 +284,30 @@ if (btnGenerateCV) {
     cvOutputEl.textContent = "SpaniSami is building your CV...";
 
     try {
-      const res = await fetch(`${BASE_URL}/generate_cv`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          profile_id: currentProfileId,
-          profile: currentProfile,
-          target_role: targetRole,
-        }),
+      const res = await postIdempotent(`${BASE_URL}/generate_cv`, {
+        profile_id: currentProfileId,
+        profile: currentProfile,
+        target_role: targetRole,
+        stream: true,
       });
 
       if (!res.ok) {
         throw new Error(`Backend error: ${res.status}`);
       }
 
-      const data = await res.json();
-      currentCvText = data.cv || "";
+      // Show the CV as it is written instead of waiting for the full text
+      let streamedText = "";
+      await readNdjsonStream(res, (event) => {
+        if (event.type === "delta") {
+          streamedText += event.text;
+          cvOutputEl.textContent = streamedText;
+        } else if (event.type === "done") {
+          streamedText = event.cv;
+        } else if (event.type === "error") {
+          throw new Error(event.details || event.error);
+        }
+      });
+      currentCvText = streamedText || "";
 
       if (!currentCvText) {
         cvOutputEl.textContent = "No CV text returned from backend.";
@@ -270,29 +332,43 @@ if (btnGenerateCV) {
 // 3) DOWNLOAD AS PDF
 // =======================
 if (btnDownloadPdf) {
-  btnDownloadPdf.addEventListener("click", () => {
+  btnDownloadPdf.addEventListener("click", async () => {
     if (!currentCvText) {
       alert("Please generate a CV first.");
       return;
     }
 
-    if (!window.jspdf || !window.jspdf.jsPDF) {
-      alert("PDF library not loaded. Check your index.html <script> tags.");
-      return;
-    }
-
-    const { jsPDF } = window.jspdf;
-    const doc = new jsPDF({ unit: "pt", format: "a4" });
-
-    const margin = 40;
-    const maxWidth = 515; // page width (~595) - 2*margin
-    const lines = doc.splitTextToSize(currentCvText, maxWidth);
+    // Rendered on the server: quicker on low-end phones and the same on every device
+    btnDownloadPdf.disabled = true;
+    try {
+      const res = await fetch(`${BASE_URL}/cv_pdf`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          cv: currentCvText,
+          profile_id: currentProfileId,
+        }),
+      });
 
-    doc.setFont("Helvetica", "normal");
-    doc.setFontSize(11);
-    doc.text(lines, margin, margin);
+      if (!res.ok) {
+        throw new Error(`Backend error: ${res.status}`);
+      }
 
-    doc.save("SpaniSami_CV.pdf");
+      const blob = await res.blob();
+      const url = URL.createObjectURL(blob);
+      const link = document.createElement("a");
+      link.href = url;
+      link.download = "SpaniSami_CV.pdf";
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      console.error(err);
+      alert("Could not create the PDF. Please try again.");
+    } finally {
+      btnDownloadPdf.disabled = false;
+    }
   });
 }
 
@@ -300,7 +376,7 @@ if (btnDownloadPdf) {
 // VOICE ASSISTANT HELPERS
 // =======================
 function appendChatMessage(sender, text) {
-  if (!text || !voiceChatLogEl) return;
+  if (!text || !voiceChatLogEl) return null;
 
   const wrapper = document.createElement("div");
   wrapper.className = `chat-message ${sender === "bot" ? "bot" : "user"}`;
@@ -317,10 +393,39 @@ function appendChatMessage(sender, text) {
   wrapper.appendChild(bubble);
   voiceChatLogEl.appendChild(wrapper);
   voiceChatLogEl.scrollTop = voiceChatLogEl.scrollHeight;
+  return bubble;
 }
 
+// Replies are spoken by the backend's /speak, which streams the audio (so it
+// starts playing before synthesis finishes) and caches repeated text. The
+// browser's own voice is the fallback.
 function speakText(text, langCode) {
-  if (!window.speechSynthesis) return;
+  if (replyAudio) replyAudio.pause();
+  const params = new URLSearchParams({ text, language: langCode || "en" });
+  const audio = new Audio(`${BASE_URL}/speak?${params}`);
+  replyAudio = audio;
+
+  let fellBack = false;
+  const fallBack = (err) => {
+    if (fellBack || replyAudio !== audio) return;
+    fellBack = true;
+    console.warn("Backend /speak failed, using the browser voice:", err);
+    speakWithBrowser(text, langCode);
+  };
+
+  setVoiceVisualState("speaking");
+  audio.onended = () => {
+    setVoiceVisualState("idle");
+  };
+  audio.onerror = () => fallBack(audio.error);
+  audio.play().catch(fallBack);
+}
+
+function speakWithBrowser(text, langCode) {
+  if (!window.speechSynthesis) {
+    setVoiceVisualState("idle");
+    return;
+  }
   const utter = new SpeechSynthesisUtterance(text);
   utter.lang = mapToLocale(langCode);
 
@@ -356,98 +461,104 @@ function mapToLocale(code) {
 function setupVoiceAssistant() {
   if (!btnToggleRecording) return;
 
-  if (!SpeechRecognition) {
+  const canRecord = !!(navigator.mediaDevices && window.MediaRecorder);
+  if (!SpeechRecognition && !canRecord) {
     if (micStatusEl) {
       micStatusEl.textContent =
-        "Your browser does not support speech recognition. Use Chrome on desktop.";
+        "Your browser cannot record audio. Try Chrome or a newer phone browser.";
     }
     btnToggleRecording.disabled = true;
     return;
   }
 
-  recognition = new SpeechRecognition();
-  recognition.interimResults = true;
-  recognition.continuous = false;
-
   let userCancelled = false;
 
-  recognition.onstart = () => {
-    console.log("SpeechRecognition started");
-    userCancelled = false;
-    lastTranscript = "";
-    setVoiceVisualState("listening");
-  };
+  if (SpeechRecognition) {
+    recognition = new SpeechRecognition();
+    recognition.interimResults = true;
+    recognition.continuous = false;
 
-  recognition.onresult = (event) => {
-    console.log("SpeechRecognition result event", event);
+    recognition.onstart = () => {
+      console.log("SpeechRecognition started");
+      userCancelled = false;
+      lastTranscript = "";
+      setVoiceVisualState("listening");
+    };
 
-    let transcript = "";
-    for (let i = event.resultIndex; i < event.results.length; i++) {
-      transcript += event.results[i][0].transcript + " ";
-    }
-    lastTranscript = transcript.trim();
-
-    if (lastTranscript && micStatusEl) {
-      micStatusEl.textContent = `I heard: "${lastTranscript}"`;
-    }
-  };
-
-  recognition.onerror = (event) => {
-    console.error("SpeechRecognition error:", event.error, event.message);
-    isListening = false;
-    updateMicUi();
-    if (micStatusEl) {
-      micStatusEl.textContent = `Mic error: ${event.error || "unknown error"}`;
-    }
-  };
+    recognition.onresult = (event) => {
+      console.log("SpeechRecognition result event", event);
 
-  recognition.onnomatch = () => {
-    console.warn("SpeechRecognition: no match");
-    if (micStatusEl) {
-      micStatusEl.textContent =
-        "I could not understand what you said. Please try again.";
-    }
-  };
+      let transcript = "";
+      for (let i = event.resultIndex; i < event.results.length; i++) {
+        transcript += event.results[i][0].transcript + " ";
+      }
+      lastTranscript = transcript.trim();
 
-  recognition.onend = async () => {
-    console.log("SpeechRecognition ended. Last transcript:", lastTranscript);
-    isListening = false;
-    updateMicUi();
+      if (lastTranscript && micStatusEl) {
+        micStatusEl.textContent = `I heard: "${lastTranscript}"`;
+      }
+    };
 
-    if (userCancelled) {
-      console.log("SpeechRecognition manually cancelled by user.");
+    recognition.onerror = (event) => {
+      console.error("SpeechRecognition error:", event.error, event.message);
+      isListening = false;
+      updateMicUi();
       if (micStatusEl) {
-        micStatusEl.textContent = "Mic stopped. Tap Start talking to try again.";
+        micStatusEl.textContent = `Mic error: ${event.error || "unknown error"}`;
       }
-      setVoiceVisualState("idle");
-      return;
-    }
+    };
 
-    if (!lastTranscript) {
+    recognition.onnomatch = () => {
+      console.warn("SpeechRecognition: no match");
       if (micStatusEl) {
-        micStatusEl.textContent = "I didn't hear anything. Try again.";
+        micStatusEl.textContent =
+          "I could not understand what you said. Please try again.";
       }
-      setVoiceVisualState("idle");
-      return;
-    }
+    };
 
-    // We have text; now backend is processing
-    setVoiceVisualState("processing");
+    recognition.onend = async () => {
+      console.log("SpeechRecognition ended. Last transcript:", lastTranscript);
+      isListening = false;
+      updateMicUi();
 
-    if (micStatusEl) {
-      micStatusEl.textContent = `I heard: "${lastTranscript}". SpaniSami is thinking...`;
-    }
+      if (userCancelled) {
+        console.log("SpeechRecognition manually cancelled by user.");
+        if (micStatusEl) {
+          micStatusEl.textContent = "Mic stopped. Tap Start talking to try again.";
+        }
+        setVoiceVisualState("idle");
+        return;
+      }
 
-    appendChatMessage("user", lastTranscript);
-    await sendTextToBackend(lastTranscript);
-    lastTranscript = "";
-  };
+      if (!lastTranscript) {
+        if (micStatusEl) {
+          micStatusEl.textContent = "I didn't hear anything. Try again.";
+        }
+        setVoiceVisualState("idle");
+        return;
+      }
+
+      // We have text; now backend is processing
+      setVoiceVisualState("processing");
+
+      if (micStatusEl) {
+        micStatusEl.textContent = `I heard: "${lastTranscript}". SpaniSami is thinking...`;
+      }
+
+      appendChatMessage("user", lastTranscript);
+      await sendTextToBackend(lastTranscript);
+      lastTranscript = "";
+    };
+  }
 
   btnToggleRecording.addEventListener("click", () => {
-    if (!recognition) return;
+    const langCode = voiceLanguageEl?.value || "en";
+    if (serverRecording || !recognition || !BROWSER_STT_LANGUAGES.has(langCode)) {
+      toggleServerRecording(langCode);
+      return;
+    }
 
     if (!isListening) {
-      const langCode = voiceLanguageEl?.value || "en";
       const locale = mapToLocale(langCode);
       recognition.lang = locale;
 
@@ -469,6 +580,110 @@ function setupVoiceAssistant() {
     }
   });
 
+  async function toggleServerRecording(langCode) {
+    if (serverRecording) {
+      // onstop sends the last chunk and asks for the transcript
+      serverRecording.recorder.stop();
+      return;
+    }
+
+    let stream;
+    try {
+      stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+    } catch (err) {
+      console.error("Failed to open the microphone:", err);
+      if (micStatusEl) {
+        micStatusEl.textContent =
+          "Could not start microphone. Check permissions.";
+      }
+      return;
+    }
+
+    const recorder = new MediaRecorder(stream);
+    const upload = {
+      recorder,
+      id: window.crypto?.randomUUID
+        ? crypto.randomUUID()
+        : `rec-${Date.now()}-${Math.random().toString(36).slice(2)}`,
+      seq: 0,
+      sent: Promise.resolve(),
+      langCode,
+    };
+    serverRecording = upload;
+
+    // Chunks go up one at a time, in order, while the user is still talking
+    recorder.ondataavailable = (event) => {
+      if (!event.data || !event.data.size) return;
+      upload.sent = upload.sent.then(() => sendAudioChunk(upload, event.data, false));
+    };
+
+    recorder.onstop = async () => {
+      stream.getTracks().forEach((track) => track.stop());
+      serverRecording = null;
+      isListening = false;
+      updateMicUi();
+      setVoiceVisualState("processing");
+      if (micStatusEl) micStatusEl.textContent = "Listening back to what you said...";
+
+      try {
+        await upload.sent;
+        const result = await sendAudioChunk(
+          upload,
+          new Blob([], { type: recorder.mimeType }),
+          true
+        );
+        const text = (result.text || "").trim();
+        if (!text) {
+          if (micStatusEl) {
+            micStatusEl.textContent = "I didn't hear anything. Try again.";
+          }
+          setVoiceVisualState("idle");
+          return;
+        }
+        if (micStatusEl) {
+          micStatusEl.textContent = `I heard: "${text}". SpaniSami is thinking...`;
+        }
+        appendChatMessage("user", text);
+        await sendTextToBackend(text);
+      } catch (err) {
+        console.error("Transcription failed:", err);
+        setVoiceVisualState("idle");
+        if (micStatusEl) {
+          micStatusEl.textContent = "Something went wrong. Please try again.";
+        }
+      }
+    };
+
+    recorder.start(TRANSCRIBE_CHUNK_MS);
+    isListening = true;
+    updateMicUi();
+    setVoiceVisualState("listening");
+    if (micStatusEl) {
+      micStatusEl.textContent = "Listening... tap Stop talking when you are done.";
+    }
+  }
+
+  async function sendAudioChunk(upload, blob, final) {
+    const params = new URLSearchParams({
+      upload_id: upload.id,
+      seq: String(upload.seq),
+      language: upload.langCode,
+    });
+    if (final) params.set("final", "1");
+
+    const res = await fetch(`${BASE_URL}/transcribe?${params}`, {
+      method: "POST",
+      headers: { "Content-Type": blob.type || "audio/webm" },
+      body: blob,
+    });
+    const data = await res.json();
+    if (!res.ok) {
+      throw new Error(data.details || data.error || `Backend error: ${res.status}`);
+    }
+    upload.seq += 1;
+    return data;
+  }
+
   function updateMicUi() {
     const labelEl = btnToggleRecording.querySelector(".mic-label");
     if (!labelEl) return;
@@ -496,23 +711,42 @@ function setupVoiceAssistant() {
           message: text,
           language: langCode,
           mode: VOICE_MODE,
+          stream: true,
         }),
       });
 
-      const data = await res.json();
-      console.log("Backend /chat response:", data);
-
       if (!res.ok) {
+        const data = await res.json();
         throw new Error(data.error || `Backend error: ${res.status}`);
       }
 
-      if (data.session_id) {
-        voiceSessionId = data.session_id;
-      }
+      // Render the reply bubble as deltas arrive; speak once it is complete
+      let botBubble = null;
+      let replyText = "";
+      await readNdjsonStream(res, (event) => {
+        if (event.session_id) {
+          voiceSessionId = event.session_id;
+        }
+        if (event.type === "delta") {
+          replyText += event.text;
+          if (!botBubble) {
+            botBubble = appendChatMessage("bot", replyText);
+          } else {
+            botBubble.textContent = replyText;
+            voiceChatLogEl.scrollTop = voiceChatLogEl.scrollHeight;
+          }
+        } else if (event.type === "done") {
+          replyText = event.reply;
+          if (botBubble) botBubble.textContent = replyText;
+          else botBubble = appendChatMessage("bot", replyText);
+        } else if (event.type === "error") {
+          throw new Error(event.details || event.error);
+        }
+      });
+      console.log("Backend /chat reply:", replyText);
 
-      if (data.reply) {
-        appendChatMessage("bot", data.reply);
-        speakText(data.reply, langCode);
+      if (replyText) {
+        speakText(replyText, langCode);
       }
 
       if (micStatusEl) {
@@ -537,6 +771,8 @@ let jobScannerInitialized = false;
 let jobMap = null;
 let jobCircle = null;
 let jobMarkers = [];
+let jobNearTimer = null;
+let jobNearRequest = 0;
 
 // Quick centres for major SA cities
 const cityCenters = {
@@ -550,248 +786,6 @@ const cityCenters = {
   rst: { name: "Rustenburg", lat: -25.6544, lng: 27.2559 },
 };
 
-const jobLocations = [
-  // Johannesburg & surrounds
-  {
-    id: 1,
-    city: "Johannesburg",
-    title: "Cashier – Local Supermarket",
-    company: "Friendly Grocer · Soweto, Johannesburg",
-    lat: -26.2485,
-    lng: 27.854,
-    description: "Handle cash, assist customers, and keep the till area tidy.",
-    requirements: [
-      "Good with people and basic maths",
-      "Comfortable working weekends",
-      "Reliable and punctual",
-    ],
-  },
-  {
-    id: 2,
-    city: "Johannesburg",
-    title: "Call Centre Agent – Learnership",
-    company: "Ubuntu Contact Centre · Braamfontein",
-    lat: -26.1949,
-    lng: 28.0323,
-    description:
-      "Entry-level call centre learnership with full training provided.",
-    requirements: [
-      "Matric (any pass)",
-      "Comfortable speaking on the phone",
-      "Willing to learn and take feedback",
-    ],
-  },
-  {
-    id: 3,
-    city: "Johannesburg",
-    title: "Tutor – Grade 8–10 Maths",
-    company: "After-school Programme · Alexandra",
-    lat: -26.1044,
-    lng: 28.0891,
-    description:
-      "Help high school learners with maths homework and exam revision.",
-    requirements: [
-      "Strong maths marks (or experience tutoring)",
-      "Patient and able to explain clearly",
-      "Available afternoons or Saturdays",
-    ],
-  },
-  {
-    id: 4,
-    city: "Johannesburg",
-    title: "Shop Assistant – Clothing Store",
-    company: "Downtown Fashion · Johannesburg CBD",
-    lat: -26.2044,
-    lng: 28.0456,
-    description:
-      "Assist customers on the floor, pack stock, and keep the store neat.",
-    requirements: [
-      "Friendly, presentable, and confident",
-      "Able to stand for long periods",
-      "Weekend and public holiday shifts",
-    ],
-  },
-  {
-    id: 5,
-    city: "Johannesburg",
-    title: "Barista / Counter Hand",
-    company: "Corner Café · Rosebank",
-    lat: -26.1467,
-    lng: 28.0414,
-    description:
-      "Make basic hot drinks, serve customers, and keep the coffee bar tidy.",
-    requirements: [
-      "Enjoy working with people",
-      "Willing to learn coffee-making skills",
-      "Early morning and weekend shifts",
-    ],
-  },
-
-  // Pretoria
-  {
-    id: 6,
-    city: "Pretoria",
-    title: "Admin Assistant – Entry Level",
-    company: "Community Clinic · Pretoria CBD",
-    lat: -25.7465,
-    lng: 28.189,
-    description:
-      "Help with filing, scanning documents, and answering basic queries.",
-    requirements: [
-      "Basic computer skills (email, Word)",
-      "Organised and detail-focused",
-      "Friendly with patients and staff",
-    ],
-  },
-  {
-    id: 7,
-    city: "Pretoria",
-    title: "Retail Assistant – Electronics",
-    company: "Gadget World · Hatfield",
-    lat: -25.746,
-    lng: 28.2337,
-    description:
-      "Assist customers with phones and accessories, manage stock on shelves.",
-    requirements: [
-      "Interest in phones and gadgets",
-      "Comfortable talking to customers",
-      "Weekend and holiday availability",
-    ],
-  },
-
-  // Cape Town
-  {
-    id: 8,
-    city: "Cape Town",
-    title: "Waiter / Waitress – Waterfront",
-    company: "Harbour View Restaurant · V&A Waterfront",
-    lat: -33.905,
-    lng: 18.4207,
-    description:
-      "Serve guests, take orders, and help keep the restaurant area neat.",
-    requirements: [
-      "Good spoken English",
-      "Friendly and able to work under pressure",
-      "Evening and weekend shifts",
-    ],
-  },
-  {
-    id: 9,
-    city: "Cape Town",
-    title: "Warehouse Picker & Packer",
-    company: "Online Store Hub · Montague Gardens",
-    lat: -33.8645,
-    lng: 18.5124,
-    description:
-      "Pick online orders, pack boxes, and assist with stock counts.",
-    requirements: [
-      "Able to lift light boxes",
-      "Comfortable standing and walking",
-      "Attention to detail when packing",
-    ],
-  },
-
-  // Durban
-  {
-    id: 10,
-    city: "Durban",
-    title: "Front Desk Assistant – Budget Hotel",
-    company: "Seaside Lodge · Durban North",
-    lat: -29.7919,
-    lng: 31.0256,
-    description:
-      "Welcome guests, answer calls, and assist with basic check-in tasks.",
-    requirements: [
-      "Friendly phone manner",
-      "Basic computer skills",
-      "Able to work shifts and weekends",
-    ],
-  },
-  {
-    id: 11,
-    city: "Durban",
-    title: "Retail Cashier – Clothing",
-    company: "Urban Styles · Durban CBD",
-    lat: -29.8579,
-    lng: 31.0219,
-    description:
-      "Operate the till, assist shoppers, and keep the front area clean.",
-    requirements: [
-      "Comfortable working with cash",
-      "Customer-focused",
-      "Shift and weekend work",
-    ],
-  },
-
-  // Polokwane
-  {
-    id: 12,
-    city: "Polokwane",
-    title: "Promoter – In-store Sampling",
-    company: "SnackCo Promotions · Polokwane Mall",
-    lat: -23.9028,
-    lng: 29.4541,
-    description:
-      "Promote new snacks in store, offer tasters, and share basic product info.",
-    requirements: [
-      "Confident talking to strangers",
-      "Energetic and outgoing",
-      "Weekend work in malls",
-    ],
-  },
-
-  // Bloemfontein
-  {
-    id: 13,
-    city: "Bloemfontein",
-    title: "Library Assistant",
-    company: "Community Library · Bloemfontein Central",
-    lat: -29.1121,
-    lng: 26.214,
-    description:
-      "Help shelve books, assist learners with finding resources, and keep the space tidy.",
-    requirements: [
-      "Enjoy reading or studying",
-      "Quiet, helpful attitude",
-      "Available afternoons",
-    ],
-  },
-
-  // Gqeberha
-  {
-    id: 14,
-    city: "Gqeberha",
-    title: "Call Centre Trainee – Customer Care",
-    company: "Bay Contact Centre · Gqeberha",
-    lat: -33.96,
-    lng: 25.6022,
-    description:
-      "Handle basic customer calls with full training provided.",
-    requirements: [
-      "Good phone voice in English and one local language",
-      "Willingness to learn scripts",
-      "Able to work shifts",
-    ],
-  },
-
-  // Rustenburg
-  {
-    id: 15,
-    city: "Rustenburg",
-    title: "General Assistant – Hardware Store",
-    company: "BuildRight Hardware · Rustenburg",
-    lat: -25.6544,
-    lng: 27.2559,
-    description:
-      "Help customers find items, carry small loads, and keep aisles neat.",
-    requirements: [
-      "Physically fit for light lifting",
-      "Good with people",
-      "Weekend availability",
-    ],
-  },
-];
-
 // Card DOM
 const jobDetailCardEl = document.getElementById("jobDetailCard");
 const jobDetailTitleEl = document.getElementById("jobDetailTitle");
@@ -895,8 +889,11 @@ function setupJobScanner() {
     });
   }
 
-  // Initial pins
+  // Initial pins: around the town in the user's profile if we have one
   refreshJobMarkers(defaultCenter);
+  if (currentProfileId) {
+    centreOnProfileTown(currentProfileId);
+  }
 
   // Card close
   if (jobDetailCloseEl) {
@@ -944,32 +941,69 @@ function setupJobScanner() {
   jobScannerInitialized = true;
 }
 
+// Jobs come from the backend's geo index (/jobs_near), so the phone only
+// downloads the postings inside the circle. Slider drags are debounced.
 function refreshJobMarkers(centerLatLng) {
-  if (!jobMap || !google.maps || !google.maps.geometry) return;
+  if (!jobMap) return;
+
+  clearTimeout(jobNearTimer);
+  jobNearTimer = setTimeout(() => loadJobsNear(centerLatLng), 250);
+}
+
+async function centreOnProfileTown(profileId) {
+  try {
+    const params = new URLSearchParams({ profile_id: profileId, k: 1 });
+    const res = await fetch(`${BASE_URL}/jobs_near?${params}`);
+    if (!res.ok) return; // no location on the profile, or a town we don't know
+    const data = await res.json();
+    const centre = new google.maps.LatLng(data.center.lat, data.center.lng);
+    jobMap.setCenter(centre);
+    jobCircle.setCenter(centre);
+    refreshJobMarkers(centre);
+  } catch (err) {
+    console.warn("Could not find profile town:", err);
+  }
+}
+
+async function loadJobsNear(centerLatLng) {
+  const requestId = ++jobNearRequest;
+  const radiusKm = jobCircle.getRadius() / 1000;
+  const params = new URLSearchParams({
+    lat: centerLatLng.lat(),
+    lng: centerLatLng.lng(),
+    radius_km: radiusKm,
+  });
+
+  let jobs = [];
+  try {
+    const res = await fetch(`${BASE_URL}/jobs_near?${params}`);
+    const data = await res.json();
+    if (!res.ok) {
+      console.warn("jobs_near error:", data);
+      return;
+    }
+    jobs = data.jobs || [];
+  } catch (err) {
+    console.warn("Could not load nearby jobs:", err);
+    return;
+  }
+  // A newer request (slider moved again) has started; drop this answer
+  if (requestId !== jobNearRequest) return;
 
   // Clear old markers
   jobMarkers.forEach((m) => m.setMap(null));
   jobMarkers = [];
 
-  const radiusMeters = jobCircle.getRadius();
-
-  jobLocations.forEach((job) => {
+  jobs.forEach((job) => {
     const position = new google.maps.LatLng(job.lat, job.lng);
-    const distanceMeters =
-      google.maps.geometry.spherical.computeDistanceBetween(
-        centerLatLng,
-        position
-      );
-    const inside = distanceMeters <= radiusMeters;
-
     const marker = new google.maps.Marker({
       position,
       map: jobMap,
       title: job.title,
       icon: {
         path: google.maps.SymbolPath.CIRCLE,
-        scale: inside ? 7 : 6,
-        fillColor: inside ? "#22C55E" : "#9CA3AF",
+        scale: 7,
+        fillColor: "#22C55E",
         fillOpacity: 1,
         strokeColor: "#ffffff",
         strokeWeight: 2,
@@ -977,7 +1011,7 @@ function refreshJobMarkers(centerLatLng) {
     });
 
     marker.addListener("click", () => {
-      showJobDetailCard(job, distanceMeters / 1000);
+      showJobDetailCard(job, job.distance_km);
     });
 
     jobMarkers.push(marker);